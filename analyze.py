@@ -5,60 +5,100 @@ Perform some analyses to show the effectiveness of the framework.
 
 """
 
+from __future__ import annotations
+
+import sys
 from pathlib import Path
-from typing import List
-from wordcloud import WordCloud
-from collections import Counter
+from typing import TYPE_CHECKING, List, TextIO
 
-import graphviz
+from check import check
 
-# NOTE: switch to pandas 2.0?
-import pandas as pd
+# NOTE: pandas, numpy, graphviz and wordcloud are imported on first use, with
+# the modules built on them, importing analyze does not pay for them
+if TYPE_CHECKING:
+    import graphviz
+    import numpy as np
 
-from check import check
+    # NOTE: switch to pandas 2.0?
+    import pandas as pd
+    from wordcloud import WordCloud
+
+    from chains import ChainGraph
+    from defense_coverage import Coverage
+    from graph import AdGraph, AttackNode
+    from store import AdStore
 
 
 def get_dataframe(path: Path) -> pd.DataFrame:
     """Get a pandas dataframe from an AD file"""
+    from store import ad_dataframe
 
-    ad_dict = check(path)
-
-    # NOTE: unique rows of ads
-    ads = pd.DataFrame.from_dict(ad_dict, orient="index").set_flags(
-        allows_duplicate_labels=False
-    )
+    return ad_dataframe(check(path))
 
-    # NOTE: check for duplicates
-    assert ads.index.is_unique
-    assert ads.columns.is_unique
 
-    # FIXME: this should not be required as we are parsing a typed dict
-    ads = ads.astype(
-        {
-            "a": "string",
-        }
-    )
-    # print(ads.index)
-    # print(ads.year)
+def get_store(path: Path) -> AdStore:
+    """Get a columnar store from an AD file"""
+    from store import AdStore
 
-    return ads
+    return AdStore(check(path))
 
 
-def filter_dataframe(ads: pd.DataFrame, key: str, val: str) -> pd.DataFrame:
+def parse_filter(val: str) -> tuple:
+    """Return the include and exclude terms of a filter: "a, b, not c" """
     include = [v.strip() for v in val.split(",") if not v.startswith(" not ")]
     exclude = [v.strip()[4:] for v in val.split(",") if v.startswith(" not ")]
 
-    if include:
-        filtered_ads = ads[
-            ads[key].map(lambda x: all(val in x for val in include))
-        ].copy()
+    return include, exclude
+
+
+def filter_masks(ads: pd.DataFrame, key: str, vals: List[str]) -> np.ndarray:
+    """Return the row masks of several filters on key, in one pass over the
+    term index of key"""
+    import numpy as np
 
+    from store import frame_index
+
+    index = frame_index(ads, key)
+    if index is None:
+        return np.array([_filter_map(ads, key, val) for val in vals], dtype=bool)
+
+    filters = [parse_filter(val) for val in vals]
+    terms = [term for include, exclude in filters for term in include + exclude]
+    if len(vals) == 1:
+        # NOTE: a few terms, read their rows from the inverted index
+        term_masks = {term: index.contains(term) for term in terms}
+    else:
+        term_masks = dict(zip(terms, index.masks(terms)))
+
+    masks = np.empty((len(vals), len(ads)), dtype=bool)
+    for mask, (include, exclude) in zip(masks, filters):
+        # NOTE: ADs without key match nothing
+        mask[:] = index.present
+        for term in include:
+            mask &= term_masks[term]
+        for term in exclude:
+            mask &= ~term_masks[term]
+
+    return masks
+
+
+def _filter_map(ads: pd.DataFrame, key: str, val: str) -> np.ndarray:
+    """Row mask of a filter on a column that is not a term list, e.g., a
+    substring of a"""
+    include, exclude = parse_filter(val)
+
+    mask = ads[key].map(lambda x: all(val in x for val in include))
     if exclude:
-        filtered_ads = filtered_ads[
-            ~filtered_ads[key].map(lambda x: any(val in x for val in exclude))
-        ].copy()
+        mask &= ~ads[key].map(lambda x: any(val in x for val in exclude))
+
+    return mask.to_numpy(dtype=bool)
 
-    return filtered_ads
+
+def filter_dataframe(ads: pd.DataFrame, key: str, val: str) -> pd.DataFrame:
+    """Return the rows of ads whose key includes and excludes the terms of
+    val, e.g., "BLE, Pairing, not dual-mode" """
+
+    return ads[filter_masks(ads, key, [val])[0]].copy()
 
 
 def get_set(ads: pd.DataFrame, key: str, val: str) -> pd.DataFrame:
@@ -200,37 +240,47 @@ def get_map(ads: pd.DataFrame, taxonomy: List[str], key: str) -> list[pd.DataFra
     }
     assert taxonomy in taxonomies.keys()
 
-    ads_map = [get_set(ads, key, val) for val in taxonomies[taxonomy]]
+    # NOTE: all the taxonomy terms in one pass
+    masks = filter_masks(ads, key, taxonomies[taxonomy])
+    ads_map = [ads[mask].copy() for mask in masks]
 
     return ads_map
 
 
-def map_atree(ads: pd.DataFrame):
-    """Map to attack tree"""
-    raise NotImplementedError
+def map_atree(ads: pd.DataFrame, goal: str = None) -> AttackNode:
+    """Map to attack tree: OR over the surf hierarchy, AND over the vect steps
+    and chained ADs. goal is a surf, all the surfs if None."""
+    from graph import attack_tree
+
+    return attack_tree(ads, goal)
+
 
+def get_tree(ads: pd.DataFrame, goal: str = None, tname: str = "atree") -> graphviz.Digraph:
+    """Get a tree of ads: the attack tree of goal, see map_atree"""
+    from graph import tree_graph
 
-def get_tree(ads: pd.DataFrame):
-    """Get a tree of ads"""
-    raise NotImplementedError
+    return tree_graph(map_atree(ads, goal), tname)
 
 
-def get_report(ads: pd.DataFrame):
-    """Get a report from the ads"""
-    raise NotImplementedError
+def get_report(
+    ads: pd.DataFrame, out: TextIO = None, fmt: str = "md", k: int = None
+) -> int:
+    """Get a report from the ads: the top k ads by risk (all if k is None)
+    with their defenses, and the mechanisms with their number of ads.
+    fmt is md, html, csv or json, written to out (stdout if None)."""
+    from report import write_report
+
+    return write_report(ads, out, fmt, k)
 
 
 def get_wordcloud(ads: pd.DataFrame, key: str) -> WordCloud:
     """Get a wordcloud from the ads based on key"""
+    from wordcloud import WordCloud
 
-    keys = ads[key]
+    from stats import word_frequencies
 
-    words_list = []
-    for k in keys:
-        for word in k:
-            words_list.append(str(word))
-    # NOTE: count multiword vals as one
-    words_counter = Counter(words_list)
+    # NOTE: count multiword vals as one, from the term index of key
+    words_counter = word_frequencies(ads, key)
     wordcloud = WordCloud().generate_from_frequencies(words_counter)
 
     return wordcloud
@@ -241,40 +291,21 @@ def get_surf_tree(
     ads: pd.DataFrame, tag: str = None, tname: str = "tree"
 ) -> graphviz.Digraph:
     """Return a tree of ADs filtered by tag using surf as a hierarchy. If tag is None, do not filter"""
+    from surftree import SurfTrie
+
+    # NOTE: the surf trie is built once per DataFrame and pruned per tag
+    return SurfTrie.of(ads).graph(tag, tname)
 
-    # NOTE: strict to True prevents double edges
-    tree = graphviz.Digraph(tname, filename=tname + ".gv", strict=True)
-
-    for index, row in ads.iterrows():
-        surf_lev = 0
-        if tag in row.tag or tag is None:
-            try:
-                prev_surf = None
-                for i in range(len(row.surf)):
-                    # Use the current surf as the node name
-                    current_surf = row.surf[i]
-
-                    # Connect to previous surf if exists
-                    if prev_surf is not None:
-                        tree.edge(prev_surf, current_surf)
-
-                    prev_surf = current_surf
-
-                # Mark leaf nodes as boxes
-                tree.attr("node", shape="box")
-                # Connect last surf to the index (attack name)
-                tree.edge(prev_surf, index)
-                tree.attr("node", shape="ellipse")
-            except IndexError:
-                # if surf_lev == 1:
-                #     tree.attr("node", shape="box")
-                #     tree.edge(surf1, index)
-                #     tree.attr("node", shape="ellipse")
-                # else:
-                #     print(f"get_surf_tree: tag {tag}, skip {index}")
-                continue
-
-    return tree
+
+def get_surf_trees(ads: pd.DataFrame, tags: List[str] = None) -> dict:
+    """Return the surf tree of every tag, of all the tags of ads if tags is None"""
+    from surftree import SurfTrie
+
+    trie = SurfTrie.of(ads)
+    if tags is None:
+        tags = trie.tags()
+
+    return {tag: trie.graph(tag, "tree-" + str(tag)) for tag in tags}
 
 
 def get_row(ads: pd.DataFrame, index: str) -> pd.Series:
@@ -285,6 +316,9 @@ def get_row(ads: pd.DataFrame, index: str) -> pd.Series:
 
 def get_chain(ads: pd.DataFrame, adname: str, cname: str = "cname") -> graphviz.Digraph:
     """Get a chain based on surf and vect"""
+    import graphviz
+
+    from chains import ChainGraph
 
     # NOTE: strict to False allows double edges, rankdir for horizontal chain
     chain = graphviz.Digraph(
@@ -292,37 +326,30 @@ def get_chain(ads: pd.DataFrame, adname: str, cname: str = "cname") -> graphviz.
     )
     chain.attr("node", shape="box")
 
-    ad = get_row(ads, adname)
-
-    # NOTE: select ads with same surf and subsurf
-    surf = get_set(ads, "surf", ad.surf[0])
-    sub_surf = get_set(surf, "surf", ad.surf[1])
-    # NOTE: filter out adname
-    sub_surf.drop(index=adname, inplace=True)
-
-    # NOTE: build chains by vect
-    ad_vect_set = set(ad.vect)
-    for index, row in sub_surf.iterrows():
-        row_vect_set = set(row.vect)
-        if row_vect_set.issubset(ad_vect_set):
-            chain.edge(adname, index)
-        elif ad_vect_set.issubset(row_vect_set):
-            # NOTE: check the position in the chain
-            if ad.vect[-1] == row.vect[-1]:
-                chain.edge(index, adname)
-            else:
-                chain.edge(adname, index)
+    # NOTE: the chains of all the ads are built once per DataFrame
+    for src, dst in ChainGraph.of(ads).chain(adname):
+        chain.edge(src, dst)
 
     return chain
 
 
-def get_graph(ads: pd.DataFrame):
-    """Get a graph of ads"""
-    raise NotImplementedError
+def get_chains(ads: pd.DataFrame) -> ChainGraph:
+    """Get the chains of all the ads"""
+    from chains import ChainGraph
+
+    return ChainGraph.of(ads)
+
+
+def get_graph(ads: pd.DataFrame) -> AdGraph:
+    """Get a graph of ads, surfs, vects and defenses"""
+    from graph import AdGraph
+
+    return AdGraph.of(ads)
 
 
 def gen_bc_session_tree(view: bool = False):
     """Generate bc-session-tree.gv"""
+    import graphviz
 
     g = graphviz.Digraph("bc-session-tree", strict=False)
     g.edge("Feature exchange", "Pairing key authentication")
@@ -336,6 +363,7 @@ def gen_bc_session_tree(view: bool = False):
 
 def gen_bc_pairing_tree(view: bool = False):
     """Generate bc-pairing-tree.gv"""
+    import graphviz
 
     g = graphviz.Digraph("bc-pairing-tree", strict=False)
     g.edge("Feature exchange", "Pairing key derivation")
@@ -346,25 +374,42 @@ def gen_bc_pairing_tree(view: bool = False):
         g.view()
 
 
-def get_hist(ads: pd.DataFrame, key: str):
-    """Get an histogram of ads"""
-    raise NotImplementedError
+def get_hist(ads: pd.DataFrame, key: str, bins=None) -> pd.Series:
+    """Get an histogram of ads: ads per term of a list key (e.g., surf), else
+    ads per value of key (e.g., year), per interval if bins"""
+    from stats import histogram
+
+    return histogram(ads, key, bins)
+
 
+def get_coverage(ads: pd.DataFrame, budget: int = 10, exact: bool = False) -> Coverage:
+    """Get the budget defense mechanisms mitigating the most risk of the ads,
+    greedy or exact (branch and bound, small catalogs only)"""
+    from defense_coverage import best_defenses
 
-def get_defenses(ads: pd.DataFrame):
-    """Get a list of defenses from the ads"""
-    for index, row in ads.sort_values(by="risk", ascending=False).iterrows():
-        print(f"{index}:\n    Attack: {row['a']}")
-        print(f"    Risk: {row['risk']}")
-        print("    Defenses:")
-        for d, d1 in row["d"].items():
-            print(f"        - {d}:")
+    return best_defenses(ads, budget, exact)
+
+
+def get_defenses(ads: pd.DataFrame, out: TextIO = None):
+    """Get a list of defenses from the ads, by decreasing risk, written to
+    out (stdout if None)"""
+    from report import ranked
+
+    out = out if out is not None else sys.stdout
+    for record in ranked(ads):
+        out.write(f"{record.key}:\n    Attack: {record.attack}\n")
+        out.write(f"    Risk: {record.risk}\n")
+        out.write("    Defenses:\n")
+        for d, d1 in record.defenses.items():
+            out.write(f"        - {d}:\n")
             for d2 in d1:
-                print(f"            - {d2}")
-        print()
+                out.write(f"            - {d2}\n")
+        out.write("\n")
 
 
 if __name__ == "__main__":
+    import pandas as pd
+
     bt_ads = get_dataframe(Path("toolkit/yaml/bt.yaml"))
     # bt_surf_wc = get_wordcloud(bt_ads, "surf")
 
@@ -16,6 +16,7 @@ from analyze import (
     get_chain,
     get_wordcloud,
     get_hist,
+    filter_dataframe,
 )
 
 
@@ -49,6 +50,35 @@ def test_get_set(bt_ads: pd.DataFrame):
         assert len(ads_set) > 0
 
 
+def test_filter_dataframe():
+    """Test the indexed filters against a scan of the rows"""
+
+    ads = get_dataframe(Path("catalog-mitre/bt.yaml"))
+    cases = [
+        ["surf", "BC"],
+        ["surf", "BLE, SMP, Pairing"],
+        ["tag", "Protocol, not dual-mode"],
+        ["a", "KNOB"],
+        ["vect", "not a term"],
+    ]
+
+    for key, val in cases:
+        include = [v.strip() for v in val.split(",") if not v.startswith(" not ")]
+        exclude = [v.strip()[4:] for v in val.split(",") if v.startswith(" not ")]
+        expected = [
+            index
+            for index, x in ads[key].items()
+            if all(v in x for v in include) and not any(v in x for v in exclude)
+        ]
+        assert list(filter_dataframe(ads, key, val).index) == expected
+
+    stride_map = get_map(ads, "stride", "tag")
+    assert [len(s) for s in stride_map] == [
+        len(get_set(ads, "tag", val))
+        for val in ["Spoofing", "Tampering", "Repudiation", "ID", "DoS", "EoP"]
+    ]
+
+
 def test_get_map(bt_ads: pd.DataFrame):
     """test_maps"""
 
@@ -0,0 +1,220 @@
+"""
+catalog.py
+
+Load several AD files as one catalog.
+
+A CatalogSet registers AD files and directories (catalog/ and catalog-mitre/
+by default) without reading them. Each file is parsed, through the parse
+cache, the first time a lookup or a query needs it, and parsed again only if
+it changed. The AD keys share one namespace: every AD keeps the file it comes
+from, and a key defined in several files is reported as a duplicate rather
+than silently overwritten.
+
+    catalogs = CatalogSet()
+    ble = catalogs.query("surf:BLE AND NOT tag:dual-mode", "catalog-mitre/*")
+    catalogs.duplicates()
+
+Usage: python catalog.py [-s PATTERN] [-q QUERY] [DIR_OR_FILE ...]
+
+"""
+
+import argparse
+import fnmatch
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from parse import parse_cached
+from query import QueryError, compile_query
+from store import ad_dataframe
+
+AD_SUFFIXES = [".yaml", ".yml", ".json", ".toml", ".xml"]
+DEFAULT_DIRS = ["catalog", "catalog-mitre"]
+
+# NOTE: provenance column of the CatalogSet DataFrames
+SOURCE = "source"
+
+
+class DuplicateKeyError(Exception):
+    """AD key defined in several files of a CatalogSet"""
+
+
+class Catalog:
+    """An AD file, parsed on first use"""
+
+    def __init__(self, path: Path, name: str = None):
+        self.path = Path(path)
+        self.name = name or self.path.as_posix()
+        self._stat = None
+        self._ad_dict = None
+        self._ads = None
+
+    def __repr__(self) -> str:
+        return f"Catalog({self.name!r})"
+
+    @property
+    def loaded(self) -> bool:
+        return self._ad_dict is not None
+
+    def _state(self) -> tuple:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def ad_dict(self) -> dict:
+        """The AD dict of the file, parsed again if the file changed"""
+        stat = self._state()
+        if stat != self._stat or self._ad_dict is None:
+            # NOTE: the stat is only recorded once the file parsed
+            self._stat, self._ad_dict, self._ads = None, None, None
+            self._ad_dict = parse_cached(self.path) or {}
+            self._stat = stat
+        return self._ad_dict
+
+    def keys(self) -> list:
+        return list(self.ad_dict)
+
+    def dataframe(self) -> pd.DataFrame:
+        """The DataFrame of the file, as analyze.get_dataframe()"""
+        ad_dict = self.ad_dict
+        if self._ads is None:
+            self._ads = ad_dataframe(ad_dict)
+        return self._ads
+
+
+class CatalogSet:
+    """AD files sharing one key namespace"""
+
+    def __init__(self, paths: list = None, root: Path = None):
+        self.root = Path(root) if root is not None else Path(__file__).parent
+        self.catalogs = {}
+        for path in DEFAULT_DIRS if paths is None else paths:
+            self.add(path)
+
+    def __repr__(self) -> str:
+        return f"CatalogSet({list(self.catalogs)!r})"
+
+    def __len__(self) -> int:
+        return len(self.catalogs)
+
+    def add(self, path: Path) -> list:
+        """Register an AD file or the AD files of a directory, without
+        parsing them. Return the registered names."""
+
+        path = Path(path)
+        if not path.is_absolute() and not path.exists():
+            path = self.root / path
+        if path.is_dir():
+            files = sorted(p for p in path.rglob("*") if p.suffix in AD_SUFFIXES and p.is_file())
+        elif path.is_file():
+            files = [path]
+        else:
+            raise FileNotFoundError(f"{path}: no such AD file or directory")
+
+        names = []
+        for file in files:
+            try:
+                name = file.resolve().relative_to(self.root.resolve()).as_posix()
+            except ValueError:
+                name = file.as_posix()
+            if name not in self.catalogs:
+                self.catalogs[name] = Catalog(file, name)
+            names.append(name)
+        return names
+
+    def select(self, pattern: str = None) -> list:
+        """Return the catalogs whose name matches a glob pattern, e.g.,
+        catalog-mitre/*, all of them if pattern is None"""
+        if pattern is None:
+            return list(self.catalogs.values())
+        return [c for name, c in self.catalogs.items() if fnmatch.fnmatch(name, pattern)]
+
+    def sources(self, pattern: str = None) -> dict:
+        """Return the AD key -> file names map of the selected catalogs"""
+        sources = {}
+        for catalog in self.select(pattern):
+            for key in catalog.keys():
+                sources.setdefault(key, []).append(catalog.name)
+        return sources
+
+    def duplicates(self, pattern: str = None) -> dict:
+        """Return the AD keys defined in several files, with their files"""
+        return {key: names for key, names in self.sources(pattern).items() if len(names) > 1}
+
+    def get(self, key: str, pattern: str = None) -> tuple:
+        """Return the (file name, AD) of an AD key, None if not found"""
+        found = [(c.name, c.ad_dict[key]) for c in self.select(pattern) if key in c.ad_dict]
+        if len(found) > 1:
+            raise DuplicateKeyError(f"{key}: defined in " + ", ".join(name for name, _ in found))
+        return found[0] if found else None
+
+    def _concat(self, frames: list, unique: bool) -> pd.DataFrame:
+        # NOTE: the file DataFrames reject duplicate labels, checked below
+        frames = [f.set_flags(allows_duplicate_labels=True) for f in frames if len(f) > 0]
+        if not frames:
+            return pd.DataFrame(columns=[SOURCE])
+        ads = pd.concat(frames)
+        if unique and not ads.index.is_unique:
+            duplicated = ads.index[ads.index.duplicated()].unique()
+            raise DuplicateKeyError(
+                "; ".join(
+                    f"{key}: defined in " + ", ".join(ads.loc[[key], SOURCE])
+                    for key in duplicated
+                )
+            )
+        return ads
+
+    def dataframe(self, pattern: str = None, unique: bool = True) -> pd.DataFrame:
+        """Return the ADs of the selected catalogs with a source column.
+        With unique=False an AD key defined in several files has a row per
+        file, otherwise it raises DuplicateKeyError."""
+        return self._concat(
+            [c.dataframe().assign(**{SOURCE: c.name}) for c in self.select(pattern)], unique
+        )
+
+    def query(self, text: str, pattern: str = None, unique: bool = True) -> pd.DataFrame:
+        """Return the ADs of the selected catalogs matching a query (see
+        query.py), with a source column. Only the selected files are parsed.
+        Duplicate keys are handled as in dataframe()."""
+        q = compile_query(text)
+        catalogs = self.select(pattern)
+        frames = [catalog.dataframe() for catalog in catalogs]
+
+        # NOTE: a field may be missing from some files only, e.g., risk
+        columns = set().union(*(ads.columns for ads in frames))
+        unknown = sorted(q.fields() - columns)
+        if unknown:
+            raise QueryError("unknown field " + ", ".join(map(repr, unknown)))
+
+        return self._concat(
+            [
+                ads[q.mask(ads, strict=False)].assign(**{SOURCE: catalog.name})
+                for catalog, ads in zip(catalogs, frames)
+            ],
+            unique,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load AD files as one catalog")
+    parser.add_argument("paths", type=str, nargs="*", help="AD files and directories, default: " + " ".join(DEFAULT_DIRS))
+    parser.add_argument("-s", "--select", type=str, help="Glob pattern of the files, e.g., 'catalog-mitre/*'")
+    parser.add_argument("-q", "--query", type=str, help="Query, e.g., surf:BLE AND year>=2019")
+    args = parser.parse_args()
+
+    catalogs = CatalogSet(args.paths or None)
+
+    if args.query:
+        try:
+            result = catalogs.query(args.query, args.select, unique=False)
+        except (QueryError, DuplicateKeyError) as err:
+            sys.exit(f"Error: {err}")
+        for index, row in result.iterrows():
+            print(f"{row[SOURCE]}: {index}: {row['a']}")
+    else:
+        duplicates = catalogs.duplicates(args.select)
+        for key, names in duplicates.items():
+            print(f"{key}: " + ", ".join(names))
+        print(f"Catalogs: {len(catalogs.select(args.select))}, duplicate keys: {len(duplicates)}")
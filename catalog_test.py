@@ -0,0 +1,67 @@
+"""
+catalog_test.py
+
+"""
+import pytest
+
+from catalog import CatalogSet, DuplicateKeyError, SOURCE
+from query import QueryError
+
+AD = """
+{key}:
+  a: Attack {key}
+  surf: [{surf}]
+  vect: [Vector]
+  model: [Model]
+  tag: [Tag]
+  year: {year}
+"""
+
+
+def _write(path, ads):
+    path.write_text("".join(AD.format(key=k, surf=s, year=y) for k, s, y in ads))
+
+
+def test_catalog_set(tmp_path):
+    """Test lazy loading, provenance and cross-file duplicates."""
+    (tmp_path / "one").mkdir()
+    (tmp_path / "two").mkdir()
+    _write(tmp_path / "one/a.yaml", [["knob", "BC", 2019], ["bias", "BC", 2020]])
+    _write(tmp_path / "two/b.yaml", [["knob", "BLE", 2019], ["sweyn", "BLE", 2020]])
+
+    catalogs = CatalogSet(["one", "two"], root=tmp_path)
+    assert list(catalogs.catalogs) == ["one/a.yaml", "two/b.yaml"]
+    assert not any(c.loaded for c in catalogs.select())
+
+    # NOTE: only the selected file is parsed
+    assert catalogs.get("bias", "one/*")[0] == "one/a.yaml"
+    assert [c.loaded for c in catalogs.select()] == [True, False]
+
+    assert catalogs.duplicates() == {"knob": ["one/a.yaml", "two/b.yaml"]}
+    with pytest.raises(DuplicateKeyError):
+        catalogs.get("knob")
+    with pytest.raises(DuplicateKeyError):
+        catalogs.dataframe()
+
+    ads = catalogs.dataframe(unique=False)
+    assert list(ads[SOURCE]) == ["one/a.yaml", "one/a.yaml", "two/b.yaml", "two/b.yaml"]
+
+    ble = catalogs.query("surf:BLE AND year>=2020")
+    assert list(ble.index) == ["sweyn"]
+    assert list(ble[SOURCE]) == ["two/b.yaml"]
+    with pytest.raises(QueryError):
+        catalogs.query("foo:BLE")
+
+    # NOTE: a changed file is parsed again
+    _write(tmp_path / "two/b.yaml", [["sweyn", "BLE", 2020]])
+    assert catalogs.duplicates() == {}
+
+    # NOTE: a broken file raises until it is fixed
+    catalog = catalogs.catalogs["two/b.yaml"]
+    (tmp_path / "two/b.yaml").write_text("sweyn: [\n")
+    for _ in range(2):
+        with pytest.raises(Exception):
+            catalog.ad_dict
+    assert not catalog.loaded
+    _write(tmp_path / "two/b.yaml", [["sweyn", "BLE", 2020]])
+    assert catalog.keys() == ["sweyn"]
@@ -0,0 +1,103 @@
+"""
+chains.py
+
+Attack chains of all the ADs of a DataFrame at once.
+
+The chain of an AD links it to the other ADs having its first two surf terms
+(surf[0] and surf[1]) by their vect sets, as analyze.get_chain:
+
+    other vect subset of the AD vect        AD -> other
+    AD vect subset of the other vect        other -> AD if both end with the
+                                            same vect, else AD -> other
+
+The ADs sharing the same (surf[0], surf[1]) share their candidates, computed
+once per pair from the surf index. The vect sets are bitmasks over the vect
+terms, so the subset checks of an AD against all its candidates are a few
+vectorized operations. The edges of every chain are kept in arrays ordered by
+AD, a chain is a slice of them.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from store import MISSING, ListColumn, _missing, frame_cached
+
+
+class ChainGraph:
+    """Chains of all the ADs of a DataFrame"""
+
+    def __init__(self, ads: pd.DataFrame):
+        self.index = np.array(ads.index, dtype=object)
+        self.positions = {key: row for row, key in enumerate(self.index)}
+
+        surf = ListColumn([MISSING if _missing(v) else v for v in ads["surf"]])
+        vect = ListColumn([MISSING if _missing(v) else v for v in ads["vect"]])
+
+        # NOTE: vect bitmasks, one bit per vect term, set from the codes
+        bits = np.zeros((len(self.index), (len(vect.terms) + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(bits, (vect.rows, vect.codes // 8), np.left_shift(1, 7 - vect.codes % 8).astype(np.uint8))
+        lengths = vect.lengths()
+        last = np.full(len(self.index), -1, dtype=np.int64)
+        last[lengths > 0] = vect.codes[vect.offsets[1:][lengths > 0] - 1]
+
+        # NOTE: (surf[0], surf[1]) -> rows of the ADs having both
+        groups = {}
+        none = np.zeros(0, dtype=np.int64)
+        src, dst = [], []
+        for row in range(len(self.index)):
+            terms = surf[row]
+            if terms is MISSING or len(terms) < 2:
+                src.append(none)
+                dst.append(none)
+                continue
+
+            pair = (terms[0], terms[1])
+            if pair not in groups:
+                groups[pair] = np.intersect1d(surf.postings(pair[0]), surf.postings(pair[1]))
+            others = groups[pair]
+            others = others[others != row]
+
+            subset = ~np.any(bits[others] & ~bits[row], axis=1)
+            superset = ~np.any(bits[row] & ~bits[others], axis=1)
+            # NOTE: other -> AD if the AD vect is a subset ending the same
+            inward = ~subset & superset & (last[others] == last[row])
+            linked = subset | superset
+
+            others, inward = others[linked], inward[linked]
+            src.append(np.where(inward, others, row))
+            dst.append(np.where(inward, row, others))
+
+        self.src = np.concatenate(src) if src else none
+        self.dst = np.concatenate(dst) if dst else none
+        # NOTE: the edges of the chain of row are src[offsets[row]:offsets[row + 1]]
+        self.offsets = np.zeros(len(self.index) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in src], out=self.offsets[1:])
+
+    @classmethod
+    def of(cls, ads: pd.DataFrame) -> "ChainGraph":
+        """Return the chains of a DataFrame, kept while the DataFrame lives"""
+        return frame_cached(ads, "chains", ["surf", "vect"], cls)
+
+    def __len__(self) -> int:
+        return len(self.src)
+
+    def chain(self, key: str) -> list:
+        """Return the (source, target) edges of the chain of an AD, in the
+        order of the DataFrame"""
+        row = self.positions[key]
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return list(zip(self.index[self.src[start:end]], self.index[self.dst[start:end]]))
+
+    def edges(self) -> list:
+        """Return the (source, target) edges of all the chains, without
+        duplicates"""
+        pairs = np.unique(np.stack([self.src, self.dst], axis=1), axis=0)
+        return [(self.index[s], self.index[d]) for s, d in pairs]
+
+    def adjacency(self) -> dict:
+        """Return the AD -> next ADs map of all the chains"""
+        adjacency = {key: [] for key in self.index}
+        for src, dst in self.edges():
+            adjacency[src].append(dst)
+        return adjacency
@@ -0,0 +1,33 @@
+"""
+chains_test.py
+
+"""
+from pathlib import Path
+
+from analyze import get_chain, get_chains, get_dataframe, get_set
+
+
+def test_chains():
+    """Test the batch chains against filtering the ADs of every chain."""
+    ads = get_dataframe(Path("catalog-mitre/bt.yaml"))
+    chains = get_chains(ads)
+
+    for adname, ad in ads.iterrows():
+        if len(ad.surf) < 2:
+            assert chains.chain(adname) == []
+            continue
+
+        expected = []
+        sub_surf = get_set(get_set(ads, "surf", ad.surf[0]), "surf", ad.surf[1])
+        for index, row in sub_surf.drop(index=adname).iterrows():
+            if set(row.vect).issubset(ad.vect):
+                expected.append((adname, index))
+            elif set(ad.vect).issubset(row.vect):
+                if ad.vect[-1] == row.vect[-1]:
+                    expected.append((index, adname))
+                else:
+                    expected.append((adname, index))
+        assert chains.chain(adname) == expected
+
+    assert len(get_chain(ads, "knob").body) == len(chains.chain("knob")) + 1
+    assert set(chains.edges()) == {edge for key in ads.index for edge in chains.chain(key)}
@@ -6,18 +6,17 @@ KNOB attack surf = [BC, Session, Entropy negotiation].
 
 The order of the fields does not matter in the schema.
 
-Schema([str]) validates an array of str.
+validator.compiled compiles the schema once per dictionary.
 
 TODO is currently a valid word in the dictionary>
 
 """
 
 from pathlib import Path
-from yamllint.config import YamlLintConfig
-from yamllint import linter
-from schema import Optional, Schema, SchemaError, Regex, And
 
-from parse import parse
+from parse import parse_cached
+from lint import lint_and_parse
+from validator import compiled
 
 BT_WORDS = {
     "surf": [
@@ -191,97 +190,39 @@ ES_WORDS = {
 }
 
 
-def check_yamllint(path: Path):
-    """Check with default yamllint config"""
+def check_yamllint(path: Path, skip_clean: bool = False) -> dict:
+    """Check with default yamllint config, return the parsed YAML"""
 
-    # NOTE: https://yamllint.readthedocs.io/en/stable/configuration.html
-    # NOTE: duplicates, syntax, ...
-    conf = YamlLintConfig(
-        """
-    extends: default
-
-    rules:
-      line-length: disable
-    """
-    )
-    with open(path, "r", encoding="utf8") as file:
-        gen = linter.run(file, conf)
-        errors = list(gen)
-        if errors:
-            for e in errors:
-                print(e)
-            raise SystemExit("Invalid YAML")
+    # NOTE: the file is read and parsed once, see lint.py
+    errors, yaml_dict = lint_and_parse(Path(path), skip_clean)
+    if errors:
+        for e in errors:
+            print(e)
+        raise SystemExit("Invalid YAML")
     print(f"check_yamllint: {path}: passed")
 
-
-def _check_list(list1: list, key: str, list2=None) -> bool:
-    """Check if list1 is not empty and words in list1 are contained in list2."""
-    if list2 is None:
-        return True
-    else:
-        return (len(list1) > 0) and len(set(list1) - set(list2[key])) == 0
+    return yaml_dict
 
 
 def check_schema(ad_dict: dict, words=None):
-    """Check schema and fields"""
+    """Check schema and fields, report the errors of all the ADs"""
 
     # NOTE: Once stable move to https://github.com/SchemaStore/schemastore
-    schema = Schema(
-        {
-            Regex(r"^[a-z0-9_]+$"): {
-                "a": And(str, lambda a: len(a) > 0),
-                # "d": And(Schema([{str: [str]}])),
-                "d": And(Schema({str: [str]})),
-                Optional("year"): And(
-                    int, lambda year: (1980 <= year <= 2030) or year == 0
-                ),
-                # NOTE: surf ideally lists from the broadest to the most specific
-                "surf": And(
-                    Schema([str]),
-                    lambda surf: _check_list(surf, "surf", words),
-                ),
-                "vect": And(
-                    Schema([str]),
-                    lambda vect: _check_list(vect, "vect", words),
-                ),
-                "model": And(
-                    Schema([str]),
-                    lambda model: _check_list(model, "model", words),
-                ),
-                "tag": And(
-                    Schema([str]),
-                    lambda tag: _check_list(tag, "tag", words),
-                ),
-                Optional("req"): And(
-                    Schema([str]),
-                    lambda s: (len(s) > 0),
-                ),
-                # NOTE: we strip the CVE-nnnn
-                Optional("risk"): And(Schema(float), lambda s: s >= 0),
-                Optional("cve"): And(Schema([str]), lambda s: len(s) > 0),
-                Optional("cwe"): And(Schema([str]), lambda s: len(s) > 0),
-                Optional("capec"): And(Schema([str]), lambda s: len(s) > 0),
-                Optional("vref"): And(Schema([str]), lambda s: len(s) > 0),
-            }
-        }
-    )
-
-    try:
-        schema.validate(ad_dict)
-        print(f"check_schema: {len(ad_dict)} ads")
-    except SchemaError as se:
-        raise SystemExit(se)
+    errors = compiled(words, empty_refs=False).validate(ad_dict)
+    if errors:
+        raise SystemExit("\n".join(errors))
+    print(f"check_schema: {len(ad_dict)} ads")
 
 
 def check(path: Path, words=None) -> dict:
     """Return a sanitized AD dict"""
 
-    # NOTE: file specific checks
+    # NOTE: file specific checks, YAML files are parsed by the lint stage
     match path.suffix:
         case ".yaml" | ".yml":
-            check_yamllint(path)
-
-    ad_dict = parse(path)
+            ad_dict = check_yamllint(path)
+        case _:
+            ad_dict = parse_cached(path)
 
     # NOTE: Python dict checks
     check_schema(ad_dict, words)
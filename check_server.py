@@ -0,0 +1,258 @@
+"""
+check_server.py
+
+Long-lived check_tool server and its thin client.
+
+Running check_tool.py for every file (pre-commit hooks, editors) pays the
+interpreter start, the imports, the dictionary load and the validator compile
+each time. The server runs check_tool in one process: the dictionaries
+(reloaded when their file changes), the compiled validators and the parse
+cache stay warm, and a request only pays for the check itself.
+
+The client sends its check_tool arguments and working directory as one JSON
+line over a Unix socket. The server runs check_tool.main with them and
+answers one JSON line with the exit status and the output. Requests are
+served one at a time: the tool options and the working directory are process
+wide. If no server answers, the client runs check_tool itself.
+
+The default socket is in a directory only the user can access
+($XDG_RUNTIME_DIR, else adf-check-UID in the temp directory), and the client
+only talks to a socket owned by the user.
+
+Usage:
+
+    python check_server.py --serve [--socket PATH]
+    python check_server.py [--socket PATH] -i catalog/bt.yaml -d dicts/bt.yaml
+    python check_server.py --stop
+
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+import traceback
+
+_UID = getattr(os, "getuid", lambda: 0)()
+
+# NOTE: one server per user by default, ADF_CHECK_SOCKET overrides it
+SOCKET_DIR = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"adf-check-{_UID}")
+SOCKET = os.environ.get("ADF_CHECK_SOCKET", os.path.join(SOCKET_DIR, "adf-check.sock"))
+
+# NOTE: check_tool options (argparse dest) that never return or need a terminal
+UNSUPPORTED = ["watch"]
+
+
+def _status(code) -> tuple:
+    """Return the exit status and the message of a SystemExit code"""
+    if code is None:
+        return 0, ""
+    if isinstance(code, int):
+        return code, ""
+    return 1, str(code) + "\n"
+
+
+def _unsupported(argv: list) -> str:
+    """Return the first unsupported option of argv, None if there is none"""
+    import check_tool
+
+    # NOTE: parsed as check_tool does, abbreviations included
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        try:
+            args = check_tool.build_parser().parse_args(argv)
+        except SystemExit:
+            # NOTE: check_tool.main reports the error
+            return None
+    for dest in UNSUPPORTED:
+        if getattr(args, dest, None):
+            return "--" + dest
+    return None
+
+
+def run(argv: list, cwd: str = None) -> dict:
+    """Run check_tool with argv in cwd, return the exit status and the output"""
+    import check_tool
+
+    unsupported = _unsupported(argv)
+    if unsupported is not None:
+        return {"status": 2, "stdout": "", "stderr": f"{unsupported} is not supported by the server\n"}
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    status = 0
+    previous = os.getcwd()
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            if cwd is not None:
+                os.chdir(cwd)
+            try:
+                check_tool.main(argv)
+            except SystemExit as err:
+                status, message = _status(err.code)
+                stderr.write(message)
+            except Exception:
+                traceback.print_exc()
+                status = 1
+    finally:
+        os.chdir(previous)
+
+    return {"status": status, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            self._reply({"status": 2, "stdout": "", "stderr": "invalid request\n"})
+            return
+
+        if request.get("stop"):
+            self._reply({"status": 0, "stdout": "", "stderr": ""})
+            # NOTE: shutdown() waits for serve_forever(), call it from another thread
+            threading.Thread(target=self.server.shutdown).start()
+        elif request.get("ping"):
+            self._reply({"status": 0, "stdout": "", "stderr": "", "pid": os.getpid()})
+        else:
+            self._reply(run(list(request.get("argv", [])), request.get("cwd")))
+
+    def _reply(self, reply: dict):
+        self.wfile.write(json.dumps(reply).encode("utf8") + b"\n")
+
+
+def _private_dir(directory: str):
+    """Create directory only accessible to the user, raise OSError if it is
+    accessible to other users"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != _UID or info.st_mode & 0o077:
+        raise OSError(f"{directory} should be a directory only accessible to its owner")
+
+
+def _owned(path: str) -> bool:
+    """Return True if path is owned by the user, raise FileNotFoundError if
+    it does not exist"""
+    return os.lstat(path).st_uid == _UID
+
+
+class CheckServer(socketserver.UnixStreamServer):
+    """Serve check_tool requests on a Unix socket"""
+
+    def __init__(self, path: str = SOCKET):
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(SOCKET_DIR):
+            _private_dir(SOCKET_DIR)
+        if os.path.lexists(path):
+            if not _owned(path):
+                raise OSError(f"{path} is owned by another user")
+            if request({"ping": True}, path) is not None:
+                raise OSError(f"a server is already running on {path}")
+            # NOTE: stale socket of a server that did not stop cleanly
+            os.unlink(path)
+        # NOTE: no window where other users can connect before a chmod
+        umask = os.umask(0o077)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(umask)
+        self.path = path
+
+    def server_close(self):
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+
+def warm():
+    """Import the check_tool modules and build the lint config"""
+    import check_tool  # noqa: F401
+    import lint
+    import similarity  # noqa: F401
+
+    lint._conf()
+
+
+def serve(path: str = SOCKET):
+    """Serve check_tool requests until stopped"""
+    warm()
+    with CheckServer(path) as server:
+        print("INFO: Serving on " + path + ", stop with --stop or Ctrl-C.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def request(message: dict, path: str = SOCKET, timeout: float = 300.0) -> dict:
+    """Send a request to the server, return its reply, None if no server
+    owned by the user answers"""
+    try:
+        if not _owned(path):
+            return None
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(path)
+            client.sendall(json.dumps(message).encode("utf8") + b"\n")
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = client.recv(1 << 16)
+                if not chunk:
+                    break
+                data += chunk
+    except OSError:
+        # NOTE: no server, or it died or timed out during the request
+        return None
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+def check(argv: list, path: str = SOCKET) -> int:
+    """Run check_tool with argv on the server, in this process if no server
+    answers. Return the exit status."""
+
+    reply = request({"argv": argv, "cwd": os.getcwd()}, path)
+    if reply is None:
+        import check_tool
+
+        try:
+            check_tool.main(argv)
+        except SystemExit as err:
+            status, message = _status(err.code)
+            sys.stderr.write(message)
+            return status
+        return 0
+
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    return reply["status"]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="AD Checker server and client, other arguments are passed to check_tool.py",
+        allow_abbrev=False,
+    )
+    parser.add_argument("--socket", help="Server socket path (default: " + SOCKET + ")", default=SOCKET)
+    parser.add_argument("--serve", help="Run the server", action="store_true")
+    parser.add_argument("--stop", help="Stop the server", action="store_true")
+
+    args, argv = parser.parse_known_args()
+
+    if args.serve:
+        serve(args.socket)
+    elif args.stop:
+        if request({"stop": True}, args.socket) is None:
+            print("ERR : No server on " + args.socket + "!")
+            raise SystemExit(1)
+    else:
+        raise SystemExit(check(argv, args.socket))
@@ -0,0 +1,122 @@
+"""
+check_server_test.py
+
+"""
+import os
+import shutil
+import socket
+import stat
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+import check_server
+import check_tool
+from check_server import CheckServer, check, request
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="no Unix sockets")
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = str(tmp_path / "check.sock")
+    server = CheckServer(path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield path
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def _check(path: str, argv: list) -> dict:
+    return request({"argv": argv, "cwd": str(Path.cwd())}, path)
+
+
+def test_server(server):
+    """Test the server answers as check_tool.py."""
+    for argv in [
+        ["-i", "catalog-mitre/bt.yaml", "-d", "dicts/bt.yaml"],
+        ["-i", "template/ad.json"],
+        ["-i", "missing.yaml"],
+        ["-i", "catalog-mitre/bt.yaml", "-s", "0.9", "-c", "catalog-mitre/bt.yaml"],
+    ]:
+        tool = subprocess.run([sys.executable, "check_tool.py"] + argv, capture_output=True, text=True)
+        reply = _check(server, argv)
+        assert reply["status"] == tool.returncode
+        assert reply["stdout"] == tool.stdout
+
+    for watch in ["--watch", "--wat"]:
+        reply = _check(server, ["-i", "catalog-mitre/bt.yaml", watch])
+        assert reply["status"] == 2
+    assert request({"ping": True}, server)["status"] == 0
+
+
+def test_dictionary_reload(server, tmp_path):
+    """Test the dictionaries are kept until their file changes."""
+    words = tmp_path / "bt.yaml"
+    shutil.copy("dicts/bt.yaml", words)
+    argv = ["-i", "catalog-mitre/bt.yaml", "-d", str(words)]
+
+    assert _check(server, argv)["status"] == 0
+    dictionary = check_tool._DICTIONARIES[str(words)][1]
+    assert _check(server, argv)["status"] == 0
+    assert check_tool._DICTIONARIES[str(words)][1] is dictionary
+
+    words.write_text(words.read_text() + "# changed\n")
+    assert _check(server, argv)["status"] == 0
+    assert check_tool._DICTIONARIES[str(words)][1] is not dictionary
+
+
+def test_no_server(tmp_path):
+    """Test the client without a server."""
+    assert request({"ping": True}, str(tmp_path / "none.sock")) is None
+
+
+def test_private_socket(tmp_path, monkeypatch):
+    """Test the default socket is only accessible to the user."""
+    monkeypatch.setattr(check_server, "SOCKET_DIR", str(tmp_path / "private"))
+    path = str(tmp_path / "private" / "check.sock")
+    with CheckServer(path):
+        assert stat.S_IMODE(os.stat(tmp_path / "private").st_mode) == 0o700
+        assert stat.S_IMODE(os.stat(path).st_mode) & 0o077 == 0
+
+    # NOTE: a socket of another user is neither used nor removed
+    with CheckServer(path) as server:
+        monkeypatch.setattr(check_server, "_UID", check_server._UID + 1)
+        assert request({"ping": True}, path) is None
+        with pytest.raises(OSError):
+            CheckServer(path)
+        assert os.path.exists(path)
+        monkeypatch.undo()
+        server.server_close()
+
+
+def _listen(path: str) -> socket.socket:
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    return listener
+
+
+def test_broken_server(tmp_path, capsys):
+    """Test the client runs check_tool itself if the server fails."""
+    # NOTE: accepted by the backlog, never answered
+    with _listen(str(tmp_path / "stuck.sock")) as stuck:
+        assert request({"ping": True}, stuck.getsockname(), timeout=0.1) is None
+
+    # NOTE: the server dies during the request
+    with _listen(str(tmp_path / "broken.sock")) as broken:
+        def die():
+            connection, _ = broken.accept()
+            connection.close()
+
+        thread = threading.Thread(target=die)
+        thread.start()
+        status = check(["-i", "template/ad.json"], broken.getsockname())
+        thread.join()
+    assert status == subprocess.run([sys.executable, "check_tool.py", "-i", "template/ad.json"]).returncode
+    assert "not compliant" in capsys.readouterr().out
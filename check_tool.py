@@ -12,36 +12,31 @@ Schema([str]) validates an array of str.
 
 import os.path
 import sys
-from difflib import get_close_matches, SequenceMatcher
+import io
+import time
+import glob
+import contextlib
 import argparse
 
 from pathlib import Path
-from yamllint.config import YamlLintConfig
-from yamllint import linter
-from schema import Optional, Schema, SchemaError, Regex, And
 
-from parse import parse
+from parse import parse_cached, content_digest
+from lint import lint_and_parse
+from incremental import AdState
+from validator import AdValidator, compiled
+from dictionary import Dictionary, DictionaryError
 
-
-# Empty dictionary - no checks
-DICT_WORDS = {
-    "surf": [
-    ],
-    "vect": [
-    ],
-    "model": [
-    ],
-    "tag": [
-    ],
-}
-
-# list of surfaces with PID/TID - for MITRE EM3ED mappin
-DICT_SURF_PID = []
-DICT_SURF_TID = []
+# NOTE: schema, similarity (numpy) and the process pool are imported where
+# they are used, checking one JSON file does not pay for them
 
 
 _VERBOSE_OUTPUT = False
-_SCORE = 0.5
+_DEFAULT_SCORE = 0.5
+_SCORE = _DEFAULT_SCORE
+# AD file extensions collected from input directories
+AD_SUFFIXES = [".yaml", ".yml", ".json", ".toml", ".xml"]
+_BRUTE_FORCE = False
+_SKIP_CLEAN_LINT = False
 
 #
 # Print hints
@@ -67,52 +62,44 @@ def print_verbose(msg: str):
         print("DBG : " + msg)
 
 
-def check_yamllint(path: Path):
-    """Check with default yamllint config"""
-
-    # NOTE: https://yamllint.readthedocs.io/en/stable/configuration.html
-    # NOTE: duplicates, syntax, ...
-    conf = YamlLintConfig(
-        """
-    extends: default
+def check_yamllint(path: Path) -> dict:
+    """Check with default yamllint config, return the parsed YAML"""
 
-    rules:
-      line-length: disable
-    """
-    )
-    with open(path, "r", encoding="utf8") as file:
-        gen = linter.run(file, conf)
-        errors = list(gen)
-        if errors:
-            for e in errors:
-                print(e)
-            raise SystemExit("Invalid YAML")
+    # NOTE: the file is read and parsed once, see lint.py
+    errors, yaml_dict = lint_and_parse(Path(path), _SKIP_CLEAN_LINT)
+    if errors:
+        for e in errors:
+            print(e)
+        raise SystemExit("Invalid YAML")
     print_verbose(f"check_yamllint: {path}: passed")
 
+    return yaml_dict
 
-def _check_list(list1: list, key: str, list2=None) -> bool:
-    """Verify key existence, and check if list1 is not empty and words in list1 are contained in list2."""
+
+def _check_list(list1: list, key: str, words=None) -> bool:
+    """Verify key existence, and check if list1 is not empty and words in list1 are contained in the dictionary."""
     if list1 is None:
         print_hint("Missing required tag \"" + key + "\"!")
         return False
-    if list2 is None:
+    if words is None:
         return True
     else:
-        if ((len(list1) > 0) and len(set(list1) - set(list2[key])) == 0):
+        missing = words.missing(key, list1)
+        if (len(list1) > 0) and len(missing) == 0:
             # ITRE EM3ED mapping test - at least one surf must have pid
             if key == "surf":
-                if len(set(list1) - set(DICT_SURF_PID)) == len(set(list1)):
+                if not words.has_pid(list1):
                     print_hint("Missing pid for \"" + key + "\". At least one \"surf\" must have pid (see the dictionary).")
                     return False
             if key == "vect":
-                if len(set(list1) - set(DICT_SURF_TID)) == len(set(list1)):
+                if not words.has_tid(list1):
                     print_hint("Missing tid for \"" + key + "\". At least one \"vect\" must have tid (see the dictionary).")
                     return False
             return True
         else:
-            for missing in (set(list1) - set(list2[key])):
-                print_hint("Missing \"" + key + "\": \"" + missing + "\"")
-                hints = get_close_matches(missing, list2[key], n=3, cutoff=0.2)
+            for term in missing:
+                print_hint("Missing \"" + key + "\": \"" + term + "\"")
+                hints = words.suggest(key, term, n=3, cutoff=0.2)
                 if len(hints) == 0:
                     print_hint("  - there are no similar terms in the dictionary!")
                 else:
@@ -122,6 +109,7 @@ def _check_list(list1: list, key: str, list2=None) -> bool:
 
 def check_schema_dict(ad_dict: dict):
     """Check schema and fields"""
+    from schema import Optional, Schema, SchemaError, Regex, And
 
     schema = Schema(
         {
@@ -151,58 +139,23 @@ def check_schema_dict(ad_dict: dict):
             raise SystemExit()
 
 
+def _validator(words=None) -> AdValidator:
+    """Return the compiled AD validator of a dictionary"""
+    return compiled(words, _check_list)
+
+
 def check_schema(ad_dict: dict, words=None):
-    """Check schema and fields"""
+    """Check schema and fields, report the errors of all the ADs"""
 
     # NOTE: Once stable move to https://github.com/SchemaStore/schemastore
-    schema = Schema(
-        {
-            Regex(r"^[a-z0-9_]+$"): {
-                "a": And(str, lambda a: len(a) > 0),
-                "d": And(Schema({str: [str]})),
-                Optional("year"): And(
-                    int, lambda year: (1980 <= year <= 2030) or year == 0
-                ),
-                # NOTE: surf ideally lists from the broadest to the most specific
-                "surf": And(
-                    Schema([str]),
-                    lambda surf: _check_list(surf, "surf", words),
-                ),
-                "vect": And(
-                    Schema([str]),
-                    lambda vect: _check_list(vect, "vect", words),
-                ),
-                "model": And(
-                    Schema([str]),
-                    lambda model: _check_list(model, "model", words),
-                ),
-                "tag": And(
-                    Schema([str]),
-                    lambda tag: _check_list(tag, "tag", words),
-                ),
-                Optional("req"): And(
-                    Schema([str]),
-                    lambda s: (len(s) > 0),
-                ),
-                # NOTE: we strip the CVE-nnnn
-                Optional("risk"): And(Schema(float), lambda s: s >= 0),
-                Optional("cve"): And(Schema([str]), lambda s: len(s) >= 0),
-                Optional("cwe"): And(Schema([str]), lambda s: len(s) >= 0),
-                Optional("capec"): And(Schema([str]), lambda s: len(s) >= 0),
-                Optional("vref"): And(Schema([str]), lambda s: len(s) >= 0),
-            }
-        }
-    )
-
-    try:
-        schema.validate(ad_dict)
-        print_verbose(f"check_schema: {len(ad_dict)} ads")
-    except SchemaError as se:
+    errors = _validator(words).validate(ad_dict)
+    if errors:
         print_err("AD format not compliant with schema!")
         if _VERBOSE_OUTPUT:
-            raise SystemExit(se)
+            raise SystemExit("\n".join(errors))
         else:
             raise SystemExit()
+    print_verbose(f"check_schema: {len(ad_dict)} ads")
 
 ##
 #
@@ -211,16 +164,17 @@ def check_schema(ad_dict: dict, words=None):
 def check(path: Path, words=None) -> dict:
     """Return a sanitized AD dict"""
 
-    # NOTE: file specific checks
+    ad_dict = None
+
+    # NOTE: file specific checks, YAML files are parsed by the lint stage
     match path.suffix:
         case ".yaml" | ".yml":
             print_verbose("Checking YAML syntax: " + str(path))
-            check_yamllint(path)
-
-    ad_dict = None
+            ad_dict = check_yamllint(path)
 
     try:
-        ad_dict = parse(path)
+        if ad_dict is None:
+            ad_dict = parse_cached(path)
         # NOTE: Python dict checks
         check_schema(ad_dict, words)
     except Exception as err:
@@ -231,75 +185,219 @@ def check(path: Path, words=None) -> dict:
     return ad_dict
 
 
+##
+# Expand input files, directories and glob patterns into AD files
+#
+def collect_inputs(inputs: list) -> list:
+    paths = []
+    seen = set()
+
+    for item in inputs:
+        if os.path.isdir(item):
+            found = sorted(p for p in Path(item).rglob("*") if p.suffix in AD_SUFFIXES and p.is_file())
+        elif os.path.isfile(item):
+            found = [Path(item)]
+        else:
+            found = sorted(Path(p) for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+
+        if len(found) == 0:
+            print_err("No AD file matches " + str(item) + "!")
+
+        for path in found:
+            if path.resolve() not in seen:
+                seen.add(path.resolve())
+                paths.append(path)
+
+    return paths
+
+
+# Dictionary shared with the batch workers, set once per worker process
+_BATCH_WORDS = None
+
+def _init_worker(words, verbose: bool, skip_clean_lint: bool):
+    global _BATCH_WORDS
+    global _VERBOSE_OUTPUT
+    global _SKIP_CLEAN_LINT
+
+    _BATCH_WORDS = words
+    _VERBOSE_OUTPUT = verbose
+    _SKIP_CLEAN_LINT = skip_clean_lint
+
+
+def _check_worker(path: Path) -> tuple:
+    """Check one AD file, return the path, the result and the captured output"""
+    output = io.StringIO()
+    passed = False
+
+    with contextlib.redirect_stdout(output):
+        try:
+            passed = check(path, _BATCH_WORDS) is not None
+        except SystemExit as err:
+            if err.code is not None:
+                print_err(str(err.code))
+
+    return path, passed, output.getvalue()
+
+
+##
+# Check many AD files in parallel and report a summary
+#
+# NOTE: the dictionary is sent once to every worker, not once per file
+#
+def check_batch(paths: list, words=None, jobs=None) -> int:
+    failed = 0
+
+    def report(results):
+        nonlocal failed
+        for path, passed, output in results:
+            if passed:
+                print_info(str(path) + ": passed")
+            else:
+                failed += 1
+                print_err(str(path) + ": failed")
+            if len(output) > 0:
+                print(output, end="")
+
+    if jobs == 1:
+        _init_worker(words, _VERBOSE_OUTPUT, _SKIP_CLEAN_LINT)
+        report(map(_check_worker, paths))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(words, _VERBOSE_OUTPUT, _SKIP_CLEAN_LINT),
+        ) as pool:
+            report(pool.map(_check_worker, paths))
+
+    print_info(str(len(paths)) + " files checked, " + str(failed) + " failed.")
+
+    return failed
+
+
+##
+# Check only the ADs added or changed since the last run of the AD file
+#
+# NOTE: context identifies the dictionary, a new dictionary checks all ADs
+#
+def check_incremental(path: Path, words=None, state=None, context: str = "") -> bool:
+    if state is None:
+        state = AdState()
+
+    ad_dict = None
+    match path.suffix:
+        case ".yaml" | ".yml":
+            print_verbose("Checking YAML syntax: " + str(path))
+            ad_dict = check_yamllint(path)
+    try:
+        if ad_dict is None:
+            ad_dict = parse_cached(path)
+    except Exception as err:
+        print_err("Parsing " + str(path) +  " failed!")
+        print_verbose(err)
+        return False
+    if not isinstance(ad_dict, dict):
+        check_schema(ad_dict, words)
+
+    changes = state.changes(path, ad_dict, context)
+    print_info(str(len(changes.added)) + " ADs added, " + str(len(changes.changed)) + " changed, "
+               + str(len(changes.removed)) + " removed, " + str(len(changes.unchanged)) + " unchanged.")
+
+    todo = changes.added + changes.changed
+    passed = []
+    validator = _validator(words)
+    for key in todo:
+        errors = validator.validate_ad(key, ad_dict[key])
+        if errors:
+            print_err("AD \"" + str(key) + "\" not compliant with schema!")
+            for err in errors:
+                print_verbose(err)
+        else:
+            passed.append(key)
+
+    # NOTE: similarity of the new compliant ADs with the compliant ADs of the file
+    if len(passed) > 0:
+        from similarity import SimilarityIndex
+
+        # NOTE: unchanged ADs passed validation in a previous run
+        valid = set(passed).union(changes.unchanged)
+        index = SimilarityIndex({key: ad for key, ad in ad_dict.items() if key in valid})
+        for match in index.similar({key: ad_dict[key] for key in passed}, _SCORE):
+            if match.ad1 == match.ad2:
+                continue
+            print_hint("Similar ADs " + "(" + str(round(1-match.score,2)) + "): " + match.ad1 + ", " + match.ad2 + ":")
+            if len(match.log) > 0:
+                print_verbose("Symptoms: " + match.log)
+
+    state.update(path, ad_dict, passed, context)
+    state.save()
+
+    return len(passed) == len(todo)
+
+
+##
+# Check the AD file again on every change, until interrupted
+#
+# NOTE: polls the file modification time, no inotify dependency
+#
+def watch(path: Path, words=None, interval: float = 1.0, context: str = ""):
+    state = AdState()
+    last = None
+
+    print_info("Watching " + str(path) + ", press Ctrl-C to stop.")
+    try:
+        while True:
+            try:
+                stat = os.stat(path)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                stamp = None
+
+            if stamp != last:
+                last = stamp
+                if stamp is None:
+                    print_err("File " + str(path) + " not found!")
+                else:
+                    try:
+                        check_incremental(path, words, state, context)
+                    except SystemExit as err:
+                        if err.code is not None:
+                            print_err(str(err.code))
+
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
 ##
 # Compare two AD files and report simiarities
 #
 # NOTE: compliant AD files expected (check AD file first)
 #
 def compare(in1: Path, in2: Path):
+    from similarity import similar_ads
 
     global _SCORE
+    global _BRUTE_FORCE
 
     try:
-        ad1_dict = parse(in1)
-        ad2_dict = parse(in2)
+        ad1_dict = parse_cached(in1)
+        ad2_dict = parse_cached(in2)
     except Exception as err:
         print_err("Parsing " + str(in1) + ", "  + str(in2) + " failed!")
         print_verbose(err)
         raise SystemExit()
 
-    for ad1 in ad1_dict.items():
-        for ad2 in ad2_dict.items():
-            log = ""
-            score = 1.0 # different ADs have score close to 1.0
-            if ad1[0] == ad2[0]:
-                print("Duplicate key: " + ad1[0] + "," + ad2[0])
-                score = 0.0
-                continue
+    for match in similar_ads(ad1_dict, ad2_dict, _SCORE, _BRUTE_FORCE):
+        if match.ad1 == match.ad2:
+            print("Duplicate key: " + match.ad1 + "," + match.ad2)
+            continue
+
+        print_hint("Similar ADs " + "(" + str(round(1-match.score,2)) + "): " + match.ad1 + ", " + match.ad2 + ":")
 
-            if "tid" in ad1[1].keys():
-                if "tid" in ad2[1].keys():
-                    if ad1[1]["tid"] == ad2[1]["tid"]:
-                        log = log + "identic TID, "
-                        score = score / 2
-
-            if "pid" in ad1[1].keys():
-                if "pid" in ad2[1].keys():
-                    if ad1[1]["pid"] == ad2[1]["pid"]:
-                        log = log + "identic PID, "
-                        score = score / 4
-
-            if "cve" in ad1[1].keys():
-                if "cve" in ad2[1].keys():
-                    if ad1[1]["cve"] == ad2[1]["cve"]:
-                        log = log + "identic CVE, "
-                        score = score / 2
-
-            if "cwe" in ad1[1].keys():
-                if "cwe" in ad2[1].keys():
-                    for cwe in ad1[1]["cwe"]:
-                        if cwe in ad2[1]["cwe"]:
-                            log = log + "identic CWE, "
-                            score = score / 1.5
-                            break
-
-            for tag in {"surf", "tag", "model", "vect"}:
-                for cross in (set(ad1[1][tag]) - set(ad2[1][tag])):
-                    if len(cross) < len(ad1[1][tag]):
-                        log = log + "matching " + tag + ", "
-                        score = score / 1.25
-                        break
-
-            adiff = SequenceMatcher(None, ad1[1]["a"], ad2[1]["a"]).ratio()
-            if adiff > 0.2:
-                score = score / (1 + adiff/2)
-                log = log + "attack description, "
-
-            if score < _SCORE:
-                print_hint("Similar ADs " + "(" + str(round(1-score,2)) + "): " + ad1[0] + ", " + ad2[0] + ":")
-
-                if len(log) > 0:
-                    print_verbose("Symptoms: " + log)
+        if len(match.log) > 0:
+            print_verbose("Symptoms: " + match.log)
 
 ##
 # Generate dictionary based on the content of an AD file
@@ -319,7 +417,7 @@ def gendict(ad: Path):
     }
 
     try:
-        dict = parse(ad)
+        dict = parse_cached(ad)
     except Exception as err:
         print_err("Parsing " + str(ad) + " failed!")
         print_verbose(err)
@@ -351,91 +449,134 @@ def gendict(ad: Path):
                 print("        tid:")
 
 
-if __name__ == "__main__":
+##
+# Load and check a dictionary file
+#
+# NOTE: kept until the file changes, a server checks many files with it
+#
+_DICTIONARIES = {}
+
+def load_dictionary(path: str) -> Dictionary:
+    if not os.path.isfile(path):
+        print_err("Dictionary " + path + " not found!")
+        raise SystemExit()
+
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if key in _DICTIONARIES and _DICTIONARIES[key][0] == stamp:
+        print_info("Dictionary loaded.")
+        return _DICTIONARIES[key][1]
+
+    # read words
+    print_verbose("Checking the dictionary YAML syntax: " + str(path))
+    parsed_dict = check_yamllint(path)
+
+    try:
+        # NOTE: Python dict checks
+        check_schema_dict(parsed_dict)
+    except Exception as err:
+        print_err("Checking " + str(path) + " failed!")
+        print_verbose(str(err))
+        raise SystemExit()
+
+    try:
+        dictionary = Dictionary(parsed_dict)
+    except DictionaryError as err:
+        print_err(str(err))
+        raise SystemExit()
+
+    print_verbose("Loaded PIDs: " + str(sorted(dictionary.pid_words)))
+    print_verbose("Loaded TIDs: " + str(sorted(dictionary.tid_words)))
 
+    _DICTIONARIES[key] = (stamp, dictionary)
+    print_info("Dictionary loaded.")
+
+    return dictionary
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description = 'AD Checker')
     parser.add_argument('-v', '--verbose', help='Show detailed debug output', action='store_true')
-    parser.add_argument('-i', '--input', help='Input AD file name', required=True)
+    parser.add_argument('-i', '--input', help='Input AD file name, or AD files, directories and glob patterns to check in parallel', nargs='+', required=True)
+    parser.add_argument('-j', '--jobs', help='Number of parallel workers when checking many AD files (default: number of CPUs)', type=int)
     parser.add_argument('-d', '--dict', help='Dictionary file name')
     parser.add_argument('-g', '--gendict', help='Generate dictionary from the AD file', action='store_true')
     parser.add_argument('-c', '--compare', help='AD file name for comparison with the input file')
     parser.add_argument('-s', '--score', help='AD file similarity score threshold when comaring two ADs [0, 1.0] (higher is higher similarity)')
+    parser.add_argument('--skip-clean-lint', help='Skip yamllint for YAML files unchanged since their last clean lint', action='store_true')
+    parser.add_argument('--incremental', help='Only check the ADs added or changed since the last run', action='store_true')
+    parser.add_argument('--watch', help='Check the changed ADs again whenever the input file changes', action='store_true')
+    parser.add_argument('--interval', help='Polling interval in seconds for --watch (default: 1.0)', type=float, default=1.0)
+    parser.add_argument('--brute-force', help='Compare every pair of ADs instead of using the similarity indexes', action='store_true')
+
+    return parser
 
-    args = parser.parse_args()
+
+##
+# Run the tool with the command line arguments argv (sys.argv if None)
+#
+# NOTE: raises SystemExit on errors, as the command line tool
+#
+def main(argv: list = None):
+    global _VERBOSE_OUTPUT
+    global _BRUTE_FORCE
+    global _SKIP_CLEAN_LINT
+    global _SCORE
+
+    args = build_parser().parse_args(argv)
 
     _VERBOSE_OUTPUT = args.verbose
+    _BRUTE_FORCE = args.brute_force
+    _SKIP_CLEAN_LINT = args.skip_clean_lint
 
     if args.dict == None:
         # No dictionary - do not check against dictionary
-        DICT_WORDS = None
+        dictionary = None
+    else:
+        dictionary = load_dictionary(args.dict)
+
+    # check if a custom score is provided
+    _SCORE = _DEFAULT_SCORE
+    if args.score == None:
+        pass
+    elif (type(float(args.score)) is float) and (float(args.score) <= 1.0):
+        _SCORE = 1.0 - float(args.score)
+        print_verbose("Using score: " + str(_SCORE))
     else:
-        # Read the dictionary
-        if os.path.isfile(args.dict):
-            # read words
-            print_verbose("Checking the dictionary YAML syntax: " + str(args.dict))
-            check_yamllint(args.dict)
+        print_err("Invalid score: " + str(args.score))
 
-            try:
-                parsed_dict = parse(Path(args.dict))
-            except Exception as err:
-                print_err("Parsing " + str(args.dict) + " failed!")
-                print_verbose(str(err))
-                raise SystemExit()
+    if args.incremental or args.watch:
+        # Incremental mode - check the ADs changed since the last run
+        if len(args.input) > 1 or not os.path.isfile(args.input[0]):
+            print_err("Incremental check needs a single input file!")
+            raise SystemExit()
 
-            try:
-                # NOTE: Python dict checks
-                check_schema_dict(parsed_dict)
-            except Exception as err:
-                print_err("Checking " + str(args.dict) + " failed!")
-                print_verbose(str(err))
-                raise SystemExit()
+        context = ""
+        if args.dict != None:
+            context = content_digest(Path(args.dict).read_bytes())
 
-            for dicts in ["surf" , "vect", "model", "tag"]:
-                del DICT_WORDS[dicts][:]
-
-                # Add primary keys to the dictionary
-                for item, value in parsed_dict[dicts].items():
-                    if item in DICT_WORDS[dicts]:
-                        print_err("Dictionary \"" + dicts + "\" contains duplicate term: \"" + item + "\"")
-                        raise SystemExit()
-                    else:
-                        DICT_WORDS[dicts].append(item)
-
-                    # Add aliases to the dictionary
-                    effective_aliases = [] # remember processed aliases to add to MM3ED-helper arrays
-                    for alias in parsed_dict[dicts][item]["alias"]:
-                        if alias == item:
-                            # already in dictionary - alias equal to the primary key is enabled
-                            pass
-                        elif alias in DICT_WORDS[dicts]:
-                            # conflict of alias with other item key
-                            print_err("Dictionary contains duplicate term: \"" + alias + "\" (alias of: \"" + item + "\")")
-                            raise SystemExit()
-                        else:
-                            DICT_WORDS[dicts].append(alias)
-                            effective_aliases.append(alias)
-
-                    # MITRE EM3ED mapping - PID mapping
-                    if dicts == "surf":
-                        if "pid" in parsed_dict[dicts][item]:
-                            DICT_SURF_PID.append(item)
-                            DICT_SURF_PID += effective_aliases
-                    if dicts == "vect":
-                        if "tid" in parsed_dict[dicts][item]:
-                            DICT_SURF_TID.append(item)
-                            DICT_SURF_TID += effective_aliases
-
-            print_verbose("Loaded PIDs: " + str(DICT_SURF_PID))
-            print_verbose("Loaded TIDs: " + str(DICT_SURF_TID))
-
-            print_info("Dictionary loaded.")
+        if args.watch:
+            watch(Path(args.input[0]), dictionary, args.interval, context)
+        elif not check_incremental(Path(args.input[0]), dictionary, None, context):
+            raise SystemExit(1)
 
-        else:
-            print_err("Dictionary " + args.dict + " not found!")
+    elif len(args.input) > 1 or not os.path.isfile(args.input[0]):
+        # Batch mode - check every AD file found in the inputs
+        if args.gendict or args.compare != None:
+            print_err("Dictionary generation and comparison need a single input file!")
             raise SystemExit()
 
-    if os.path.isfile(args.input):
-        check(Path(args.input), DICT_WORDS)
+        paths = collect_inputs(args.input)
+        if len(paths) == 0:
+            raise SystemExit(1)
+
+        if check_batch(paths, dictionary, args.jobs) > 0:
+            raise SystemExit(1)
+
+    else:
+        args.input = args.input[0]
+        check(Path(args.input), dictionary)
 
         print_info("Input file processed.")
 
@@ -449,15 +590,7 @@ if __name__ == "__main__":
         # Copare ADs in the input and compare files
         if args.compare != None:
             if os.path.isfile(args.compare):
-                check(Path(args.compare), DICT_WORDS)
-                # check if a custom score is provided
-                if args.score == None:
-                    pass
-                elif (type(float(args.score)) is float) and (float(args.score) <= 1.0):
-                    _SCORE = 1.0 - float(args.score)
-                    print_verbose("Using score: " + str(_SCORE))
-                else:
-                    print_err("Invalid score: " + str(args.score))
+                check(Path(args.compare), dictionary)
                 # Display similar items
                 compare(Path(args.input), Path(args.compare))
 
@@ -467,7 +600,5 @@ if __name__ == "__main__":
                 raise SystemExit()
 
 
-    else:
-        print_err("File " + args.input + " not found!")
-        raise SystemExit()
-
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+check_tool_test.py
+
+"""
+import multiprocessing
+import shutil
+from pathlib import Path
+
+import pytest
+
+import check_tool
+from check_tool import (
+    check_batch,
+    collect_inputs,
+)
+
+
+def _catalog(tmp_path) -> Path:
+    """Return a directory of AD files, one of them not compliant"""
+    root = tmp_path / "ads"
+    (root / "sub").mkdir(parents=True)
+    shutil.copy("catalog-mitre/bt.yaml", root / "bt.yaml")
+    shutil.copy("catalog-mitre/software.yaml", root / "sub" / "software.yaml")
+    (root / "sub" / "bad.json").write_text('{"knob": {"a": "no d"}}')
+    (root / "notes.txt").write_text("not an AD file")
+    return root
+
+
+def test_collect_inputs(tmp_path):
+    """Test directories and globs expand to AD files, each once."""
+    root = _catalog(tmp_path)
+
+    assert collect_inputs([str(root)]) == [root / "bt.yaml", root / "sub" / "bad.json", root / "sub" / "software.yaml"]
+    assert collect_inputs([str(root / "**" / "*.yaml"), str(root / "bt.yaml")]) == [
+        root / "bt.yaml",
+        root / "sub" / "software.yaml",
+    ]
+    assert collect_inputs([str(root / "*.toml")]) == []
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_batch(tmp_path, jobs, capsys):
+    """Test a batch with a non compliant file fails."""
+    root = _catalog(tmp_path)
+
+    assert check_batch(collect_inputs([str(root)]), None, jobs) == 1
+    assert "bad.json: failed" in capsys.readouterr().out
+    with pytest.raises(SystemExit) as err:
+        check_tool.main(["-i", str(root), "-j", str(jobs)])
+    assert err.value.code == 1
+
+    check_tool.main(["-i", str(root / "bt.yaml"), str(root / "sub" / "software.yaml"), "-j", str(jobs)])
+
+
+def test_batch_error(tmp_path, monkeypatch):
+    """Test the workers are stopped when reporting the results fails."""
+    root = _catalog(tmp_path)
+
+    def print_info(msg: str):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(check_tool, "print_info", print_info)
+    with pytest.raises(KeyboardInterrupt):
+        check_batch(collect_inputs([str(root)]), None, 2)
+    assert multiprocessing.active_children() == []
@@ -0,0 +1,171 @@
+"""
+defense_coverage.py
+
+Which defense mechanisms mitigate the most risk.
+
+An AD is covered by a mechanism listed in its d field (under any policy).
+Given a budget of mechanisms, the best selection covers the ADs with the
+highest total risk: a budgeted maximum coverage problem, or a weighted set
+cover problem without budget (cover every AD some mechanism defends).
+
+greedy() picks the mechanism with the highest risk gain until the budget is
+used, evaluating the gains lazily: a gain only decreases as ADs get covered,
+so a mechanism whose stale gain is still the highest after an update is the
+best. It is within (1 - 1/e) of the optimum. exact() is a branch and bound
+for small instances: dominated mechanisms (covering a subset of the ADs of
+another) are dropped, and a branch stops when the current risk plus the best
+gains for the remaining budget cannot beat the best selection.
+
+"""
+
+import heapq
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from store import numeric_risks
+
+
+class Coverage(NamedTuple):
+    """Selected mechanisms, with their risk gains in selection order"""
+
+    mechanisms: list
+    gains: list
+    covered: float
+    total: float
+    ads: list
+
+
+class CoverageProblem:
+    """Mechanism x AD incidence of a DataFrame, weighted by risk"""
+
+    def __init__(self, ads: pd.DataFrame, default_risk: float = 1.0):
+        self.index = np.array(ads.index, dtype=object)
+
+        # NOTE: ADs without a numeric risk weigh default_risk
+        risks = numeric_risks(ads)
+        self.weights = np.where(np.isinf(risks), default_risk, risks)
+
+        rows = {}
+        policies = {}
+        defenses = ads["d"] if "d" in ads else [None] * len(ads)
+        for row, d in enumerate(defenses):
+            if not isinstance(d, dict):
+                continue
+            for policy, mechanisms in d.items():
+                for mechanism in mechanisms or []:
+                    rows.setdefault(mechanism, set()).add(row)
+                    policies.setdefault(mechanism, set()).add(policy)
+
+        self.mechanisms = sorted(rows)
+        # NOTE: sorted AD rows of every mechanism, the sparse incidence
+        self.rows = [np.array(sorted(rows[m]), dtype=np.int64) for m in self.mechanisms]
+        self.policies = {m: sorted(policies[m]) for m in self.mechanisms}
+
+    def incidence(self) -> np.ndarray:
+        """Return the dense mechanism x AD boolean matrix"""
+        matrix = np.zeros((len(self.mechanisms), len(self.index)), dtype=bool)
+        for i, rows in enumerate(self.rows):
+            matrix[i, rows] = True
+        return matrix
+
+    def _gain(self, i: int, covered: np.ndarray) -> float:
+        rows = self.rows[i]
+        return float(self.weights[rows[~covered[rows]]].sum())
+
+    def _coverage(self, selected: list, gains: list, covered: np.ndarray) -> Coverage:
+        return Coverage(
+            [self.mechanisms[i] for i in selected],
+            gains,
+            float(self.weights[covered].sum()),
+            float(self.weights[self._coverable()].sum()),
+            list(self.index[covered]),
+        )
+
+    def _coverable(self) -> np.ndarray:
+        return np.unique(np.concatenate(self.rows)) if self.rows else np.zeros(0, dtype=np.int64)
+
+    def greedy(self, budget: int = None) -> Coverage:
+        """Return the greedy selection of at most budget mechanisms, until
+        every AD is covered if budget is None"""
+
+        covered = np.zeros(len(self.index), dtype=bool)
+        selected, gains = [], []
+        # NOTE: (-gain, mechanism, number of selected mechanisms at evaluation)
+        heap = [(-self._gain(i, covered), i, 0) for i in range(len(self.mechanisms))]
+        heapq.heapify(heap)
+
+        while heap and (budget is None or len(selected) < budget):
+            gain, i, stamp = heapq.heappop(heap)
+            if stamp != len(selected):
+                heapq.heappush(heap, (-self._gain(i, covered), i, len(selected)))
+                continue
+            if -gain <= 0:
+                break
+            selected.append(i)
+            gains.append(-gain)
+            covered[self.rows[i]] = True
+
+        return self._coverage(selected, gains, covered)
+
+    def exact(self, budget: int = None, max_mechanisms: int = 64) -> Coverage:
+        """Return an optimal selection of at most budget mechanisms, without
+        limit if budget is None. Raise ValueError if more than max_mechanisms
+        remain after dropping the dominated ones."""
+
+        # NOTE: a dominated mechanism never beats the one dominating it
+        sets = [frozenset(rows.tolist()) for rows in self.rows]
+        order = sorted(range(len(sets)), key=lambda i: (-len(sets[i]), i))
+        candidates = []
+        for i in order:
+            if sets[i] and not any(sets[i] <= sets[j] for j in candidates):
+                candidates.append(i)
+        if len(candidates) > max_mechanisms:
+            raise ValueError(
+                f"{len(candidates)} mechanisms, exact() is limited to {max_mechanisms}: use greedy()"
+            )
+        candidates.sort(key=lambda i: (-self._gain(i, np.zeros(len(self.index), dtype=bool)), i))
+        if budget is None:
+            budget = len(candidates)
+
+        best = self.greedy(budget)
+        best_value = best.covered
+        best_selection = [self.mechanisms.index(m) for m in best.mechanisms]
+
+        def search(start: int, selected: list, covered: np.ndarray, value: float):
+            nonlocal best_value, best_selection
+            if value > best_value + 1e-9:
+                best_value, best_selection = value, list(selected)
+            remaining = budget - len(selected)
+            if remaining == 0 or start == len(candidates):
+                return
+            gains = [self._gain(i, covered) for i in candidates[start:]]
+            if value + sum(sorted(gains, reverse=True)[:remaining]) <= best_value + 1e-9:
+                return
+            for offset, i in enumerate(candidates[start:]):
+                if gains[offset] <= 0:
+                    continue
+                after = covered.copy()
+                after[self.rows[i]] = True
+                search(start + offset + 1, selected + [i], after, value + gains[offset])
+
+        search(0, [], np.zeros(len(self.index), dtype=bool), 0.0)
+
+        # NOTE: report the gains in greedy order of the optimal selection
+        covered = np.zeros(len(self.index), dtype=bool)
+        selected, gains = [], []
+        left = list(best_selection)
+        while left:
+            i = max(left, key=lambda i: (self._gain(i, covered), -i))
+            gains.append(self._gain(i, covered))
+            selected.append(i)
+            covered[self.rows[i]] = True
+            left.remove(i)
+        return self._coverage(selected, gains, covered)
+
+
+def best_defenses(ads: pd.DataFrame, budget: int = 10, exact: bool = False, default_risk: float = 1.0) -> Coverage:
+    """Return the budget mechanisms covering the most risk of ads"""
+    problem = CoverageProblem(ads, default_risk)
+    return problem.exact(budget) if exact else problem.greedy(budget)
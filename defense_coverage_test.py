@@ -0,0 +1,56 @@
+"""
+defense_coverage_test.py
+
+"""
+import itertools
+from pathlib import Path
+
+import numpy as np
+
+from analyze import get_coverage, get_dataframe
+from defense_coverage import CoverageProblem
+from store import ad_dataframe
+
+
+def _ads(mechanisms: dict) -> dict:
+    """AD -> mechanisms to an AD dict with risk 1"""
+    ads = {}
+    for mechanism, keys in mechanisms.items():
+        for key in keys:
+            ads.setdefault(key, {"a": key, "risk": 1.0, "d": {"policy": []}})
+            ads[key]["d"]["policy"].append(mechanism)
+    return ads
+
+
+def test_exact():
+    """Test branch and bound beats greedy when greedy is not optimal."""
+    ads = ad_dataframe(_ads({"m1": ["a1", "a2", "a3", "a4"], "m2": ["a1", "a2", "a5"], "m3": ["a3", "a4", "a6"]}))
+    problem = CoverageProblem(ads)
+
+    assert problem.greedy(2).mechanisms[0] == "m1"
+    assert problem.greedy(2).covered == 5.0
+    assert sorted(problem.exact(2).mechanisms) == ["m2", "m3"]
+    assert problem.exact(2).covered == 6.0
+    assert problem.greedy().covered == problem.greedy().total == 6.0
+    assert problem.exact().covered == problem.exact().total == 6.0
+
+
+def test_greedy():
+    """Test the lazy greedy against the best subsets of a catalog."""
+    ads = get_dataframe(Path("catalog-mitre/bt.yaml"))
+    problem = CoverageProblem(ads)
+
+    coverage = get_coverage(ads, 5)
+    assert len(coverage.mechanisms) == 5
+    assert coverage.gains == sorted(coverage.gains, reverse=True)
+    assert abs(sum(coverage.gains) - coverage.covered) < 1e-9
+
+    small = CoverageProblem(ads.iloc[:15])
+    for budget in [1, 2, 3]:
+        best = max(
+            small.weights[np.unique(np.concatenate([small.rows[i] for i in c]))].sum()
+            for c in itertools.combinations(range(len(small.mechanisms)), budget)
+        )
+        assert abs(small.exact(budget).covered - best) < 1e-9
+        assert small.greedy(budget).covered <= best + 1e-9
+    assert problem.exact(5).covered >= problem.greedy(5).covered
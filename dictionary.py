@@ -0,0 +1,133 @@
+"""
+dictionary.py
+
+Indexed AD dictionary: the allowed surf, vect, model and tag terms.
+
+A dictionary file maps each term to its aliases, a description and optionally
+a MITRE EMB3D pid (surf) or tid (vect):
+
+    surf:
+        Kernel or Operating System:
+            alias: [OS, Linux, Kernel]
+            description: "Device includes OS/kernel"
+            pid: 23
+
+The Dictionary is built once and only uses hash lookups, so checking a word
+does not depend on the size of the dictionary.
+
+"""
+
+from pathlib import Path
+
+from parse import parse_cached
+
+KEYS = ["surf", "vect", "model", "tag"]
+
+
+class DictionaryError(Exception):
+    """Invalid dictionary content, e.g., a duplicate term"""
+
+
+class Dictionary:
+    """Terms and aliases of an AD dictionary
+
+    dictionary[key] is the frozenset of the accepted words (terms and
+    aliases) for key, so a Dictionary can be used wherever a dict of word
+    lists is expected.
+    """
+
+    def __init__(self, parsed_dict: dict):
+        # NOTE: key -> primary terms, key -> word -> primary term
+        self.terms = {}
+        self.canonical = {}
+        # NOTE: word -> pid (surf) and word -> tid (vect), aliases included
+        self.pid = {}
+        self.tid = {}
+
+        for key in KEYS:
+            canonical = {}
+
+            for term, value in parsed_dict[key].items():
+                if term in canonical:
+                    raise DictionaryError(
+                        'Dictionary "' + key + '" contains duplicate term: "' + term + '"'
+                    )
+                canonical[term] = term
+
+                words = [term]
+                for alias in value["alias"]:
+                    if alias == term:
+                        # NOTE: alias equal to the primary term is enabled
+                        continue
+                    if alias in canonical:
+                        raise DictionaryError(
+                            'Dictionary contains duplicate term: "'
+                            + alias
+                            + '" (alias of: "'
+                            + term
+                            + '")'
+                        )
+                    canonical[alias] = term
+                    words.append(alias)
+
+                # NOTE: MITRE EMB3D mapping
+                if key == "surf" and "pid" in value:
+                    self.pid.update(dict.fromkeys(words, value["pid"]))
+                if key == "vect" and "tid" in value:
+                    self.tid.update(dict.fromkeys(words, value["tid"]))
+
+            self.terms[key] = frozenset(parsed_dict[key])
+            self.canonical[key] = canonical
+
+        self.words = {key: frozenset(self.canonical[key]) for key in KEYS}
+        self.pid_words = frozenset(self.pid)
+        self.tid_words = frozenset(self.tid)
+
+        # NOTE: suggestion indexes, built on the first unknown word
+        self._suggestions = {}
+
+    def __getstate__(self) -> dict:
+        # NOTE: the suggestion indexes are rebuilt on demand after unpickling
+        state = self.__dict__.copy()
+        state["_suggestions"] = {}
+        return state
+
+    @classmethod
+    def load(cls, path: Path) -> "Dictionary":
+        """Load a dictionary file"""
+        return cls(parse_cached(Path(path)))
+
+    def __getitem__(self, key: str) -> frozenset:
+        return self.words[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.words
+
+    def keys(self) -> list:
+        return list(KEYS)
+
+    def missing(self, key: str, words: list) -> list:
+        """Return the words not in the dictionary, without duplicates"""
+        allowed = self.words[key]
+        return [w for w in dict.fromkeys(words) if w not in allowed]
+
+    def term(self, key: str, word: str) -> str:
+        """Return the primary term of a word, None if unknown"""
+        return self.canonical[key].get(word)
+
+    def suggest(self, key: str, word: str, n: int = 3, cutoff: float = 0.2) -> list:
+        """Return the words closest to an unknown word, as get_close_matches"""
+        if key not in self._suggestions:
+            # NOTE: numpy is imported with the first suggestion only
+            from suggest import SuggestionIndex
+
+            self._suggestions[key] = SuggestionIndex(self.words[key])
+        return self._suggestions[key].suggest(word, n, cutoff)
+
+    def has_pid(self, words: list) -> bool:
+        """Return True if at least one surf word has a pid"""
+        return not self.pid_words.isdisjoint(words)
+
+    def has_tid(self, words: list) -> bool:
+        """Return True if at least one vect word has a tid"""
+        return not self.tid_words.isdisjoint(words)
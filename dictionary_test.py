@@ -0,0 +1,47 @@
+"""
+dictionary_test.py
+
+"""
+from pathlib import Path
+import pytest
+
+from dictionary import (
+    Dictionary,
+    DictionaryError,
+)
+
+
+def test_dictionary():
+    """Test term, alias and EMB3D lookups using the bt dictionary."""
+    bt = Dictionary.load(Path("dicts/bt.yaml"))
+
+    assert "Kernel or Operating System" in bt["surf"]
+    assert "Linux" in bt["surf"]
+    assert bt.term("surf", "Linux") == "Kernel or Operating System"
+    assert bt.term("surf", "Unknown") is None
+    assert bt.pid["Linux"] == 23
+    assert bt.has_pid(["Pairing", "Linux"])
+    assert not bt.has_pid(["Pairing"])
+    assert bt.missing("surf", ["Linux", "Unknown", "Unknown"]) == ["Unknown"]
+
+    for path in Path("dicts").glob("*.yaml"):
+        words = Dictionary.load(path)
+        for key in words.keys():
+            assert words.terms[key] <= words[key]
+
+
+def test_duplicates():
+    """Test duplicate terms and aliases are rejected."""
+    entry = {"alias": [], "description": "d"}
+    parsed = {"surf": {"A": entry}, "vect": {}, "model": {}, "tag": {}}
+
+    parsed["surf"]["B"] = {"alias": ["A"], "description": "d"}
+    with pytest.raises(DictionaryError):
+        Dictionary(parsed)
+
+    parsed["surf"]["B"] = {"alias": ["B", "C", "C"], "description": "d"}
+    with pytest.raises(DictionaryError):
+        Dictionary(parsed)
+
+    parsed["surf"]["B"] = {"alias": ["B", "C"], "description": "d"}
+    assert Dictionary(parsed).term("surf", "C") == "B"
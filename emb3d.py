@@ -0,0 +1,290 @@
+"""
+emb3d.py
+
+Index of the MITRE EMB3D STIX bundle (mitre/emb3d-stix-2.0.1.json).
+
+The bundle objects are decoded one at a time from the objects array and only
+the fields needed to join with the ADs are kept: the properties (PID), the
+threats (TID, the STIX vulnerabilities) and the mitigations (MID, the STIX
+courses of action) by number and by STIX id, and the relationships as
+adjacency maps:
+
+    PID -> TIDs, TID -> PIDs        relates-to
+    MID -> TIDs, TID -> MIDs        mitigates
+    PID -> parent PID, subPIDs      subproperty-of
+
+The index is pickled in the parse cache directory (see parse.py), keyed by
+the bundle content, so later loads skip the JSON decoding.
+
+Usage: python emb3d.py [-i bundle] [--pid PID] [--tid TID] [--mid MID]
+
+"""
+
+import argparse
+import json
+import os
+import pickle
+import re
+from pathlib import Path
+from typing import NamedTuple
+
+import parse
+from parse import content_digest
+
+BUNDLE = Path(__file__).parent / "mitre" / "emb3d-stix-2.0.1.json"
+
+# NOTE: bump when the index changes, it invalidates the cached indexes
+INDEX_VERSION = 1
+
+
+class Property(NamedTuple):
+    pid: int
+    id: str
+    name: str
+    category: str
+    parent: int
+
+
+class Threat(NamedTuple):
+    tid: int
+    id: str
+    name: str
+    category: str
+    maturity: str
+    cwe: tuple
+    cve: tuple
+
+
+class Mitigation(NamedTuple):
+    mid: int
+    id: str
+    name: str
+    maturity: str
+
+
+def _number(emb3d_id: str) -> int:
+    """Return the number of a PID-11, TID-101 or MID-001 id"""
+    return int(emb3d_id.split("-", 1)[1])
+
+
+def iter_objects(text: str):
+    """Yield the objects of a STIX bundle one at a time
+
+    The standard library has no streaming JSON parser: the top level of the
+    bundle is scanned here and every object of its objects array is decoded
+    on its own, so the bundle is never held as one tree.
+    """
+
+    decoder = json.JSONDecoder()
+    space = re.compile(r"[\s,]*")
+
+    def skip(pos: int, expected: str = None) -> int:
+        pos = space.match(text, pos).end()
+        if expected is not None:
+            if text[pos : pos + 1] != expected:
+                raise ValueError(f"expected {expected!r} at {pos}")
+            pos = space.match(text, pos + 1).end()
+        return pos
+
+    pos = skip(0, "{")
+    while text[pos : pos + 1] != "}":
+        key, pos = decoder.raw_decode(text, pos)
+        pos = skip(pos, ":")
+        if key != "objects":
+            _, pos = decoder.raw_decode(text, pos)
+            pos = skip(pos)
+            continue
+        pos = skip(pos, "[")
+        while text[pos : pos + 1] != "]":
+            obj, pos = decoder.raw_decode(text, pos)
+            yield obj
+            pos = skip(pos)
+        pos = skip(pos + 1)
+
+
+class Emb3d:
+    """EMB3D properties, threats and mitigations with their relationships"""
+
+    def __init__(self, objects):
+        self.version = None
+        self.properties = {}
+        self.threats = {}
+        self.mitigations = {}
+        # NOTE: STIX id -> ("pid" | "tid" | "mid", number)
+        self.ids = {}
+
+        relationships = []
+        for obj in objects:
+            kind = obj.get("type")
+            if kind == "x-mitre-emb3d-property":
+                pid = _number(obj["x_mitre_emb3d_property_id"])
+                self.properties[pid] = Property(pid, obj["id"], obj["name"], obj.get("category"), None)
+                self.ids[obj["id"]] = ("pid", pid)
+            elif kind == "vulnerability":
+                tid = _number(obj["x_mitre_emb3d_threat_id"])
+                cwe = tuple(dict.fromkeys(re.findall(r"CWE-(\d+)", obj.get("x_mitre_emb3d_threat_CWEs", ""))))
+                cve = tuple(dict.fromkeys(re.findall(r"CVE-\d+-\d+", obj.get("x_mitre_emb3d_threat_CVEs", ""))))
+                self.threats[tid] = Threat(
+                    tid,
+                    obj["id"],
+                    obj["name"],
+                    obj.get("x_mitre_emb3d_threat_category"),
+                    obj.get("x_mitre_emb3d_threat_maturity"),
+                    cwe,
+                    cve,
+                )
+                self.ids[obj["id"]] = ("tid", tid)
+            elif kind == "course-of-action":
+                mid = _number(obj["x_mitre_emb3d_mitigation_id"])
+                self.mitigations[mid] = Mitigation(
+                    mid, obj["id"], obj["name"], obj.get("x_mitre_emb3d_mitigation_maturity")
+                )
+                self.ids[obj["id"]] = ("mid", mid)
+            elif kind == "relationship":
+                relationships.append((obj["relationship_type"], obj["source_ref"], obj["target_ref"]))
+            elif kind == "identity":
+                self.version = obj.get("x_mitre_emb3d_version")
+
+        self.pid_tids = {}
+        self.tid_pids = {}
+        self.mid_tids = {}
+        self.tid_mids = {}
+        self.subproperties = {}
+        # NOTE: the relationships may come before their objects
+        for kind, source, target in relationships:
+            source, target = self.ids.get(source), self.ids.get(target)
+            if source is None or target is None:
+                continue
+            match (kind, source[0], target[0]):
+                case ("relates-to", "pid", "tid"):
+                    self.pid_tids.setdefault(source[1], []).append(target[1])
+                    self.tid_pids.setdefault(target[1], []).append(source[1])
+                case ("mitigates", "mid", "tid"):
+                    self.mid_tids.setdefault(source[1], []).append(target[1])
+                    self.tid_mids.setdefault(target[1], []).append(source[1])
+                case ("subproperty-of", "pid", "pid"):
+                    self.properties[source[1]] = self.properties[source[1]]._replace(parent=target[1])
+                    self.subproperties.setdefault(target[1], []).append(source[1])
+
+        for adjacency in [self.pid_tids, self.tid_pids, self.mid_tids, self.tid_mids, self.subproperties]:
+            for key, values in adjacency.items():
+                adjacency[key] = tuple(sorted(set(values)))
+
+    @classmethod
+    def from_bundle(cls, path: Path = BUNDLE) -> "Emb3d":
+        """Index a STIX bundle file"""
+        return cls(iter_objects(Path(path).read_text(encoding="utf8")))
+
+    def to_state(self) -> dict:
+        """Return the index as builtin types, to cache it"""
+        state = dict(vars(self))
+        for table in ["properties", "threats", "mitigations"]:
+            state[table] = {key: tuple(value) for key, value in state[table].items()}
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Emb3d":
+        index = cls.__new__(cls)
+        vars(index).update(state)
+        for table, record in [("properties", Property), ("threats", Threat), ("mitigations", Mitigation)]:
+            setattr(index, table, {key: record(*value) for key, value in state[table].items()})
+        return index
+
+    def __repr__(self) -> str:
+        return (
+            f"Emb3d({len(self.properties)} properties, {len(self.threats)} threats, "
+            f"{len(self.mitigations)} mitigations)"
+        )
+
+    def get(self, stix_id: str):
+        """Return the property, threat or mitigation of a STIX id"""
+        kind, number = self.ids[stix_id]
+        return {"pid": self.properties, "tid": self.threats, "mid": self.mitigations}[kind][number]
+
+    def descendants(self, pid: int) -> list:
+        """Return pid and its subproperties, recursively"""
+        pids, stack = [], [pid]
+        while stack:
+            pid = stack.pop()
+            pids.append(pid)
+            stack.extend(reversed(self.subproperties.get(pid, ())))
+        return pids
+
+    def property_threats(self, pid: int, subproperties: bool = False) -> tuple:
+        """Return the TIDs related to a property, and to its subproperties"""
+        pids = self.descendants(pid) if subproperties else [pid]
+        return tuple(sorted({tid for p in pids for tid in self.pid_tids.get(p, ())}))
+
+    def threat_mitigations(self, tid: int) -> tuple:
+        """Return the MIDs mitigating a threat"""
+        return self.tid_mids.get(tid, ())
+
+
+def _cache_file(digest: str) -> Path:
+    return Path(parse.CACHE_DIR) / f"emb3d-{digest[:32]}-{INDEX_VERSION}.pickle"
+
+
+# NOTE: bundle digest -> index, the indexes loaded in this process
+_LOADED = {}
+
+
+def load(path: Path = BUNDLE) -> Emb3d:
+    """Return the index of a STIX bundle, from the cache if the same content
+    was indexed before"""
+
+    data = Path(path).read_bytes()
+    digest = content_digest(data)
+    if digest in _LOADED:
+        return _LOADED[digest]
+
+    index = None
+    if parse.CACHE_DIR:
+        # NOTE: builtin types only, any process can load the cached index
+        try:
+            index = Emb3d.from_state(pickle.loads(_cache_file(digest).read_bytes()))
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError):
+            index = None
+
+    if index is None:
+        index = Emb3d(iter_objects(data.decode("utf8")))
+        if parse.CACHE_DIR:
+            # NOTE: write and rename, as the parse cache
+            try:
+                entry = _cache_file(digest)
+                entry.parent.mkdir(parents=True, exist_ok=True)
+                tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_bytes(pickle.dumps(index.to_state(), protocol=pickle.HIGHEST_PROTOCOL))
+                os.replace(tmp, entry)
+            except OSError:
+                pass
+
+    _LOADED[digest] = index
+    return index
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="EMB3D index")
+    parser.add_argument("-i", "--input", help="STIX bundle (default: " + str(BUNDLE) + ")", default=BUNDLE)
+    parser.add_argument("--pid", help="Show a property and its threats", type=int)
+    parser.add_argument("--tid", help="Show a threat, its properties and mitigations", type=int)
+    parser.add_argument("--mid", help="Show a mitigation and its threats", type=int)
+
+    args = parser.parse_args()
+    emb3d = load(Path(args.input))
+    print(emb3d)
+
+    if args.pid is not None:
+        print(emb3d.properties[args.pid])
+        for tid in emb3d.property_threats(args.pid, subproperties=True):
+            print("  TID-" + str(tid) + ": " + emb3d.threats[tid].name)
+    if args.tid is not None:
+        print(emb3d.threats[args.tid])
+        for pid in emb3d.tid_pids.get(args.tid, ()):
+            print("  PID-" + str(pid) + ": " + emb3d.properties[pid].name)
+        for mid in emb3d.threat_mitigations(args.tid):
+            print("  MID-" + str(mid).zfill(3) + ": " + emb3d.mitigations[mid].name)
+    if args.mid is not None:
+        print(emb3d.mitigations[args.mid])
+        for tid in emb3d.mid_tids.get(args.mid, ()):
+            print("  TID-" + str(tid) + ": " + emb3d.threats[tid].name)
@@ -0,0 +1,70 @@
+"""
+emb3d_test.py
+
+"""
+import json
+from pathlib import Path
+
+import emb3d as emb3d_module
+import parse
+from emb3d import BUNDLE, Emb3d, iter_objects, load
+from parse import parse as parse_file
+
+
+def test_iter_objects():
+    """Test the objects are decoded as json.load."""
+    text = BUNDLE.read_text(encoding="utf8")
+    assert list(iter_objects(text)) == json.loads(text)["objects"]
+    assert list(iter_objects('{"objects": [], "type": "bundle"}')) == []
+    assert list(iter_objects('{"id": "x", "objects": [{"a": [1, {"b": "]"}]}, {}]}')) == [{"a": [1, {"b": "]"}]}, {}]
+
+
+def test_index():
+    """Test the indexes and the adjacency maps against the bundle."""
+    emb3d = Emb3d.from_bundle()
+    objects = json.loads(BUNDLE.read_text(encoding="utf8"))["objects"]
+
+    assert len(emb3d.properties) == 59
+    assert len(emb3d.threats) == 81
+    assert len(emb3d.mitigations) == 89
+    assert emb3d.get(emb3d.threats[101].id) == emb3d.threats[101]
+    assert emb3d.threats[101].cwe == ("1300", "1255")
+
+    relationships = [o for o in objects if o["type"] == "relationship"]
+    mitigates = {(emb3d.ids[o["source_ref"]][1], emb3d.ids[o["target_ref"]][1]) for o in relationships if o["relationship_type"] == "mitigates"}
+    assert mitigates == {(mid, tid) for mid, tids in emb3d.mid_tids.items() for tid in tids}
+    assert mitigates == {(mid, tid) for tid, mids in emb3d.tid_mids.items() for mid in mids}
+    assert {(p, t) for p, tids in emb3d.pid_tids.items() for t in tids} == {(p, t) for t, pids in emb3d.tid_pids.items() for p in pids}
+
+    for pid, subpids in emb3d.subproperties.items():
+        assert all(emb3d.properties[sub].parent == pid for sub in subpids)
+    assert set(emb3d.property_threats(12)) <= set(emb3d.property_threats(12, subproperties=True))
+
+
+def test_dictionaries():
+    """Test the pid and tid of the dictionaries are EMB3D ids."""
+    emb3d = load()
+    surfaces = parse_file(Path("mitre/surfaces.yaml"))
+    assert {v["pid"] for v in surfaces.values()} <= set(emb3d.properties)
+    for path in Path("dicts").glob("*.yaml"):
+        words = parse_file(path)
+        assert {v["pid"] for v in words["surf"].values() if v.get("pid")} <= set(emb3d.properties)
+        assert {v["tid"] for v in words["vect"].values() if v.get("tid")} <= set(emb3d.threats)
+
+
+def test_cache(tmp_path, monkeypatch):
+    """Test the cached index is the indexed bundle."""
+    monkeypatch.setattr(parse, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(emb3d_module, "_LOADED", {})
+    bundle = tmp_path / "bundle.json"
+    bundle.write_bytes(BUNDLE.read_bytes())
+
+    first = load(bundle)
+    assert len(list((tmp_path / "cache").glob("emb3d-*.pickle"))) == 1
+    assert load(bundle) is first
+
+    emb3d_module._LOADED.clear()
+    cached = load(bundle)
+    assert cached is not first
+    assert cached.to_state() == first.to_state()
+    assert cached.threats[101] == first.threats[101]
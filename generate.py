@@ -6,8 +6,10 @@ Generate ADs from known catalogues.
 """
 
 # NOTE: https://realpython.com/python-xml-parser/
-from defusedxml.ElementTree import parse
+# defusedxml is imported on first use
+import re
 from pprint import pprint
+from typing import NamedTuple
 
 ATT_BLOCKLIST = [
     "SOAP",
@@ -37,6 +39,22 @@ ATT_ALLOWLIST = [
     "Signature Spoof",
 ]
 
+CAPEC = "capec_v3.9.xml"
+
+
+def _words(words: list) -> re.Pattern:
+    """Return one regex matching any of the words, as a substring"""
+    return re.compile("|".join(re.escape(word) for word in sorted(words, key=len, reverse=True)) or r"(?!)")
+
+
+class CapecPattern(NamedTuple):
+    id: str
+    name: str
+    status: str
+    description: str
+    cwe: tuple
+    mitigations: tuple
+
 
 def from_linddun():
     """Get the ads from LINDDUN catalogue"""
@@ -108,52 +126,114 @@ def from_cwe():
     raise NotImplementedError
 
 
-def from_capec():
-    """Get the ads from the CAPEC catalogue"""
-    FILENAME = "capec_v3.9.xml"
-    # ATT_PATS = 615
-    # ATT_PATS_NON_DEPR = 559
-    # CATS = 78
-    # VIEWS = 13
-    # EXT_REFS = 440
-
-    attacks = []
-
-    et = parse(FILENAME)
-    root = et.getroot()
-    # root_att = root.attrib
-    # root_tag = root.tag
-
-    att_pats = root[0]
-    # cats = root[1]
-    # views = root[2]
-    # ext_refs = root[3]
-
-    for att_pat in att_pats:
-        attack = att_pat.attrib["Name"]
-        status = att_pat.attrib["Status"]
-        skip = False
-
-        # NOTE: skip Deprecated patterns
-        if status == "Deprecated":
+def _local(tag: str) -> str:
+    """Return a tag without its namespace"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _text(elem) -> str:
+    """Return the text of an element and its children (xhtml), one line"""
+    return " ".join("".join(elem.itertext()).split())
+
+
+def _capec_pattern(elem) -> CapecPattern:
+    description, cwe, mitigations = "", [], []
+    for child in elem:
+        match _local(child.tag):
+            case "Description":
+                description = _text(child)
+            case "Related_Weaknesses":
+                cwe = [weakness.get("CWE_ID") for weakness in child if weakness.get("CWE_ID")]
+            case "Mitigations":
+                mitigations = [_text(mitigation) for mitigation in child]
+    return CapecPattern(
+        elem.get("ID"),
+        elem.get("Name"),
+        elem.get("Status"),
+        description,
+        tuple(dict.fromkeys(cwe)),
+        tuple(m for m in mitigations if m),
+    )
+
+
+def iter_capec(path=CAPEC):
+    """Yield the attack patterns of a CAPEC XML file one at a time
+
+    The file is parsed incrementally and every top level entry is dropped
+    once read, so the memory does not grow with the size of the catalogue.
+    """
+    from defusedxml.ElementTree import iterparse
+
+    depth = 0
+    container = None
+    for event, elem in iterparse(path, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 2:
+                container = elem
+            continue
+        if depth == 3:
+            if _local(elem.tag) == "Attack_Pattern":
+                yield _capec_pattern(elem)
+            # NOTE: Attack_Patterns, Categories, ... keep no read entry
+            container.clear()
+        depth -= 1
+
+
+def capec_ad(pattern: CapecPattern) -> dict:
+    """Return the AD of a CAPEC attack pattern, the terms left to fill"""
+    return {
+        "a": pattern.name,
+        "d": {"CAPEC": list(pattern.mitigations)} if pattern.mitigations else {},
+        "surf": [],
+        "vect": [],
+        "model": [],
+        "tag": [],
+        "cwe": list(pattern.cwe),
+        "capec": [pattern.id],
+    }
+
+
+def from_capec(path=CAPEC, allowlist: list = ATT_ALLOWLIST, blocklist: list = ATT_BLOCKLIST) -> dict:
+    """Get the ads from the CAPEC catalogue: the not deprecated attack
+    patterns with a name in allowlist and not in blocklist (substrings), by
+    name without duplicates. Return capec_<id> -> AD, sorted by name, and the
+    descriptions by AD key."""
+
+    allow, block = _words(allowlist), _words(blocklist)
+    ads, descriptions = {}, {}
+    names = set()
+
+    for pattern in iter_capec(path):
+        # NOTE: skip Deprecated patterns, ATT_BLOCKLIST and duplicates
+        if pattern.status == "Deprecated" or pattern.name in names:
             continue
+        if block.search(pattern.name) or not allow.search(pattern.name):
+            continue
+        names.add(pattern.name)
+        key = "capec_" + pattern.id
+        ads[key] = capec_ad(pattern)
+        descriptions[key] = pattern.description
 
-        # NOTE: skip ATT_BLOCKLIST
-        for attack_block in ATT_BLOCKLIST:
-            if attack_block in attack:
-                skip = True
-                break
+    # NOTE: alphabetically sort attacks
+    keys = sorted(ads, key=lambda key: ads[key]["a"])
+    return {key: ads[key] for key in keys}, {key: descriptions[key] for key in keys}
 
-        # NOTE: accept ATT_ALLOWLIST, without duplicates
-        for attack_allow in ATT_ALLOWLIST:
-            if (not skip) and (attack_allow in attack) and (attack not in attacks):
-                attacks.append(attack)
-        # assert len(ads) == ATT_PATS
 
-    # NOTE: alphabetically sort attacks
-    attacks.sort()
+def to_yaml(ads: dict, descriptions: dict = None) -> str:
+    """Return an AD file, every AD after its description as a comment"""
+    import yaml
 
-    return attacks
+    descriptions = descriptions or {}
+    lines = ["---\n"]
+    for key, ad in ads.items():
+        lines.append("\n")
+        if descriptions.get(key):
+            lines.append("# " + descriptions[key] + "\n")
+        lines.append(
+            yaml.safe_dump({key: ad}, sort_keys=False, allow_unicode=True, width=1 << 16, default_flow_style=None)
+        )
+    return "".join(lines)
 
 
 if __name__ == "__main__":
@@ -163,12 +243,13 @@ if __name__ == "__main__":
     ads = []
 
     # NOTE: CAPEC
-    # capec_attacks = from_capec()
-    # for attack in capec_attacks:
-    #     ads.append(Apc(attack))
-    # print(f"CAPEC ads: {len(capec_attacks)}")
+    # capec_ads, capec_descriptions = from_capec()
+    # ads.extend(capec_ads.values())
+    # print(f"CAPEC ads: {len(capec_ads)}")
 
     # NOTE: MTC
+    from defusedxml.ElementTree import parse
+
     FILENAME = "mtc-data.xml"
     attacks = []
 
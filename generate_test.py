@@ -0,0 +1,112 @@
+"""
+generate_test.py
+
+"""
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+import yaml
+
+from generate import ATT_ALLOWLIST, ATT_BLOCKLIST, from_capec, iter_capec, to_yaml
+from validator import AdValidator
+
+PATTERN = """
+  <Attack_Pattern ID="{id}" Name="{name}" Abstraction="Standard" Status="{status}">
+   <Description>Adversary {id} <xhtml:b>description</xhtml:b>
+      text.</Description>
+   <Related_Weaknesses>
+    <Related_Weakness CWE_ID="{cwe}"/>
+    <Related_Weakness CWE_ID="20"/>
+    <Related_Weakness CWE_ID="{cwe}"/>
+   </Related_Weaknesses>
+   <Mitigations>
+    <Mitigation>Mitigation of {id}</Mitigation>
+    <Mitigation><xhtml:p>Second</xhtml:p></Mitigation>
+   </Mitigations>
+  </Attack_Pattern>"""
+
+NAMES = [
+    ("Bluetooth Fuzzing", "Stable"),
+    ("Web Fuzzing", "Stable"),
+    ("Firmware Overflow", "Deprecated"),
+    ("Hardware Fault Injection", "Draft"),
+    ("Bluetooth Fuzzing", "Draft"),
+    ("Phishing", "Stable"),
+    ("SOAP Integer Overflow", "Stable"),
+    ("Integer Attacks", "Usable"),
+]
+
+
+def _capec(path, n: int = 1):
+    patterns = "".join(
+        PATTERN.format(id=i * len(NAMES) + j, name=name, status=status, cwe=100 + j)
+        for i in range(n)
+        for j, (name, status) in enumerate(NAMES)
+    )
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Attack_Pattern_Catalog xmlns="http://capec.mitre.org/capec-3" xmlns:xhtml="http://www.w3.org/1999/xhtml">\n'
+        f" <Attack_Patterns>{patterns}\n </Attack_Patterns>\n"
+        ' <Categories><Category ID="1" Name="Fuzzing" Status="Stable"/></Categories>\n'
+        "</Attack_Pattern_Catalog>\n"
+    )
+    return path
+
+
+def _names(path) -> list:
+    """The previous from_capec: names of the whole parsed tree"""
+    attacks = []
+    for att_pat in ET.parse(path).getroot()[0]:
+        attack = att_pat.attrib["Name"]
+        if att_pat.attrib["Status"] == "Deprecated":
+            continue
+        if any(block in attack for block in ATT_BLOCKLIST):
+            continue
+        for allow in ATT_ALLOWLIST:
+            if allow in attack and attack not in attacks:
+                attacks.append(attack)
+    return sorted(attacks)
+
+
+def test_capec(tmp_path):
+    """Test the CAPEC ADs against the previous name filter."""
+    path = _capec(tmp_path / "capec.xml")
+
+    patterns = list(iter_capec(path))
+    assert [p.name for p in patterns] == [name for name, _ in NAMES]
+    assert patterns[0].description == "Adversary 0 description text."
+    assert patterns[0].cwe == ("100", "20")
+    assert patterns[0].mitigations == ("Mitigation of 0", "Second")
+
+    ads, descriptions = from_capec(path)
+    assert [ad["a"] for ad in ads.values()] == _names(path)
+    assert list(ads) == ["capec_0", "capec_3", "capec_7"]
+    assert ads["capec_3"] == {
+        "a": "Hardware Fault Injection",
+        "d": {"CAPEC": ["Mitigation of 3", "Second"]},
+        "surf": [],
+        "vect": [],
+        "model": [],
+        "tag": [],
+        "cwe": ["103", "20"],
+        "capec": ["3"],
+    }
+    assert descriptions["capec_7"] == "Adversary 7 description text."
+    assert AdValidator().validate(ads) == []
+    assert yaml.safe_load(to_yaml(ads, descriptions)) == ads
+
+    assert from_capec(path, allowlist=[])[0] == {}
+
+
+def test_capec_memory(tmp_path):
+    """Test that the memory does not grow with the number of patterns."""
+    small, large = _capec(tmp_path / "small.xml", 20), _capec(tmp_path / "large.xml", 400)
+
+    peaks = []
+    for path in [small, large]:
+        tracemalloc.start()
+        assert sum(1 for _ in iter_capec(path)) > 0
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    assert large.stat().st_size > 10 * small.stat().st_size
+    assert peaks[1] < 2 * peaks[0]
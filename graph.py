@@ -0,0 +1,293 @@
+"""
+graph.py
+
+Graph of the ADs of a DataFrame and attack trees.
+
+AdGraph is a directed graph of surf, vect, ad, defense (policy) and mech
+(mechanism) nodes stored as compressed adjacency arrays (CSR): the successors
+of node i are indices[indptr[i]:indptr[i + 1]]. Its edges are
+
+    surf -> surf        surf hierarchy, surf[i] -> surf[i + 1]
+    surf -> ad          last surf of the AD
+    vect -> ad          vect of the AD
+    ad -> ad            attack chains (see chains.py)
+    ad -> defense       policies of the AD (d)
+    defense -> mech     mechanisms of the policy
+
+Reachability and shortest paths are breadth-first searches expanding a whole
+frontier at once with array operations, optionally restricted to some node
+kinds, e.g., the surf and ad nodes for attack paths.
+
+An attack tree follows the surf hierarchy: a surf is reached by any (OR) of
+its subsurfaces and ADs. An AD needs all (AND) its vect steps, and one (OR)
+of the ADs of its chain whose vect steps are a strict subset of its own, if
+any: the strict subset keeps the tree free of cycles.
+
+Usage: python graph.py runs the benchmark against a dict of sets.
+
+"""
+
+import time
+from collections import deque
+from typing import NamedTuple
+
+import graphviz
+import numpy as np
+import pandas as pd
+
+from chains import ChainGraph
+from store import _missing, frame_cached
+from surftree import SurfTrie
+
+KINDS = ["surf", "vect", "ad", "defense", "mech"]
+
+
+def _bfs(indptr: np.ndarray, indices: np.ndarray, sources: np.ndarray, allowed: np.ndarray) -> tuple:
+    """Return the distance (-1 if not reached) and the parent (-1 for the
+    sources) of every node, expanding one frontier per step"""
+
+    dist = np.full(len(indptr) - 1, -1, dtype=np.int64)
+    parent = np.full(len(indptr) - 1, -1, dtype=np.int64)
+    frontier = np.unique(sources)
+    dist[frontier] = 0
+
+    level = 0
+    while len(frontier):
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        total = counts.sum()
+        if total == 0:
+            break
+        # NOTE: positions of the successors of the whole frontier in indices
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        successors = indices[positions]
+        sources = np.repeat(frontier, counts)
+
+        new = (dist[successors] < 0) & allowed[successors]
+        successors, first = np.unique(successors[new], return_index=True)
+        level += 1
+        dist[successors] = level
+        parent[successors] = sources[new][first]
+        frontier = successors
+
+    return dist, parent
+
+
+class AdGraph:
+    """Directed graph of (kind, name) nodes in CSR arrays"""
+
+    def __init__(self, nodes: list, src: np.ndarray, dst: np.ndarray):
+        self.nodes = list(nodes)
+        self.ids = {node: i for i, node in enumerate(self.nodes)}
+        self.kinds = np.array([KINDS.index(kind) for kind, _ in self.nodes], dtype=np.int8)
+
+        n = len(self.nodes)
+        # NOTE: without double edges, sorted by source then target
+        edges = np.unique(np.asarray(src, dtype=np.int64) * n + np.asarray(dst, dtype=np.int64))
+        self.src, self.dst = edges // max(n, 1), edges % max(n, 1)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.src, minlength=n), out=self.indptr[1:])
+        self.indices = self.dst
+        self._reverse = None
+
+    @classmethod
+    def from_dataframe(cls, ads: pd.DataFrame) -> "AdGraph":
+        """Return the graph of the ADs of a DataFrame"""
+
+        ids = {}
+        src, dst = [], []
+
+        def node(kind: str, name: str) -> int:
+            return ids.setdefault((kind, name), len(ids))
+
+        def edge(a: int, b: int):
+            src.append(a)
+            dst.append(b)
+
+        for key, row in zip(ads.index, ads.to_dict(orient="records")):
+            ad = node("ad", key)
+            surf = row.get("surf")
+            if not _missing(surf) and len(surf) > 0:
+                for parent, child in zip(surf, surf[1:]):
+                    edge(node("surf", parent), node("surf", child))
+                edge(node("surf", surf[-1]), ad)
+            vect = row.get("vect")
+            if not _missing(vect):
+                for name in vect:
+                    edge(node("vect", name), ad)
+            defenses = row.get("d")
+            if isinstance(defenses, dict):
+                for policy, mechanisms in defenses.items():
+                    defense = node("defense", policy)
+                    edge(ad, defense)
+                    for mechanism in mechanisms or []:
+                        edge(defense, node("mech", mechanism))
+
+        if "surf" in ads and "vect" in ads:
+            chains = ChainGraph.of(ads)
+            for a, b in zip(chains.src, chains.dst):
+                edge(ids[("ad", chains.index[a])], ids[("ad", chains.index[b])])
+
+        return cls(list(ids), np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64))
+
+    @classmethod
+    def of(cls, ads: pd.DataFrame) -> "AdGraph":
+        """Return the graph of a DataFrame, kept while the DataFrame lives"""
+        columns = [c for c in ["surf", "vect", "d"] if c in ads]
+        return frame_cached(ads, "graph", columns, cls.from_dataframe)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def node(self, kind: str, name: str) -> int:
+        """Return the id of a node, KeyError if unknown"""
+        return self.ids[(kind, name)]
+
+    def successors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node] : self.indptr[node + 1]]
+
+    def reverse(self) -> "AdGraph":
+        """Return the graph with the edges reversed"""
+        if self._reverse is None:
+            self._reverse = AdGraph(self.nodes, self.dst, self.src)
+            self._reverse._reverse = self
+        return self._reverse
+
+    def _allowed(self, kinds: list) -> np.ndarray:
+        if kinds is None:
+            return np.ones(len(self), dtype=bool)
+        return np.isin(self.kinds, [KINDS.index(kind) for kind in kinds])
+
+    def reachable(self, sources: list, kinds: list = None) -> np.ndarray:
+        """Return the mask of the nodes reachable from the source ids through
+        nodes of kinds, all kinds if None"""
+        dist, _ = _bfs(self.indptr, self.indices, np.asarray(sources, dtype=np.int64), self._allowed(kinds))
+        return dist >= 0
+
+    def shortest_path(self, source: int, target: int, kinds: list = None) -> list:
+        """Return the (kind, name) nodes of a shortest path from source to
+        target through nodes of kinds, None if target is not reachable"""
+        allowed = self._allowed(kinds)
+        allowed[target] = True
+        dist, parent = _bfs(self.indptr, self.indices, np.array([source], dtype=np.int64), allowed)
+        if dist[target] < 0:
+            return None
+
+        path = [target]
+        while path[-1] != source:
+            path.append(parent[path[-1]])
+        return [self.nodes[i] for i in reversed(path)]
+
+
+class AttackNode(NamedTuple):
+    """Attack tree node: OR, AND, leaf (a vect step) or ref (a sub-attack,
+    an AD of the tree)"""
+
+    kind: str
+    label: str
+    children: tuple = ()
+
+
+def attack_tree(ads: pd.DataFrame, goal: str = None) -> AttackNode:
+    """Return the attack tree of the surf goal, of all the surfs if None"""
+
+    trie = SurfTrie.of(ads)
+    vects = dict(zip(ads.index, ads["vect"])) if "vect" in ads else {}
+    # NOTE: AD -> chained ADs with a strict subset of its vect steps
+    subattacks = {}
+    if vects:
+        chains = ChainGraph.of(ads)
+        for a, b in zip(chains.index[chains.src], chains.index[chains.dst]):
+            if set(vects[b]) < set(vects[a]):
+                subattacks.setdefault(a, []).append(b)
+
+    def ad_node(key: str) -> AttackNode:
+        children = []
+        if key in subattacks:
+            refs = tuple(AttackNode("ref", k) for k in dict.fromkeys(subattacks[key]))
+            children.append(refs[0] if len(refs) == 1 else AttackNode("OR", "chained", refs))
+        vect = vects.get(key)
+        if not _missing(vect):
+            children.extend(AttackNode("leaf", v) for v in vect)
+        return AttackNode("AND", key, tuple(children))
+
+    def surf_node(node) -> AttackNode:
+        children = [surf_node(child) for child in node.children.values()]
+        children.extend(ad_node(trie.index[row]) for row in node.ends)
+        return AttackNode("OR", node.name, tuple(children))
+
+    if goal is None:
+        roots = list(trie.root.children.values())
+    else:
+        # NOTE: every surf prefix ending with goal
+        roots, stack = [], [trie.root]
+        while stack:
+            node = stack.pop()
+            for child in node.children.values():
+                (roots if child.name == goal else stack).append(child)
+    if len(roots) == 1:
+        return surf_node(roots[0])
+    return AttackNode("OR", goal if goal is not None else "attack", tuple(map(surf_node, roots)))
+
+
+def tree_graph(tree: AttackNode, tname: str = "atree") -> graphviz.Digraph:
+    """Return the graphviz drawing of an attack tree"""
+
+    graph = graphviz.Digraph(tname, filename=tname + ".gv", strict=True)
+    shapes = {"OR": "ellipse", "AND": "box", "leaf": "plaintext"}
+
+    def draw(node: AttackNode, path: str) -> str:
+        if node.kind == "ref":
+            return "ad/" + node.label
+        name = "ad/" + node.label if node.kind == "AND" else path + "/" + node.label
+        graph.node(name, label=f"{node.label}\n{node.kind}" if node.kind != "leaf" else node.label, shape=shapes[node.kind])
+        for child in node.children:
+            style = "dashed" if child.kind == "ref" else None
+            graph.edge(name, draw(child, name), style=style)
+        return name
+
+    draw(tree, "")
+    return graph
+
+
+def benchmark(nodes: int = 100_000, degree: int = 5, rounds: int = 5):
+    """Print the reachability time of AdGraph and of a dict of sets"""
+
+    rng = np.random.default_rng(0)
+    src = rng.integers(0, nodes, nodes * degree)
+    dst = rng.integers(0, nodes, nodes * degree)
+
+    start = time.perf_counter()
+    graph = AdGraph([("ad", i) for i in range(nodes)], src, dst)
+    build_time = time.perf_counter() - start
+
+    adjacency = {}
+    for a, b in zip(src.tolist(), dst.tolist()):
+        adjacency.setdefault(a, set()).add(b)
+
+    start = time.perf_counter()
+    for source in range(rounds):
+        reached = graph.reachable([source])
+    graph_time = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for source in range(rounds):
+        seen = {source}
+        queue = deque([source])
+        while queue:
+            for b in adjacency.get(queue.popleft(), ()):
+                if b not in seen:
+                    seen.add(b)
+                    queue.append(b)
+    dict_time = (time.perf_counter() - start) / rounds
+
+    assert reached.sum() == len(seen)
+    print(
+        f"{nodes} nodes, {len(graph.src)} edges: build {build_time * 1e3:.0f} ms, "
+        f"reachability CSR {graph_time * 1e3:.1f} ms, dict of sets {dict_time * 1e3:.1f} ms "
+        f"({dict_time / graph_time:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
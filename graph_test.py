@@ -0,0 +1,75 @@
+"""
+graph_test.py
+
+"""
+from collections import deque
+from pathlib import Path
+
+import graphviz
+
+from analyze import get_dataframe, get_graph, get_tree, map_atree
+from graph import AttackNode
+from store import ad_dataframe
+
+
+def test_graph():
+    """Test reachability and shortest paths against a dict of sets."""
+    ads = get_dataframe(Path("catalog-mitre/bt.yaml"))
+    graph = get_graph(ads)
+    assert get_graph(ads) is graph
+
+    adjacency = {}
+    for a, b in zip(graph.src, graph.dst):
+        adjacency.setdefault(a, set()).add(b)
+
+    for source in range(0, len(graph), 7):
+        seen = {source}
+        queue = deque([source])
+        while queue:
+            for b in adjacency.get(queue.popleft(), ()):
+                if b not in seen:
+                    seen.add(b)
+                    queue.append(b)
+        assert set(graph.reachable([source]).nonzero()[0]) == seen
+
+    path = graph.shortest_path(graph.node("surf", "BC"), graph.node("ad", "knob"), ["surf", "ad"])
+    assert path[0] == ("surf", "BC")
+    assert path[-1] == ("ad", "knob")
+    assert all(kind in ["surf", "ad"] for kind, _ in path)
+    assert graph.shortest_path(graph.node("ad", "knob"), graph.node("surf", "BC")) is None
+
+
+def test_attack_tree():
+    """Test the AND/OR attack tree of a surf."""
+    ads = ad_dataframe(
+        {
+            "knob": {"a": "KNOB", "surf": ["BC", "LMP"], "vect": ["Downgrade"], "tag": ["P"]},
+            "bias": {
+                "a": "BIAS",
+                "surf": ["BC", "LMP"],
+                "vect": ["Downgrade", "Role switch"],
+                "tag": ["P"],
+            },
+            "sweyn": {"a": "Sweyn", "surf": ["BLE", "LL"], "vect": ["Crash"], "tag": ["I"]},
+        }
+    )
+
+    tree = map_atree(ads, "LMP")
+    assert tree == AttackNode(
+        "OR",
+        "LMP",
+        (
+            AttackNode("AND", "knob", (AttackNode("leaf", "Downgrade"),)),
+            AttackNode(
+                "AND",
+                "bias",
+                (
+                    AttackNode("ref", "knob"),
+                    AttackNode("leaf", "Downgrade"),
+                    AttackNode("leaf", "Role switch"),
+                ),
+            ),
+        ),
+    )
+    assert [child.label for child in map_atree(ads).children] == ["BC", "BLE"]
+    assert type(get_tree(ads, "BC")) == graphviz.Digraph
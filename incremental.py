@@ -0,0 +1,95 @@
+"""
+incremental.py
+
+Track the validated state of every AD of a file to only revalidate the ADs
+that changed since the last run.
+
+Each AD is identified by its key and the hash of its sub-mapping. The state
+of a file is kept per validation context (e.g., the dictionary content), so
+a new dictionary revalidates everything. Only the ADs that passed the checks
+are recorded: failing ADs are checked again on every run.
+
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+import parse
+
+STATE_FILE = "incremental.json"
+
+
+class Changes(NamedTuple):
+    """AD keys added, changed and removed since the last validated state"""
+
+    added: list
+    changed: list
+    removed: list
+    unchanged: list
+
+
+def ad_hash(ad) -> str:
+    """Return a stable hash of an AD sub-mapping"""
+    data = json.dumps(ad, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+
+class AdState:
+    """Last validated AD hashes per file and validation context"""
+
+    def __init__(self, state_path: Path = None):
+        if state_path is None and parse.CACHE_DIR:
+            state_path = Path(parse.CACHE_DIR) / STATE_FILE
+        self.state_path = state_path
+        self.state = {}
+
+        if self.state_path is not None:
+            try:
+                self.state = json.loads(Path(self.state_path).read_text())
+            except (OSError, ValueError):
+                self.state = {}
+
+    def _key(self, path: Path, context: str) -> str:
+        return str(Path(path).resolve()) + ":" + context
+
+    def changes(self, path: Path, ad_dict: dict, context: str = "") -> Changes:
+        """Return the ADs of ad_dict that differ from the validated state"""
+
+        known = self.state.get(self._key(path, context), {})
+        added, changed, unchanged = [], [], []
+        for key, ad in ad_dict.items():
+            if key not in known:
+                added.append(key)
+            elif known[key] != ad_hash(ad):
+                changed.append(key)
+            else:
+                unchanged.append(key)
+        removed = [key for key in known if key not in ad_dict]
+
+        return Changes(added, changed, removed, unchanged)
+
+    def update(self, path: Path, ad_dict: dict, passed: list, context: str = ""):
+        """Record the ADs of ad_dict listed in passed as validated"""
+
+        known = self.state.setdefault(self._key(path, context), {})
+        for key in list(known):
+            if key not in ad_dict:
+                del known[key]
+        for key in passed:
+            known[key] = ad_hash(ad_dict[key])
+
+    def save(self):
+        """Write the state, write and rename to never leave a partial file"""
+        if self.state_path is None:
+            return
+        try:
+            state_path = Path(self.state_path)
+            state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = state_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(self.state))
+            os.replace(tmp, state_path)
+        except OSError:
+            pass
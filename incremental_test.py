@@ -0,0 +1,58 @@
+"""
+incremental_test.py
+
+"""
+import json
+from pathlib import Path
+
+from incremental import (
+    AdState,
+)
+from parse import parse
+import check_tool
+
+
+def test_ad_state(tmp_path):
+    """Test added, changed and removed ADs are detected across runs."""
+    path = Path("catalog-mitre/bt.yaml")
+    ad_dict = parse(path)
+    state_path = tmp_path / "state.json"
+
+    state = AdState(state_path)
+    changes = state.changes(path, ad_dict)
+    assert len(changes.added) == len(ad_dict)
+    state.update(path, ad_dict, changes.added)
+    state.save()
+
+    # NOTE: a new process reads the saved state
+    state = AdState(state_path)
+    ad_dict["knob"]["year"] = 2020
+    ad_dict.pop("blur")
+    ad_dict["new_ad"] = dict(ad_dict["knob"])
+    changes = state.changes(path, ad_dict)
+    assert changes.added == ["new_ad"]
+    assert changes.changed == ["knob"]
+    assert changes.removed == ["blur"]
+    assert len(changes.unchanged) == len(ad_dict) - 2
+
+    # NOTE: failing ADs are not recorded, other contexts start from scratch
+    state.update(path, ad_dict, ["new_ad"])
+    assert state.changes(path, ad_dict).changed == ["knob"]
+    assert state.changes(path, ad_dict).removed == []
+    assert len(state.changes(path, ad_dict, "dict").added) == len(ad_dict)
+
+
+def test_check_incremental_invalid(tmp_path, monkeypatch):
+    """Test schema-invalid and unparsable AD files are reported, not raised."""
+    ad_dict = parse(Path("catalog-mitre/bt.yaml"))
+    ad_dict["knob"].pop("a")
+    path = tmp_path / "bad.json"
+    path.write_text(json.dumps(ad_dict))
+
+    # NOTE: -s 0.1, the invalid AD is a similarity candidate of every AD
+    state = AdState(tmp_path / "state.json")
+    monkeypatch.setattr(check_tool, "_SCORE", 0.9)
+    assert not check_tool.check_incremental(path, None, state)
+
+    path.write_text('{"knob": {"d": ')
+    assert not check_tool.check_incremental(path, None, state)
@@ -0,0 +1,146 @@
+"""
+lint.py
+
+Lint and parse a YAML AD file in one pass over its content.
+
+yamllint parses a file twice before its rules run: a full parse for syntax
+errors and a token stream for the cosmetic rules (indentation, duplicate keys,
+...). Then parse() reads and parses the file again. Here the file is read
+once, the fast C loader builds the AD dict and reports the syntax errors, and
+yamllint only runs its token based rules.
+
+The parse is stored in the parse cache, and with skip_clean=True the lint
+stage is skipped when the same content already passed it.
+
+"""
+
+import re
+from pathlib import Path
+
+import parse
+from parse import MISS, content_digest, load_cached, store_cached, yaml_loader
+
+# NOTE: yaml and yamllint are imported on first lint, importing this module
+# for non YAML files does not pay for them
+
+# NOTE: https://yamllint.readthedocs.io/en/stable/configuration.html
+# NOTE: duplicates, syntax, ...
+LINT_CONFIG = """
+    extends: default
+
+    rules:
+      line-length: disable
+    """
+
+_CONF = None
+
+# NOTE: digests of the contents that passed the lint stage in this process
+_CLEAN = set()
+
+
+def _conf():
+    global _CONF
+    if _CONF is None:
+        from yamllint.config import YamlLintConfig
+
+        _CONF = YamlLintConfig(LINT_CONFIG)
+    return _CONF
+
+
+def _stamp(path: Path, digest: str) -> Path:
+    """Return the on-disk marker of a clean lint run"""
+    key = content_digest(f"{Path(path).resolve()}:{digest}:{LINT_CONFIG}".encode("utf8"))
+    return Path(parse.CACHE_DIR) / (key + ".lint")
+
+
+def _is_clean(path: Path, digest: str) -> bool:
+    if digest in _CLEAN:
+        return True
+    return bool(parse.CACHE_DIR) and _stamp(path, digest).exists()
+
+
+def _mark_clean(path: Path, digest: str):
+    _CLEAN.add(digest)
+    if parse.CACHE_DIR:
+        try:
+            stamp = _stamp(path, digest)
+            stamp.parent.mkdir(parents=True, exist_ok=True)
+            stamp.touch()
+        except OSError:
+            pass
+
+
+def _syntax_problem(err):
+    """Return a parse error as a yamllint syntax problem"""
+    from yamllint.linter import LintProblem
+
+    mark = getattr(err, "problem_mark", None)
+    line, column = (mark.line + 1, mark.column + 1) if mark else (1, 1)
+    problem = LintProblem(line, column, "syntax error: " + str(getattr(err, "problem", err)) + " (syntax)")
+    problem.level = "error"
+    return problem
+
+
+def _rule_problems(text: str, path: Path):
+    """Return the problems of the yamllint rules, without the syntax error"""
+    from yamllint import linter
+
+    # NOTE: get_cosmetic_problems is not yamllint public API (requirements.txt
+    # pins the tested versions), the public run() parses the text again
+    get_cosmetic_problems = getattr(linter, "get_cosmetic_problems", None)
+    if get_cosmetic_problems is not None:
+        return get_cosmetic_problems(text, _conf(), str(path))
+    return (problem for problem in linter.run(text, _conf(), str(path)) if problem.rule is not None)
+
+
+def _cosmetic_problems(text: str, syntax, path: Path) -> list:
+    """Return the yamllint rule problems with the syntax error in place"""
+    first_line = text.split("\n", 1)[0]
+    if re.match(r"^#\s*yamllint disable-file\s*$", first_line):
+        return []
+
+    problems = []
+    for problem in _rule_problems(text, path):
+        # NOTE: as yamllint, the syntax error replaces a problem at its place
+        if syntax and syntax.line <= problem.line and syntax.column <= problem.column:
+            problems.append(syntax)
+            syntax = None
+            continue
+        problems.append(problem)
+    if syntax:
+        problems.append(syntax)
+
+    return problems
+
+
+def lint_and_parse(path: Path, skip_clean: bool = False) -> tuple:
+    """Return the lint problems and the AD dict (None on syntax errors) of a
+    YAML file"""
+
+    import yaml
+
+    path = Path(path)
+    data = path.read_bytes()
+    digest = content_digest(data)
+
+    # NOTE: content parsed before is valid YAML
+    ad_dict = load_cached(path, digest)
+    syntax = None
+    if ad_dict is MISS:
+        ad_dict = None
+        try:
+            ad_dict = yaml.load(data, yaml_loader())
+            store_cached(path, digest, ad_dict)
+        except yaml.YAMLError as err:
+            syntax = _syntax_problem(err)
+
+    if skip_clean and syntax is None and _is_clean(path, digest):
+        return [], ad_dict
+
+    # NOTE: universal newlines, as yamllint reading a file in text mode
+    text = data.decode("utf8").replace("\r\n", "\n").replace("\r", "\n")
+    problems = _cosmetic_problems(text, syntax, path)
+    if len(problems) == 0:
+        _mark_clean(path, digest)
+
+    return problems, ad_dict
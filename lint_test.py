@@ -0,0 +1,54 @@
+"""
+lint_test.py
+
+"""
+from pathlib import Path
+from types import SimpleNamespace
+
+import parse
+from lint import (
+    lint_and_parse,
+)
+from template.ad import AD_PARSE_TEST
+
+
+def test_lint_and_parse(tmp_path, monkeypatch):
+    """Test one pass lint and parse of YAML files."""
+    monkeypatch.setattr(parse, "CACHE_DIR", str(tmp_path / "cache"))
+    parse.clear_cache()
+
+    problems, yaml_dict = lint_and_parse(Path("template/ad.yaml"))
+    assert problems == []
+    assert yaml_dict == AD_PARSE_TEST
+    assert len(list((tmp_path / "cache").glob("*.lint"))) == 1
+
+    # NOTE: the parse is shared with parse_cached
+    assert parse.parse_cached(Path("template/ad.yaml")) == AD_PARSE_TEST
+
+    dup_path = tmp_path / "dup.yaml"
+    dup_path.write_text("---\na: 1\na: 2\n")
+    problems, _ = lint_and_parse(dup_path, skip_clean=True)
+    assert [p.rule for p in problems] == ["key-duplicates"]
+
+    bad_path = tmp_path / "bad.yaml"
+    bad_path.write_text("---\na: [1\nb: 2\n")
+    problems, yaml_dict = lint_and_parse(bad_path)
+    assert yaml_dict is None
+    assert problems[-1].message.startswith("syntax error")
+
+
+def test_public_linter(tmp_path, monkeypatch):
+    """Test the same problems are reported with the public yamllint API only."""
+    import yamllint
+    from yamllint import linter
+
+    monkeypatch.setattr(parse, "CACHE_DIR", "")
+    paths = [Path("template/ad.yaml"), tmp_path / "dup.yaml", tmp_path / "bad.yaml"]
+    paths[1].write_text("a: 1\na: 2  \n")
+    paths[2].write_text("---\na:  [1\nb: 2\n")
+
+    expected = [[(p.line, p.column, p.rule, p.message) for p in lint_and_parse(path)[0]] for path in paths]
+    monkeypatch.setattr(yamllint, "linter", SimpleNamespace(run=linter.run))
+    for path, problems in zip(paths, expected):
+        assert [(p.line, p.column, p.rule, p.message) for p in lint_and_parse(path)[0]] == problems
+    assert len(expected[1]) > 1 and expected[2][-1][3].startswith("syntax error")
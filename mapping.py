@@ -0,0 +1,167 @@
+"""
+mapping.py
+
+Join the ADs of a catalog with MITRE EMB3D through an AD dictionary.
+
+Every surf and vect word of an AD is resolved once through the dictionary
+aliases to its primary term and its PID (surf) or TID (vect). The resolved
+surf and vect lists are then joined on the AD (a hash join), one row per
+(surf, vect) pair of an AD:
+
+    ad, a, risk, surf_rank, surf, surf_term, pid, vect_rank, vect, vect_term, tid
+
+surf_rank and vect_rank are the positions in the AD lists, rank 0 is the
+most significant. The coverage matrix counts the ADs per (PID, TID). With the
+EMB3D index (see emb3d.py), it has a row and a column for every EMB3D PID and
+TID, and gaps() lists the EMB3D PID -> TID relations that no AD covers.
+
+NOTE: a word is matched exactly, as a term or an alias. The visualization
+templates also match a vect term containing the word, e.g., "Firmware" in
+"Firmware Rollback".
+
+Usage: python mapping.py -c catalog-mitre/bt.yaml -d dicts/bt.yaml -o out/
+
+"""
+
+import argparse
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dictionary import Dictionary
+from emb3d import Emb3d, load
+from parse import parse_cached
+from store import ListColumn, MISSING, _missing, ad_dataframe
+
+COLUMNS = ["ad", "a", "risk", "surf_rank", "surf", "surf_term", "pid", "vect_rank", "vect", "vect_term", "tid"]
+
+
+def _resolve(ads: pd.DataFrame, words: Dictionary, key: str, ids: dict) -> pd.DataFrame:
+    """Return ad, rank, word, term and id of every word of key"""
+
+    column = ListColumn([MISSING if _missing(v) else v for v in ads[key]] if key in ads else [MISSING] * len(ads))
+    # NOTE: every distinct word is resolved once, then mapped by code
+    terms = np.array([words.canonical[key].get(word) for word in column.terms], dtype=object)
+    numbers = pd.array([ids.get(word) for word in column.terms], dtype="Int64")
+
+    starts = np.repeat(column.offsets[:-1], column.lengths())
+    return pd.DataFrame(
+        {
+            "ad": np.array(ads.index, dtype=object)[column.rows],
+            f"{key}_rank": np.arange(len(column.codes)) - starts,
+            key: column.terms[column.codes],
+            f"{key}_term": terms[column.codes],
+            "pid" if key == "surf" else "tid": numbers[column.codes],
+        }
+    )
+
+
+def join(ads: pd.DataFrame, words: Dictionary) -> pd.DataFrame:
+    """Return the (surf, vect) pairs of the ADs with their PID and TID, in
+    the order of the ADs"""
+
+    surfs = _resolve(ads, words, "surf", words.pid)
+    vects = _resolve(ads, words, "vect", words.tid)
+    joined = surfs.merge(vects, on="ad", how="inner", sort=False)
+
+    info = pd.DataFrame(
+        {
+            "ad": np.array(ads.index, dtype=object),
+            "a": ads["a"].to_numpy() if "a" in ads else None,
+            "risk": ads["risk"].to_numpy() if "risk" in ads else None,
+        }
+    )
+    joined = joined.merge(info, on="ad", how="left", sort=False)
+
+    # NOTE: stable, the rows of an AD stay in surf then vect order
+    order = {key: row for row, key in enumerate(ads.index)}
+    joined = joined.iloc[np.argsort(joined["ad"].map(order).to_numpy(), kind="stable")]
+    return joined[COLUMNS].reset_index(drop=True)
+
+
+def coverage_matrix(joined: pd.DataFrame, emb3d: Emb3d = None, primary: bool = False) -> pd.DataFrame:
+    """Return the number of ADs per PID (rows) and TID (columns), of the most
+    significant surf and vect only if primary. With emb3d, every EMB3D PID
+    and TID is present."""
+
+    if primary:
+        joined = joined[(joined["surf_rank"] == 0) & (joined["vect_rank"] == 0)]
+    pairs = joined.dropna(subset=["pid", "tid"]).drop_duplicates(["pid", "tid", "ad"])
+    matrix = pd.crosstab(pairs["pid"].astype(int), pairs["tid"].astype(int))
+
+    if emb3d is not None:
+        pids = sorted(set(emb3d.properties) | set(matrix.index))
+        tids = sorted(set(emb3d.threats) | set(matrix.columns))
+        matrix = matrix.reindex(index=pids, columns=tids, fill_value=0)
+    matrix.index.name, matrix.columns.name = "pid", "tid"
+    return matrix
+
+
+def gaps(joined: pd.DataFrame, emb3d: Emb3d) -> list:
+    """Return the EMB3D (PID, TID) relations without an AD"""
+    pairs = joined.dropna(subset=["pid", "tid"])
+    covered = set(zip(pairs["pid"].astype(int), pairs["tid"].astype(int)))
+    return [
+        (pid, tid)
+        for pid, tids in sorted(emb3d.pid_tids.items())
+        for tid in tids
+        if (pid, tid) not in covered
+    ]
+
+
+def _json(value):
+    if value is None or value is pd.NA or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def write(joined: pd.DataFrame, matrix: pd.DataFrame, out: Path, name: str) -> list:
+    """Write the joined rows (name.json) and the coverage matrix
+    (name_coverage.csv) to the directory out, return the written paths"""
+
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+
+    rows = [{column: _json(value) for column, value in zip(COLUMNS, row)} for row in joined.itertuples(index=False)]
+    rows_path = out / (name + ".json")
+    rows_path.write_text(json.dumps(rows, indent=1, ensure_ascii=False) + "\n", encoding="utf8")
+
+    matrix_path = out / (name + "_coverage.csv")
+    matrix.to_csv(matrix_path)
+
+    return [rows_path, matrix_path]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Join ADs with MITRE EMB3D")
+    parser.add_argument("-c", "--catalog", help="AD file", required=True)
+    parser.add_argument("-d", "--dict", help="Dictionary file", required=True)
+    parser.add_argument("-o", "--output", help="Output directory (default: print the coverage matrix)")
+    parser.add_argument("-p", "--primary", help="Only the most significant surf and vect of the ADs", action="store_true")
+    parser.add_argument("-g", "--gaps", help="Print the EMB3D relations without an AD", action="store_true")
+
+    args = parser.parse_args()
+
+    ads = ad_dataframe(parse_cached(Path(args.catalog)))
+    words = Dictionary.load(Path(args.dict))
+    index = load()
+
+    joined = join(ads, words)
+    matrix = coverage_matrix(joined, index, args.primary)
+
+    if args.output is None:
+        covered = matrix.loc[matrix.sum(axis=1) > 0, matrix.sum(axis=0) > 0]
+        print(covered.to_string())
+    else:
+        for path in write(joined, matrix, Path(args.output), Path(args.catalog).stem):
+            print("INFO: " + str(path) + " written.")
+
+    if args.gaps:
+        for pid, tid in gaps(joined, index):
+            print(f"PID-{pid} -> TID-{tid}: {index.threats[tid].name}")
@@ -0,0 +1,66 @@
+"""
+mapping_test.py
+
+"""
+from pathlib import Path
+
+import pandas as pd
+
+from dictionary import Dictionary
+from emb3d import load
+from mapping import coverage_matrix, gaps, join, write
+from parse import parse
+
+
+def _liquid(ads: dict, words: dict) -> set:
+    """The (surf term, vect term, AD) triples of the visualization templates,
+    vect words matched exactly"""
+    triples = set()
+    for surf_term, surf in words["surf"].items():
+        for vect_term, vect in words["vect"].items():
+            for key, ad in ads.items():
+                for ad_surf in ad.get("surf") or []:
+                    if surf_term == ad_surf or ad_surf in surf["alias"]:
+                        if ad.get("vect") and (vect_term == ad["vect"][0] or ad["vect"][0] in vect["alias"]):
+                            triples.add((surf_term, vect_term, key))
+    return triples
+
+
+def test_join():
+    """Test the join against the template loops."""
+    for name in ["bt", "fido", "physical", "software"]:
+        ads = parse(Path(f"catalog-mitre/{name}.yaml"))
+        words = parse(Path(f"dicts/{name}.yaml"))
+        joined = join(pd.DataFrame.from_dict(ads, orient="index"), Dictionary(words))
+
+        primary = joined[joined["vect_rank"] == 0].dropna(subset=["surf_term", "vect_term"])
+        assert set(zip(primary["surf_term"], primary["vect_term"], primary["ad"])) == _liquid(ads, words)
+
+        for row in joined.itertuples():
+            assert ads[row.ad]["surf"][row.surf_rank] == row.surf
+            assert ads[row.ad]["vect"][row.vect_rank] == row.vect
+            assert pd.isna(row.pid) or words["surf"][row.surf_term]["pid"] == row.pid
+        assert len(joined) == sum(len(ad.get("surf") or []) * len(ad.get("vect") or []) for ad in ads.values())
+
+
+def test_coverage(tmp_path):
+    """Test the coverage matrix, the gaps and the data files."""
+    ads = pd.DataFrame.from_dict(parse(Path("catalog-mitre/bt.yaml")), orient="index")
+    joined = join(ads, Dictionary.load(Path("dicts/bt.yaml")))
+    emb3d = load()
+
+    matrix = coverage_matrix(joined)
+    for (pid, tid), group in joined.dropna(subset=["pid", "tid"]).groupby(["pid", "tid"]):
+        assert matrix.loc[pid, tid] == group["ad"].nunique()
+    full = coverage_matrix(joined, emb3d)
+    assert full.shape == (len(emb3d.properties), len(emb3d.threats))
+    assert full.to_numpy().sum() == matrix.to_numpy().sum()
+    assert coverage_matrix(joined, primary=True).to_numpy().sum() <= len(ads)
+
+    missing = gaps(joined, emb3d)
+    assert all(full.loc[pid, tid] == 0 for pid, tid in missing)
+    assert len(missing) + sum(full.loc[p, t] > 0 for p, tids in emb3d.pid_tids.items() for t in tids) == sum(map(len, emb3d.pid_tids.values()))
+
+    rows, csv = write(joined, full, tmp_path, "bt")
+    assert len(parse(rows)) == len(joined)
+    assert pd.read_csv(csv, index_col=0).shape == full.shape
@@ -6,24 +6,38 @@ Parse well formatted ADs from different formats.
 """
 
 from pathlib import Path
+from collections import OrderedDict
 
-import xmltodict
+import hashlib
 
-import json
+import os
+
+import pickle
 
-import yaml
+import json
 
 import csv
 
-try:
-    from yaml import CSafeLoader as SafeLoader
-except ImportError:
-    from yaml import SafeLoader
+# NOTE: yaml, xmltodict and tomllib are imported on first use, parsing a JSON
+# file does not pay for them
+
+# NOTE: bump when a parser changes its output, it invalidates the parse cache
+PARSER_VERSION = 1
+
+# NOTE: on-disk parse cache, ADF_CACHE_DIR="" disables the persistent layer
+CACHE_DIR = os.environ.get("ADF_CACHE_DIR", str(Path(__file__).parent / ".adf_cache"))
+
+# NOTE: number of parsed files kept in memory by the LRU layer
+CACHE_SIZE = 256
 
-try:
-    import tomllib
-except ModuleNotFoundError:
-    import tomli as tomllib
+
+def yaml_loader():
+    """Return the fastest yaml safe loader, the C one if available"""
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+    return SafeLoader
 
 
 def _parse_excel(path: Path) -> dict:
@@ -34,6 +48,8 @@ def _parse_excel(path: Path) -> dict:
 # NOTE: this is ad hoc,
 def _parse_csv(path: Path) -> dict:
     """Parse from a csv AD file in a Python dict"""
+    import yaml
+
     with open(path) as csv_file:
         reader = csv.reader(csv_file, delimiter=";")
         reader.__next__()
@@ -60,6 +76,8 @@ def _parse_csv(path: Path) -> dict:
 
 def _parse_xml(path: Path) -> dict:
     """Parse from a xml AD file in a Python dict"""
+    import xmltodict
+
     with open(path, "rb") as file:
         xml_dict = xmltodict.parse(file)["root"]
 
@@ -92,14 +110,21 @@ def _parse_json(path: Path) -> dict:
 
 def _parse_yaml(path: Path) -> dict:
     """Parse from a yaml AD file in a Python dict"""
+    import yaml
+
     with open(path, "r", encoding="utf8") as file:
-        yaml_dict = yaml.load(file, SafeLoader)
+        yaml_dict = yaml.load(file, yaml_loader())
 
     return yaml_dict
 
 
 def _parse_toml(path: Path) -> dict:
     """Parse from a toml AD file in a Python dict"""
+    try:
+        import tomllib
+    except ModuleNotFoundError:
+        import tomli as tomllib
+
     with open(path, "rb") as file:
         toml_dict = tomllib.load(file)
 
@@ -125,6 +150,122 @@ def parse(path: Path) -> dict:
     return parsed_dict
 
 
+def content_digest(data: bytes) -> str:
+    """Return the sha256 hex digest of a file content"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _digest(path: Path) -> str:
+    """Return the sha256 hex digest of the content of path"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_file(path: Path, digest: str) -> Path:
+    """Return the on-disk cache entry for path with content digest"""
+    key = f"{path.resolve()}:{digest}:{PARSER_VERSION}".encode("utf8")
+    return Path(CACHE_DIR) / (hashlib.sha256(key).hexdigest() + ".pickle")
+
+
+# NOTE: (path, digest) -> pickled AD dict, least recently used first
+_LRU = OrderedDict()
+
+
+class _Miss:
+    def __repr__(self) -> str:
+        return "MISS"
+
+
+# NOTE: a content never parsed, distinct from an empty file parsed to None
+MISS = _Miss()
+
+
+def _remember(key: tuple, blob: bytes):
+    """Add a pickled AD dict to the in-memory LRU layer"""
+    _LRU[key] = blob
+    _LRU.move_to_end(key)
+    while len(_LRU) > CACHE_SIZE:
+        _LRU.popitem(last=False)
+
+
+def load_cached(path: Path, digest: str) -> dict:
+    """Return the cached AD dict of path with content digest, MISS if the
+    content was never parsed"""
+
+    path = Path(path)
+    key = (path, digest)
+    blob = _LRU.get(key)
+    if blob is None and CACHE_DIR:
+        try:
+            blob = _cache_file(path, digest).read_bytes()
+        except OSError:
+            return MISS
+    if blob is None:
+        return MISS
+
+    try:
+        ad_dict = pickle.loads(blob)
+    except Exception:
+        # NOTE: corrupted, truncated or foreign cache entry, drop it
+        _LRU.pop(key, None)
+        if CACHE_DIR:
+            _cache_file(path, digest).unlink(missing_ok=True)
+        return MISS
+
+    _remember(key, blob)
+    return ad_dict
+
+
+def store_cached(path: Path, digest: str, ad_dict: dict):
+    """Cache the AD dict parsed from path with content digest"""
+
+    path = Path(path)
+    blob = pickle.dumps(ad_dict, protocol=pickle.HIGHEST_PROTOCOL)
+    _remember((path, digest), blob)
+
+    if CACHE_DIR:
+        # NOTE: write and rename, concurrent runs never see a partial entry
+        try:
+            entry = _cache_file(path, digest)
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(blob)
+            os.replace(tmp, entry)
+        except OSError:
+            pass
+
+
+def parse_cached(path: Path) -> dict:
+    """Parse from a AD file in a Python dict, reusing a previous parse of the
+    same content
+
+    The cache is keyed by file path, content hash and PARSER_VERSION. Every
+    call returns a fresh dict, so callers can modify it.
+    """
+
+    path = Path(path)
+    digest = _digest(path)
+    ad_dict = load_cached(path, digest)
+    if ad_dict is MISS:
+        ad_dict = parse(path)
+        # NOTE: the cache keeps a pickled snapshot, the caller owns ad_dict
+        store_cached(path, digest, ad_dict)
+
+    return ad_dict
+
+
+def clear_cache():
+    """Drop the in-memory and the on-disk parse cache, with the lint markers"""
+    _LRU.clear()
+    if CACHE_DIR:
+        for entry in Path(CACHE_DIR).glob("*"):
+            if entry.suffix in [".pickle", ".lint"]:
+                entry.unlink(missing_ok=True)
+
+
 if __name__ == "__main__":
     yaml_dict = parse(Path("template/ad.yaml"))
     xml_dict = parse(Path("template/ad.xml"))
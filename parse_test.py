@@ -5,8 +5,10 @@ parse_tests.py
 from pathlib import Path
 from template.ad import AD_PARSE_TEST
 
+import parse as parse_module
 from parse import (
     parse,
+    parse_cached,
 )
 
 
@@ -21,3 +23,55 @@ def test_parsers():
     assert yaml_dict == toml_dict
     assert yaml_dict == json_dict
     assert yaml_dict == xml_dict
+
+
+def test_parse_cached(tmp_path, monkeypatch):
+    """Test the parse cache returns fresh copies and follows the file content."""
+    monkeypatch.setattr(parse_module, "CACHE_DIR", str(tmp_path / "cache"))
+    parse_module.clear_cache()
+
+    ad_path = tmp_path / "ad.yaml"
+    ad_path.write_text(Path("template/ad.yaml").read_text())
+
+    cached_dict = parse_cached(ad_path)
+    assert cached_dict == AD_PARSE_TEST
+    assert len(list((tmp_path / "cache").glob("*.pickle"))) == 1
+
+    # NOTE: callers can modify the returned dict without touching the cache
+    cached_dict.pop("ad_name1")
+    assert parse_cached(ad_path) == AD_PARSE_TEST
+
+    # NOTE: the on-disk layer survives an in-memory cache reset
+    parse_module._LRU.clear()
+    assert parse_cached(ad_path) == AD_PARSE_TEST
+
+    # NOTE: a content change invalidates the cache
+    ad_path.write_text(Path("template/ad.yaml").read_text().replace("Attack 1", "Attack 0"))
+    assert parse_cached(ad_path)["ad_name1"]["a"] == "Attack 0"
+    assert len(list((tmp_path / "cache").glob("*.pickle"))) == 2
+
+    # NOTE: an empty file parses to None, which is cached as any content
+    empty_path = tmp_path / "empty.yaml"
+    empty_path.write_text("")
+    assert parse_cached(empty_path) is None
+    monkeypatch.setattr(parse_module, "parse", None)
+    assert parse_cached(empty_path) is None
+
+
+def test_corrupt_cache(tmp_path, monkeypatch):
+    """Test corrupted cache entries are dropped and parsed again."""
+    monkeypatch.setattr(parse_module, "CACHE_DIR", str(tmp_path / "cache"))
+    parse_module.clear_cache()
+
+    ad_path = tmp_path / "ad.yaml"
+    ad_path.write_text(Path("template/ad.yaml").read_text())
+    parse_cached(ad_path)
+    (entry,) = (tmp_path / "cache").glob("*.pickle")
+    blob = entry.read_bytes()
+
+    # NOTE: truncated entry, and a foreign one referencing a missing module
+    for corrupt in [blob[: len(blob) // 2], b"cmissing_module\nThing\n(tR."]:
+        parse_module._LRU.clear()
+        entry.write_bytes(corrupt)
+        assert parse_cached(ad_path) == AD_PARSE_TEST
+        assert entry.read_bytes() == blob
@@ -0,0 +1,367 @@
+"""
+query.py
+
+Boolean queries over AD DataFrames, e.g.,
+
+    surf:BLE AND vect:"Key brute force" AND NOT tag:dual-mode AND year>=2019
+
+A query is parsed once into a plan of terms combined with AND, OR, NOT and
+parentheses (the keywords are upper case):
+
+    field:value     the AD has value, with analyze.get_set semantics: a term
+                    of a list field (surf, vect, ...), a substring of a text
+                    field (a), equal to a number field (year, risk)
+    field OP number year, risk, ... compared with OP in >=, <=, >, <, =, !=
+
+Values with spaces or special characters are double quoted. ADs without the
+field match no term. The terms of an AND are evaluated from the most to the
+least selective, on the term indexes of analyze.get_set, and the evaluation
+stops as soon as no AD is left.
+
+Usage: python query.py -i catalog-mitre/bt.yaml -q 'surf:BLE AND year>=2019'
+
+"""
+
+import argparse
+import operator
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from store import frame_index
+
+
+class QueryError(Exception):
+    """Invalid query, e.g., a syntax error or an unknown field"""
+
+
+class Term(NamedTuple):
+    field: str
+    value: str
+
+
+class Compare(NamedTuple):
+    field: str
+    op: str
+    value: float
+
+
+class Not(NamedTuple):
+    node: tuple
+
+
+class And(NamedTuple):
+    nodes: tuple
+
+
+class Or(NamedTuple):
+    nodes: tuple
+
+
+OPERATORS = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+    "=": operator.eq,
+    "!=": operator.ne,
+}
+KEYWORDS = {"AND", "OR", "NOT"}
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<paren>[()])
+        |(?P<op>>=|<=|!=|>|<|=|:)
+        |"(?P<quoted>(?:[^"\\]|\\.)*)"
+        |(?P<word>[^\s()"<>=!:]+)
+    )""",
+    re.VERBOSE,
+)
+
+
+def tokenize(text: str) -> list:
+    """Return the (kind, value) tokens of a query"""
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise QueryError(f"unexpected {text[pos:].strip()[:10]!r} at {pos}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "quoted":
+            kind, value = "word", re.sub(r"\\(.)", r"\1", value)
+        elif kind == "word" and value in KEYWORDS:
+            kind = value
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser: or := and (OR and)*, and := not (AND not)*,
+    not := NOT not | ( or ) | field:value | field OP number"""
+
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self) -> tuple:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def take(self, kind: str) -> str:
+        token_kind, value = self.peek()
+        if token_kind != kind:
+            found = repr(value) if value is not None else "end of query"
+            raise QueryError(f"expected {kind}, found {found}")
+        self.pos += 1
+        return value
+
+    def parse(self) -> tuple:
+        if not self.tokens:
+            raise QueryError("empty query")
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise QueryError(f"unexpected {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self) -> tuple:
+        nodes = [self.parse_and()]
+        while self.peek()[0] == "OR":
+            self.pos += 1
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else Or(tuple(nodes))
+
+    def parse_and(self) -> tuple:
+        nodes = [self.parse_not()]
+        while self.peek()[0] == "AND":
+            self.pos += 1
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else And(tuple(nodes))
+
+    def parse_not(self) -> tuple:
+        kind, value = self.peek()
+        if kind == "NOT":
+            self.pos += 1
+            return Not(self.parse_not())
+        if kind == "paren" and value == "(":
+            self.pos += 1
+            node = self.parse_or()
+            if self.peek() != ("paren", ")"):
+                raise QueryError("missing )")
+            self.pos += 1
+            return node
+
+        field = self.take("word")
+        op = self.take("op")
+        value = self.take("word")
+        if op == ":":
+            return Term(field, value)
+        try:
+            return Compare(field, op, float(value))
+        except ValueError:
+            raise QueryError(f"{field}{op}{value}: expected a number") from None
+
+
+def _flatten(node: tuple) -> tuple:
+    """Merge nested ANDs and ORs and remove double NOTs"""
+    if isinstance(node, (And, Or)):
+        nodes = []
+        for child in map(_flatten, node.nodes):
+            if type(child) is type(node):
+                nodes.extend(child.nodes)
+            else:
+                nodes.append(child)
+        return type(node)(tuple(nodes))
+    if isinstance(node, Not):
+        child = _flatten(node.node)
+        return child.node if isinstance(child, Not) else Not(child)
+    return node
+
+
+class _Executor:
+    """Evaluate a plan on a DataFrame, one row mask per node"""
+
+    def __init__(self, ads: pd.DataFrame, strict: bool = True):
+        self.ads = ads
+        self.strict = strict
+        self.numbers = {}
+
+    def column(self, field: str) -> pd.Series:
+        if field not in self.ads.columns:
+            raise QueryError(f"unknown field {field!r}")
+        return self.ads[field]
+
+    def number(self, field: str) -> np.ndarray:
+        """Return a number field as floats, NaN if missing or not a number"""
+        if field not in self.numbers:
+            column = self.column(field)
+            if not pd.api.types.is_numeric_dtype(column.dtype):
+                column = pd.to_numeric(column, errors="coerce")
+            self.numbers[field] = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        return self.numbers[field]
+
+    def cost(self, node: tuple) -> int:
+        """Return the estimated number of matching ADs"""
+        size = len(self.ads)
+        if isinstance(node, Term):
+            index = frame_index(self.ads, node.field) if node.field in self.ads else None
+            return len(index.postings(node.value)) if index is not None else size
+        if isinstance(node, Not):
+            return size - self.cost(node.node)
+        if isinstance(node, And):
+            return min(self.cost(n) for n in node.nodes)
+        if isinstance(node, Or):
+            return min(size, sum(self.cost(n) for n in node.nodes))
+        return size // 2
+
+    def order(self, node: tuple) -> tuple:
+        """Return the plan with the terms of every AND by selectivity"""
+        if isinstance(node, Not):
+            return Not(self.order(node.node))
+        if isinstance(node, Or):
+            return Or(tuple(self.order(n) for n in node.nodes))
+        if isinstance(node, And):
+            return And(tuple(sorted((self.order(n) for n in node.nodes), key=self.cost)))
+        return node
+
+    def mask(self, node: tuple) -> np.ndarray:
+        if isinstance(node, (Term, Compare)) and not self.strict and node.field not in self.ads:
+            return np.zeros(len(self.ads), dtype=bool)
+        if isinstance(node, Term):
+            return self.term(node)
+        if isinstance(node, Compare):
+            values = self.number(node.field)
+            with np.errstate(invalid="ignore"):
+                return OPERATORS[node.op](values, node.value) & ~np.isnan(values)
+        if isinstance(node, Not):
+            return ~self.mask(node.node)
+        if isinstance(node, And):
+            mask = self.mask(node.nodes[0])
+            for child in node.nodes[1:]:
+                if not mask.any():
+                    break
+                mask &= self.mask(child)
+            return mask
+        mask = self.mask(node.nodes[0])
+        for child in node.nodes[1:]:
+            mask |= self.mask(child)
+        return mask
+
+    def term(self, node: Term) -> np.ndarray:
+        column = self.column(node.field)
+        index = frame_index(self.ads, node.field)
+        if index is not None:
+            return index.contains(node.value)
+        if pd.api.types.is_numeric_dtype(column.dtype):
+            try:
+                value = float(node.value)
+            except ValueError:
+                raise QueryError(f"{node.field}:{node.value}: expected a number") from None
+            return self.number(node.field) == value
+        # NOTE: substring of a text field, as get_set
+        return column.map(lambda x: isinstance(x, str) and node.value in x).to_numpy(dtype=bool)
+
+
+def _format(node: tuple) -> str:
+    if isinstance(node, Term):
+        value = node.value if re.fullmatch(r'[^\s()"<>=!:]+', node.value) else f'"{node.value}"'
+        return f"{node.field}:{value}"
+    if isinstance(node, Compare):
+        return f"{node.field}{node.op}{node.value:g}"
+    if isinstance(node, Not):
+        return "NOT " + _format(node.node)
+    keyword = " AND " if isinstance(node, And) else " OR "
+    return "(" + keyword.join(map(_format, node.nodes)) + ")"
+
+
+class Query:
+    """A parsed query"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.plan = _flatten(_Parser(text).parse())
+
+    def __repr__(self) -> str:
+        return f"Query({self.text!r})"
+
+    def fields(self) -> set:
+        """Return the fields used by the query"""
+        fields = set()
+        nodes = [self.plan]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, (And, Or)):
+                nodes.extend(node.nodes)
+            elif isinstance(node, Not):
+                nodes.append(node.node)
+            else:
+                fields.add(node.field)
+        return fields
+
+    def mask(self, ads: pd.DataFrame, strict: bool = True) -> np.ndarray:
+        """Return the mask of the ADs matching the query. With strict=False
+        a field ads does not have matches no AD instead of raising
+        QueryError."""
+        executor = _Executor(ads, strict)
+        return executor.mask(executor.order(self.plan))
+
+    def run(self, ads: pd.DataFrame) -> pd.DataFrame:
+        """Return the ADs matching the query"""
+        return ads[self.mask(ads)].copy()
+
+    def explain(self, ads: pd.DataFrame) -> str:
+        """Return the plan as executed on ads, most selective terms first"""
+        return _format(_Executor(ads).order(self.plan))
+
+
+@lru_cache(maxsize=256)
+def compile_query(text: str) -> Query:
+    """Return the parsed query of text, parsed once per text"""
+    return Query(text)
+
+
+def query(ads: pd.DataFrame, text: str) -> pd.DataFrame:
+    """Return the ADs of a DataFrame matching a query"""
+    return compile_query(text).run(ads)
+
+
+if __name__ == "__main__":
+    from analyze import get_dataframe
+
+    parser = argparse.ArgumentParser(description="Query AD files")
+    parser.add_argument("-i", "--input", type=str, nargs="+", required=True, help="AD files")
+    parser.add_argument("-q", "--query", type=str, required=True, help="Query, e.g., surf:BLE AND year>=2019")
+    parser.add_argument("-e", "--explain", action="store_true", help="Print the executed plan")
+    parser.add_argument("-c", "--count", action="store_true", help="Print the number of ADs only")
+    args = parser.parse_args()
+
+    try:
+        q = compile_query(args.query)
+    except QueryError as err:
+        sys.exit(f"Invalid query: {err}")
+
+    # NOTE: check() prints its progress on stdout
+    frames = [get_dataframe(Path(path)) for path in args.input]
+    ads = pd.concat(frames) if len(frames) > 1 else frames[0]
+
+    try:
+        if args.explain:
+            print(q.explain(ads))
+        result = q.run(ads)
+    except QueryError as err:
+        sys.exit(f"Invalid query: {err}")
+
+    if args.count:
+        print(len(result))
+    else:
+        for index, row in result.iterrows():
+            print(f"{index}: {row['a']}")
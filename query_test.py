@@ -0,0 +1,59 @@
+"""
+query_test.py
+
+"""
+from pathlib import Path
+
+import pytest
+
+from analyze import get_dataframe, get_set
+from query import And, Compare, Not, Or, QueryError, Term, compile_query, query
+
+
+@pytest.fixture
+def ads():
+    return get_dataframe(Path("catalog-mitre/bt.yaml"))
+
+
+def test_parse():
+    """Test the plans of the query parser."""
+    q = compile_query('surf:BLE AND (vect:"Key brute force" OR NOT NOT tag:LMP) AND year>=2019')
+    assert q.plan == And(
+        (
+            Term("surf", "BLE"),
+            Or((Term("vect", "Key brute force"), Term("tag", "LMP"))),
+            Compare("year", ">=", 2019.0),
+        )
+    )
+    assert compile_query("NOT a:KNOB").plan == Not(Term("a", "KNOB"))
+
+    for text in ["", "surf:", "surf:BC AND", "(surf:BC", "year>=new", "surf BC"]:
+        with pytest.raises(QueryError):
+            compile_query(text)
+
+
+def test_query(ads):
+    """Test the queries against get_set."""
+    assert query(ads, "surf:BC").equals(get_set(ads, "surf", "BC"))
+    assert query(ads, "tag:Protocol AND NOT tag:dual-mode").equals(
+        get_set(ads, "tag", "Protocol, not dual-mode")
+    )
+    assert query(ads, "a:KNOB").equals(get_set(ads, "a", "KNOB"))
+
+    either = query(ads, "surf:BC OR surf:BLE")
+    assert len(either) == len(get_set(ads, "surf", "BC")) + len(get_set(ads, "surf", "BLE")) - len(
+        get_set(ads, "surf", "BC, BLE")
+    )
+
+    recent = query(ads, "year>=2019 AND risk>7")
+    assert len(recent) > 0
+    assert ((recent.year >= 2019) & (recent.risk > 7)).all()
+
+    with pytest.raises(QueryError):
+        query(ads, "foo:BC")
+
+
+def test_explain(ads):
+    """Test the most selective terms come first."""
+    plan = compile_query("tag:Protocol AND a:KNOB AND surf:LMP").explain(ads)
+    assert plan.index("surf:LMP") < plan.index("tag:Protocol")
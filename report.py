@@ -0,0 +1,244 @@
+"""
+report.py
+
+Defense reports of a DataFrame of ADs in Markdown, HTML, CSV or JSON.
+
+The ADs are ranked by risk, highest first, ties in catalog order, and those
+without a numeric risk last. Only the top k ADs are selected with a heap
+rather than sorting the catalog. Every AD is turned into a record and written
+to the output stream right away, so the report is never held in memory. The
+mechanisms are deduplicated across the reported ADs: the report ends with
+every (policy, mechanism) pair, the number of ADs it defends and their risk.
+
+"""
+
+import csv
+import heapq
+import html
+import json
+import sys
+from collections import Counter
+from typing import NamedTuple, TextIO
+
+import numpy as np
+import pandas as pd
+
+from store import _missing, numeric_risks
+
+FORMATS = ["md", "html", "csv", "json"]
+
+
+class Record(NamedTuple):
+    """A reported AD"""
+
+    rank: int
+    key: str
+    attack: str
+    risk: object
+    defenses: dict
+
+
+def ranked(ads: pd.DataFrame, k: int = None):
+    """Yield the records of the ADs by decreasing risk, the top k only if k
+    is not None"""
+
+    risks = numeric_risks(ads)
+    if k is None:
+        rows = np.argsort(-risks, kind="stable")
+    else:
+        rows = heapq.nsmallest(k, range(len(ads)), key=lambda row: (-risks[row], row))
+
+    keys = ads.index
+    attacks = ads["a"] if "a" in ads else None
+    values = ads["risk"] if "risk" in ads else None
+    defenses = ads["d"] if "d" in ads else None
+    for rank, row in enumerate(rows, 1):
+        d = defenses.iat[row] if defenses is not None else None
+        yield Record(
+            rank,
+            keys[row],
+            attacks.iat[row] if attacks is not None else None,
+            values.iat[row] if values is not None else None,
+            d if isinstance(d, dict) else {},
+        )
+
+
+class Mechanisms:
+    """(policy, mechanism) -> number of ADs and their total risk"""
+
+    def __init__(self):
+        self.count = Counter()
+        self.risk = Counter()
+
+    def add(self, record: Record):
+        risk = pd.to_numeric(record.risk, errors="coerce") if not isinstance(record.risk, list) else None
+        for policy, mechanisms in record.defenses.items():
+            # NOTE: a mechanism listed twice in a policy counts once
+            for mechanism in dict.fromkeys(mechanisms or []):
+                self.count[(policy, mechanism)] += 1
+                if risk is not None and not _missing(risk):
+                    self.risk[(policy, mechanism)] += float(risk)
+
+    def items(self) -> list:
+        """Return (policy, mechanism, ADs, risk), most ADs first"""
+        pairs = sorted(self.count, key=lambda pair: (-self.count[pair], -self.risk[pair]))
+        return [(p, m, self.count[(p, m)], self.risk[(p, m)]) for p, m in pairs]
+
+
+class Writer:
+    """Write a report to a text stream: begin(), record() per AD,
+    mechanisms() once, end()"""
+
+    def __init__(self, out: TextIO):
+        self.out = out
+
+    def begin(self, title: str):
+        pass
+
+    def record(self, record: Record):
+        raise NotImplementedError
+
+    def mechanisms(self, items: list):
+        pass
+
+    def end(self):
+        pass
+
+
+def _risk(risk) -> str:
+    return "" if risk is None or (not isinstance(risk, list) and _missing(risk)) else str(risk)
+
+
+class MarkdownWriter(Writer):
+    def begin(self, title: str):
+        self.out.write(f"# {title}\n\n")
+
+    def record(self, record: Record):
+        self.out.write(f"## {record.rank}. {record.key}\n\n")
+        self.out.write(f"Attack: {record.attack}\n\nRisk: {_risk(record.risk)}\n\n")
+        for policy, mechanisms in record.defenses.items():
+            self.out.write(f"- {policy}\n")
+            for mechanism in mechanisms or []:
+                self.out.write(f"  - {mechanism}\n")
+        self.out.write("\n")
+
+    def mechanisms(self, items: list):
+        self.out.write("## Mechanisms\n\n| Policy | Mechanism | ADs | Risk |\n| --- | --- | --- | --- |\n")
+        for policy, mechanism, count, risk in items:
+            cells = [c.replace("|", "\\|") for c in (policy, mechanism)]
+            self.out.write(f"| {cells[0]} | {cells[1]} | {count} | {risk:g} |\n")
+        self.out.write("\n")
+
+
+class HtmlWriter(Writer):
+    def begin(self, title: str):
+        title = html.escape(title)
+        self.out.write(f"<!DOCTYPE html>\n<html>\n<head><title>{title}</title></head>\n<body>\n<h1>{title}</h1>\n")
+
+    def record(self, record: Record):
+        e = html.escape
+        self.out.write(f'<h2 id="{e(str(record.key))}">{record.rank}. {e(str(record.key))}</h2>\n')
+        self.out.write(f"<p>Attack: {e(str(record.attack))}<br>Risk: {e(_risk(record.risk))}</p>\n<ul>\n")
+        for policy, mechanisms in record.defenses.items():
+            self.out.write(f"<li>{e(policy)}<ul>")
+            self.out.write("".join(f"<li>{e(m)}</li>" for m in mechanisms or []))
+            self.out.write("</ul></li>\n")
+        self.out.write("</ul>\n")
+
+    def mechanisms(self, items: list):
+        e = html.escape
+        self.out.write("<h2>Mechanisms</h2>\n<table>\n<tr><th>Policy</th><th>Mechanism</th><th>ADs</th><th>Risk</th></tr>\n")
+        for policy, mechanism, count, risk in items:
+            self.out.write(f"<tr><td>{e(policy)}</td><td>{e(mechanism)}</td><td>{count}</td><td>{risk:g}</td></tr>\n")
+        self.out.write("</table>\n")
+
+    def end(self):
+        self.out.write("</body>\n</html>\n")
+
+
+class CsvWriter(Writer):
+    """One row per AD mechanism, then one row per deduplicated mechanism with
+    its number of ADs"""
+
+    def begin(self, title: str):
+        self.writer = csv.writer(self.out)
+        self.writer.writerow(["rank", "ad", "attack", "risk", "policy", "mechanism", "ads"])
+
+    def record(self, record: Record):
+        row = [record.rank, record.key, record.attack, _risk(record.risk)]
+        if not record.defenses:
+            self.writer.writerow(row + ["", "", ""])
+        for policy, mechanisms in record.defenses.items():
+            for mechanism in mechanisms or [""]:
+                self.writer.writerow(row + [policy, mechanism, ""])
+
+    def mechanisms(self, items: list):
+        for policy, mechanism, count, risk in items:
+            self.writer.writerow(["", "", "", f"{risk:g}", policy, mechanism, count])
+
+
+class JsonWriter(Writer):
+    """{"title": ..., "ads": [...], "mechanisms": [...]}, the ADs written one
+    by one"""
+
+    def begin(self, title: str):
+        self.out.write('{"title": ' + json.dumps(title) + ', "ads": [')
+        self.first = True
+
+    def record(self, record: Record):
+        data = record._asdict()
+        data["risk"] = _json_risk(record.risk)
+        self.out.write(("\n" if self.first else ",\n") + json.dumps(data, default=_json))
+        self.first = False
+
+    def mechanisms(self, items: list):
+        self.out.write('\n], "mechanisms": ')
+        keys = ["policy", "mechanism", "ads", "risk"]
+        json.dump([dict(zip(keys, item)) for item in items], self.out)
+
+    def end(self):
+        self.out.write("}\n")
+
+
+def _json_risk(risk):
+    # NOTE: NaN is not JSON, a missing risk is null
+    if risk is None or isinstance(risk, list):
+        return risk
+    return None if _missing(risk) else _json(risk)
+
+
+def _json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (int, float, str)):
+        return value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+WRITERS = {
+    "md": MarkdownWriter,
+    "html": HtmlWriter,
+    "csv": CsvWriter,
+    "json": JsonWriter,
+}
+
+
+def write_report(ads: pd.DataFrame, out: TextIO = None, fmt: str = "md", k: int = None, title: str = "Defense report") -> int:
+    """Write the defense report of the top k ADs by risk, all of them if k is
+    None, to out (stdout if None). Return the number of reported ADs."""
+
+    if fmt not in WRITERS:
+        raise ValueError(f"unknown report format {fmt!r}, expected one of {FORMATS}")
+    writer = WRITERS[fmt](out if out is not None else sys.stdout)
+    mechanisms = Mechanisms()
+
+    writer.begin(title)
+    count = 0
+    for record in ranked(ads, k):
+        writer.record(record)
+        mechanisms.add(record)
+        count += 1
+    writer.mechanisms(mechanisms.items())
+    writer.end()
+
+    return count
@@ -0,0 +1,66 @@
+"""
+report_test.py
+
+"""
+import csv
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from analyze import get_dataframe, get_defenses, get_report
+from report import FORMATS, ranked
+
+
+@pytest.fixture
+def ads():
+    return get_dataframe(Path("catalog-mitre/bt.yaml"))
+
+
+def test_ranked(ads):
+    """Test the top k ADs are the first k of the ranking."""
+    keys = [record.key for record in ranked(ads)]
+    assert sorted(keys) == sorted(ads.index)
+    assert [record.key for record in ranked(ads, 5)] == keys[:5]
+
+    # NOTE: ADs without risk come last
+    risks = [record.risk for record in ranked(ads)]
+    known = [risk for risk in risks if risk == risk]
+    assert risks[: len(known)] == sorted(known, reverse=True)
+
+
+def test_report(ads):
+    """Test the report formats."""
+    for fmt in FORMATS:
+        out = io.StringIO()
+        assert get_report(ads, out, fmt, k=3) == 3
+        assert len(out.getvalue()) > 0
+
+    out = io.StringIO()
+    get_report(ads, out, "json")
+    report = json.loads(out.getvalue())
+    assert len(report["ads"]) == len(ads)
+    counts = {}
+    for ad in report["ads"]:
+        for policy, mechanisms in ad["defenses"].items():
+            for mechanism in set(mechanisms):
+                counts[(policy, mechanism)] = counts.get((policy, mechanism), 0) + 1
+    assert {(m["policy"], m["mechanism"]): m["ads"] for m in report["mechanisms"]} == counts
+
+    out = io.StringIO()
+    get_report(ads, out, "csv", k=1)
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert {row["ad"] for row in rows if row["rank"]} == {next(ranked(ads, 1)).key}
+
+    with pytest.raises(ValueError):
+        get_report(ads, io.StringIO(), "pdf")
+
+
+def test_defenses(ads):
+    """Test the defenses are written to the given stream."""
+    out = io.StringIO()
+    get_defenses(ads, out)
+    blocks = out.getvalue().split("\n\n")
+    assert blocks[0].startswith(next(ranked(ads)).key + ":\n    Attack: ")
+    assert len(blocks) == len(ads) + 1
@@ -0,0 +1,281 @@
+"""
+similarity.py
+
+Find similar ADs between two AD dicts without scoring every pair.
+
+The score of a pair starts at 1.0 and is divided by a factor for every shared
+feature (identic TID, PID, CVE, a shared CWE, a matching surf, tag, model or
+vect field) and by (1 + ratio / 2) when the attack descriptions are similar. A
+pair is similar when its score is below the threshold.
+
+Inverted indexes over the features give, for each AD of the first dict, the
+product of the feature factors for every AD of the second dict. Pairs whose
+product cannot reach the threshold even with identical descriptions are never
+scored. Pairs matching no feature at all can only be similar by their
+description (threshold above 2/3), they are found with character trigram
+shingles.
+
+"""
+
+from difflib import SequenceMatcher
+from typing import NamedTuple
+
+import numpy as np
+
+# NOTE: (feature, factor) in the order the score is divided
+FEATURES = [
+    ("tid", 2.0),
+    ("pid", 4.0),
+    ("cve", 2.0),
+    ("cwe", 1.5),
+    ("surf", 1.25),
+    ("tag", 1.25),
+    ("model", 1.25),
+    ("vect", 1.25),
+]
+
+TERMS = ["surf", "tag", "model", "vect"]
+
+# NOTE: minimal description ratio considered, and the maximal text factor
+MIN_RATIO = 0.2
+MAX_TEXT_FACTOR = 1.5
+
+# NOTE: trigram Dice coefficient required for a description-only candidate,
+# relative to the SequenceMatcher ratio it needs
+SHINGLE_SLACK = 0.5
+
+_LOG = {
+    "tid": "identic TID, ",
+    "pid": "identic PID, ",
+    "cve": "identic CVE, ",
+    "cwe": "identic CWE, ",
+    "surf": "matching surf, ",
+    "tag": "matching tag, ",
+    "model": "matching model, ",
+    "vect": "matching vect, ",
+}
+
+
+class Match(NamedTuple):
+    """A pair of similar ADs, score 0.0 marks a duplicate key"""
+
+    ad1: str
+    ad2: str
+    score: float
+    log: str
+
+
+def _hashable(value):
+    """Return value as an index key"""
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _keys(ad: dict, feature: str) -> list:
+    """Return the index keys of an AD for a feature"""
+    match feature:
+        case "tid" | "pid" | "cve":
+            # NOTE: the whole value must be identic, also for cve lists
+            return [_hashable(ad[feature])] if feature in ad else []
+        case _:
+            return list(ad.get(feature, []))
+
+
+def _probes(ad: dict, feature: str) -> set:
+    """Return the terms of an AD that decide a term match
+
+    NOTE: this mirrors the historical check: a term field matches when one of
+    the terms shorter (in characters) than the number of terms in the field
+    is missing from the other AD. Keep it to preserve the scores.
+    """
+    terms = ad.get(feature, [])
+    return {term for term in terms if len(term) < len(terms)}
+
+
+def _shared(ad1: dict, ad2: dict) -> list[str]:
+    """Return the features matching between two ADs"""
+    shared = []
+    for feature, _ in FEATURES:
+        if feature in TERMS:
+            if _probes(ad1, feature) - set(ad2.get(feature, [])):
+                shared.append(feature)
+        elif set(_keys(ad1, feature)) & set(_keys(ad2, feature)):
+            shared.append(feature)
+    return shared
+
+
+def _trigrams(text: str) -> set[str]:
+    """Return the character trigrams of a text"""
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def score_pair(ad1: dict, ad2: dict, threshold: float = 1.0) -> tuple[float, str]:
+    """Score a pair of ADs, return the score and the matching symptoms
+
+    The description ratio is skipped when it cannot bring the score below
+    threshold, use threshold=1.0 to always compute it.
+    """
+
+    score = 1.0
+    log = ""
+    factors = dict(FEATURES)
+    for feature in _shared(ad1, ad2):
+        score = score / factors[feature]
+        log = log + _LOG[feature]
+
+    matcher = SequenceMatcher(None, ad1["a"], ad2["a"])
+    if score >= threshold > 0:
+        # NOTE: ratio needed to reach threshold, real_quick_ratio and
+        # quick_ratio are upper bounds of ratio
+        needed = max(2 * (score / threshold - 1), MIN_RATIO)
+        if matcher.real_quick_ratio() <= needed or matcher.quick_ratio() <= needed:
+            return score, log
+
+    adiff = matcher.ratio()
+    if adiff > MIN_RATIO:
+        score = score / (1 + adiff / 2)
+        log = log + "attack description, "
+
+    return score, log
+
+
+def _brute_force(ad1_dict: dict, ad2_dict: dict, threshold: float) -> list[Match]:
+    """Score every pair of ADs"""
+    matches = []
+    for key1, ad1 in ad1_dict.items():
+        for key2, ad2 in ad2_dict.items():
+            if key1 == key2:
+                matches.append(Match(key1, key2, 0.0, "duplicate key, "))
+                continue
+            score, log = score_pair(ad1, ad2, 1.0)
+            if score < threshold:
+                matches.append(Match(key1, key2, score, log))
+    return matches
+
+
+class SimilarityIndex:
+    """Inverted feature and trigram indexes over an AD dict"""
+
+    def __init__(self, ad_dict: dict):
+        self.keys = list(ad_dict)
+        self.ads = list(ad_dict.values())
+        self.positions = {key: pos for pos, key in enumerate(self.keys)}
+
+        # NOTE: feature -> key -> positions of the ADs having it
+        self.postings = {feature: {} for feature, _ in FEATURES}
+        for pos, ad in enumerate(self.ads):
+            for feature, _ in FEATURES:
+                for key in set(_keys(ad, feature)):
+                    self.postings[feature].setdefault(key, []).append(pos)
+        for feature in self.postings:
+            for key, positions in self.postings[feature].items():
+                self.postings[feature][key] = np.array(positions, dtype=np.int64)
+
+        self._shingles = None
+
+    def _build_shingles(self):
+        """Build the trigram index, only description-only candidates need it"""
+        shingles = {}
+        self._shingle_sizes = np.zeros(len(self.ads), dtype=np.int64)
+        for pos, ad in enumerate(self.ads):
+            trigrams = _trigrams(ad["a"])
+            self._shingle_sizes[pos] = len(trigrams)
+            for trigram in trigrams:
+                shingles.setdefault(trigram, []).append(pos)
+        self._shingles = {
+            trigram: np.array(positions, dtype=np.int64)
+            for trigram, positions in shingles.items()
+        }
+
+    def _mask(self, feature: str, keys) -> np.ndarray:
+        """Return the ADs having any of keys for feature"""
+        mask = np.zeros(len(self.ads), dtype=bool)
+        hits = [self.postings[feature][k] for k in keys if k in self.postings[feature]]
+        if hits:
+            mask[np.concatenate(hits)] = True
+        return mask
+
+    def factors(self, ad: dict) -> np.ndarray:
+        """Return the product of the matching feature factors with every AD"""
+        product = np.ones(len(self.ads))
+        for feature, factor in FEATURES:
+            if feature in TERMS:
+                probes = _probes(ad, feature)
+                if not probes:
+                    continue
+                # NOTE: matches unless the other AD has all the probes
+                having = np.ones(len(self.ads), dtype=bool)
+                for probe in probes:
+                    having &= self._mask(feature, [probe])
+                product[~having] *= factor
+            else:
+                keys = set(_keys(ad, feature))
+                if keys:
+                    product[self._mask(feature, keys)] *= factor
+        return product
+
+    def dice(self, ad: dict) -> np.ndarray:
+        """Return the trigram Dice coefficient of ad["a"] with every AD"""
+        if self._shingles is None:
+            self._build_shingles()
+        trigrams = _trigrams(ad["a"])
+        hits = [self._shingles[t] for t in trigrams if t in self._shingles]
+        if not hits:
+            return np.zeros(len(self.ads))
+        common = np.bincount(np.concatenate(hits), minlength=len(self.ads))
+        sizes = self._shingle_sizes + len(trigrams)
+        return np.divide(2 * common, sizes, out=np.zeros(len(self.ads)), where=sizes > 0)
+
+    def candidates(self, ad: dict, threshold: float) -> np.ndarray:
+        """Return the positions of the ADs that may be similar to ad"""
+
+        product = self.factors(ad)
+        # NOTE: even identical descriptions cannot reach the threshold
+        reachable = product * MAX_TEXT_FACTOR * threshold > 1.0 - 1e-9
+        featured = reachable & (product > 1.0)
+        if threshold * MAX_TEXT_FACTOR > 1.0:
+            # NOTE: no matching feature, only the description can match
+            needed = max(2 * (1.0 / threshold - 1), MIN_RATIO)
+            plain = reachable & (product == 1.0)
+            if plain.any():
+                featured |= plain & (self.dice(ad) >= SHINGLE_SLACK * needed)
+        return np.flatnonzero(featured)
+
+    def similar(self, ad_dict: dict, threshold: float) -> list[Match]:
+        """Return the ADs of ad_dict similar to the indexed ADs"""
+        matches = []
+        for key1, ad1 in ad_dict.items():
+            found = []
+            if key1 in self.positions:
+                found.append((self.positions[key1], Match(key1, key1, 0.0, "duplicate key, ")))
+            for pos in self.candidates(ad1, threshold):
+                key2 = self.keys[pos]
+                if key1 == key2:
+                    continue
+                score, log = score_pair(ad1, self.ads[pos], threshold)
+                if score < threshold:
+                    found.append((pos, Match(key1, key2, score, log)))
+            matches.extend(match for _, match in sorted(found))
+        return matches
+
+
+def similar_ads(
+    ad1_dict: dict, ad2_dict: dict, threshold: float, brute_force: bool = False
+) -> list[Match]:
+    """Return the pairs of ADs with a score below threshold, in ad1_dict then
+    ad2_dict order"""
+
+    if brute_force:
+        return _brute_force(ad1_dict, ad2_dict, threshold)
+
+    return SimilarityIndex(ad2_dict).similar(ad1_dict, threshold)
+
+
+def recall(ad1_dict: dict, ad2_dict: dict, threshold: float) -> float:
+    """Return the fraction of the brute force matches found using the indexes"""
+
+    expected = {(m.ad1, m.ad2) for m in similar_ads(ad1_dict, ad2_dict, threshold, True)}
+    if not expected:
+        return 1.0
+    found = {(m.ad1, m.ad2) for m in similar_ads(ad1_dict, ad2_dict, threshold)}
+
+    return len(expected & found) / len(expected)
@@ -0,0 +1,26 @@
+"""
+similarity_test.py
+
+"""
+from pathlib import Path
+
+from parse import parse
+from similarity import (
+    similar_ads,
+    recall,
+)
+
+
+def test_similar_ads():
+    """Test the indexed search finds the brute force matches."""
+    bt_dict = parse(Path("catalog-mitre/bt.yaml"))
+    fido_dict = parse(Path("catalog-mitre/fido.yaml"))
+
+    for threshold in [0.3, 0.5, 0.6]:
+        brute = similar_ads(bt_dict, bt_dict, threshold, brute_force=True)
+        assert similar_ads(bt_dict, bt_dict, threshold) == brute
+        assert recall(bt_dict, fido_dict, threshold) == 1.0
+
+    # NOTE: every AD is a duplicate of itself
+    duplicates = [m for m in similar_ads(bt_dict, bt_dict, 0.5) if m.score == 0.0]
+    assert len(duplicates) == len(bt_dict)
@@ -0,0 +1,495 @@
+"""
+sitegen.py
+
+Pre-render the EMB3D pages of the visualization (visualization/map_*.md,
+model_*.md and catalog_*.md).
+
+The page templates used to iterate every dictionary surf and vect and every
+AD of the catalog for each PID of a page. Here the ADs of a catalog are joined
+with EMB3D once (see mapping.py) and grouped by PID and TID:
+
+    visualization/_data/grouped/<name>.json     site.data.grouped.<name>
+
+        pids: "PID-11" -> name, surfaces (term, alias, description, vects
+              with their ADs), tids (the EMB3D relates-to threats)
+        tids: "TID-101" -> name, pids, mitigations, ads
+
+The surfaces without a PID are grouped under "PID-", as the templates name
+them. The page bodies are rendered from the groups to
+visualization/_includes/generated/<page>.md, the pages only include them.
+
+The site data is synced with its sources first: _data/ad, _data/dicts,
+_data/emb3d.json and _data/model_emb3d.yaml link to catalog-mitre/, dicts/
+and mitre/ (they are refreshed file by file when they are copies), and the
+model_*.yaml subsets are renamed and reordered as in mitre/surfaces.yaml.
+
+A file is regenerated only if the digest of its inputs (catalog, dictionary,
+model, EMB3D bundle and surfaces) changed. The source and output digests are
+kept in visualization/.sitegen.json, check() (-c) compares them without
+writing, so the site build and CI can skip all work when nothing changed.
+
+NOTE: as in mapping.py, a vect word is matched exactly, and an AD is listed
+once per surf term and vect term.
+
+Usage: python sitegen.py [-f | -c]
+
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from parse import _digest, parse_cached
+
+ROOT = Path(__file__).parent
+SITE = ROOT / "visualization"
+MANIFEST = ".sitegen.json"
+
+# NOTE: site data -> source, relative to SITE and ROOT
+LINKS = {
+    "_data/ad": "catalog-mitre",
+    "_data/dicts": "dicts",
+    "_data/emb3d.json": "mitre/emb3d-stix-2.0.1.json",
+    "_data/model_emb3d.yaml": "mitre/surfaces.yaml",
+}
+
+# NOTE: bump when the generated files change, it regenerates all of them
+GENERATOR_VERSION = 1
+
+PROPERTY_URL = "https://emb3d.mitre.org/properties-mapper/?id=PID-{}"
+THREAT_URL = "https://emb3d.mitre.org/threats/TID-{}.html"
+
+
+def pid_key(pid) -> str:
+    """Return the group key of a PID, "PID-" for no PID"""
+    return "PID-" if pid is None else f"PID-{pid}"
+
+
+def _risk(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return None
+    return value
+
+
+def severity(risk) -> str:
+    """Return the CSS class of a risk value"""
+    if risk is None:
+        return "risk_severity_none"
+    if 7 <= risk <= 10:
+        return "risk_severity_high"
+    if risk >= 4:
+        return "risk_severity_medium"
+    if risk >= 0:
+        return "risk_severity_low"
+    return "risk_severity_none"
+
+
+def group(ads: dict, words: dict, emb3d, names: dict = None) -> dict:
+    """Return the ADs grouped by PID and by TID
+
+    ads and words are the parsed catalog and dictionary, emb3d the EMB3D index
+    and names the property names by PID of the EMB3D surfaces, used when the
+    index does not have a PID.
+    """
+    import pandas as pd
+
+    from dictionary import Dictionary
+    from mapping import join
+
+    names = names or {}
+    joined = join(pd.DataFrame.from_dict(ads, orient="index"), Dictionary(words))
+
+    # NOTE: (surf term, vect term) -> AD key -> AD, of all the surfs and of
+    # the most significant one, the templates only match the first vect
+    pairs = {}
+    by_tid = {}
+    for row in joined.itertuples(index=False):
+        if pd.isna(row.surf_term) or pd.isna(row.vect_term):
+            continue
+        risk = _risk(row.risk)
+        ad = {"key": row.ad, "a": row.a, "risk": risk, "severity": severity(risk)}
+        if row.tid is not pd.NA:
+            by_tid.setdefault(int(row.tid), {}).setdefault(row.ad, ad)
+        if row.vect_rank != 0:
+            continue
+        all_ads, primary_ads = pairs.setdefault((row.surf_term, row.vect_term), ({}, {}))
+        all_ads.setdefault(row.ad, ad)
+        if row.surf_rank == 0:
+            primary_ads.setdefault(row.ad, ad)
+
+    def name(pid):
+        if pid in emb3d.properties:
+            return emb3d.properties[pid].name
+        return names.get(pid)
+
+    def threats(tids):
+        return [{"tid": tid, "name": emb3d.threats[tid].name} for tid in tids]
+
+    pids = {}
+    for pid in emb3d.properties:
+        tids = threats(emb3d.pid_tids.get(pid, ()))
+        pids[pid_key(pid)] = {"pid": pid, "name": name(pid), "surfaces": [], "tids": tids}
+
+    for term, surf in words["surf"].items():
+        pid = surf.get("pid")
+        entry = pids.setdefault(pid_key(pid), {"pid": pid, "name": name(pid), "surfaces": [], "tids": []})
+        vects, primary_vects = [], []
+        for vect_term, vect in words["vect"].items():
+            all_ads, primary_ads = pairs.get((term, vect_term), ({}, {}))
+            for ads_of, found in [(vects, all_ads), (primary_vects, primary_ads)]:
+                if found:
+                    ads_of.append({"term": vect_term, "tid": vect.get("tid"), "ads": list(found.values())})
+        entry["surfaces"].append(
+            {
+                "term": term,
+                "alias": list(surf.get("alias") or []),
+                "description": surf.get("description"),
+                "vects": vects,
+                "primary_vects": primary_vects,
+            }
+        )
+
+    tids = {}
+    for tid in sorted(set(emb3d.threats) | set(by_tid)):
+        threat = emb3d.threats.get(tid)
+        tids[f"TID-{tid}"] = {
+            "tid": tid,
+            "name": threat.name if threat else None,
+            "pids": list(emb3d.tid_pids.get(tid, ())),
+            "mitigations": [
+                {"mid": mid, "name": emb3d.mitigations[mid].name} for mid in emb3d.threat_mitigations(tid)
+            ],
+            "ads": list(by_tid.get(tid, {}).values()),
+        }
+
+    return {"pids": pids, "tids": tids}
+
+
+def _threat(tid) -> str:
+    return f'(<a href="{THREAT_URL.format(tid)}" target="_blank">MITRE EM3ED TID-{tid}</a>)'
+
+
+def render_surfaces(grouped: dict, pid, dir_ad: str, primary: bool) -> str:
+    """Return the markdown of a PID: its surfaces, vects and ADs, then its
+    EMB3D threats"""
+
+    entry = grouped["pids"].get(pid_key(pid), {"pid": pid, "name": None, "surfaces": [], "tids": []})
+    lines = []
+    for surf in entry["surfaces"]:
+        vects = surf["primary_vects" if primary else "vects"]
+        if not vects:
+            continue
+        if not lines:
+            if pid is None:
+                lines.append("## ADF-Only Surfaces (No MITRE EM3ED PID)")
+            else:
+                lines.append(
+                    f'## {entry["name"]} (<a href="{PROPERTY_URL.format(pid)}">MITRE EM3ED {pid_key(pid)}</a>)'
+                )
+        lines.append("### " + surf["term"])
+        lines.append("  * Keys: " + surf["term"] + " " + "".join(" \\| " + str(alias) for alias in surf["alias"]))
+        lines.append("  * Description: " + str(surf["description"] or ""))
+        lines.append("  * Attack Vectors and Threats:")
+        for vect in vects:
+            lines.append("    * " + vect["term"] + ("  " + _threat(vect["tid"]) if vect["tid"] is not None else ""))
+            for ad in vect["ads"]:
+                lines.append(f'      * <a href="{dir_ad}/{ad["key"]}.html">{ad["a"]}</a>')
+
+    if not lines and pid is not None:
+        lines.append(
+            f'## EM3ED-only: {entry["name"]} '
+            f'(<a href="{PROPERTY_URL.format(pid)}" target="_blank">MITRE EM3ED {pid_key(pid)}</a>)'
+        )
+        lines.append("  * Attack Vectors and Threats:")
+    for threat in entry["tids"]:
+        lines.append("    * " + threat["name"] + " " + _threat(threat["tid"]))
+
+    # NOTE: blank lines between the items, as the templates rendered them
+    return "\n\n".join(lines) + "\n" if lines else ""
+
+
+def render_catalog(grouped: dict, pid, dir_ad: str) -> str:
+    """Return the threat catalog table rows of a PID"""
+
+    entry = grouped["pids"].get(pid_key(pid), {"surfaces": [], "tids": []})
+    rows = []
+    for surf in entry["surfaces"]:
+        for vect in surf["primary_vects"]:
+            link = f'<a href="{THREAT_URL.format(vect["tid"])}" target="_blank">MITRE EM3ED TID-{vect["tid"]}</a>'
+            if vect["tid"] is not None:
+                rows.append(f"<tr><td> {vect['term']}  </td><td> {link} </td><td> n/a </td></tr>")
+            for ad in vect["ads"]:
+                rows.append(
+                    f'<tr><td> <a href="{dir_ad}/{ad["key"]}.html">{ad["a"]}</a>  </td>'
+                    f'<td> {link if vect["tid"] is not None else ""} </td>'
+                    f'<td class="{ad["severity"]}"> {"n/a" if ad["risk"] is None else ad["risk"]} </td></tr>'
+                )
+    for threat in entry["tids"]:
+        link = f'<a href="{THREAT_URL.format(threat["tid"])}" target="_blank">MITRE EM3ED TID-{threat["tid"]}</a>'
+        rows.append(f"<tr><td> {threat['name']}  </td><td> {link} </td><td> n/a </td></tr>")
+
+    return "".join(row + "\n" for row in rows)
+
+
+def page_pids(kind: str, words: dict, model: dict = None) -> list:
+    """Return the PIDs of a page, in page order: the dictionary PIDs of a map
+    page, the model PIDs of a model or catalog page"""
+    if kind == "map":
+        return list(dict.fromkeys(surf.get("pid") for surf in words["surf"].values()))
+    return [surf.get("pid") for surf in (model or {}).values()]
+
+
+def render(kind: str, name: str, grouped: dict, words: dict, model: dict = None) -> str:
+    """Return the body of the kind (map, model or catalog) page of a catalog"""
+    dir_ad = "ad_" + name
+    parts = []
+    for pid in page_pids(kind, words, model):
+        if kind == "catalog":
+            parts.append(render_catalog(grouped, pid, dir_ad))
+        else:
+            parts.append(render_surfaces(grouped, pid, dir_ad, primary=kind == "model"))
+    return "\n".join(part for part in parts if part)
+
+
+def derive_model(text: str, surfaces: dict) -> str:
+    """Return a model file with its PIDs named and ordered as in the EMB3D
+    surfaces, its header kept. The PIDs missing from surfaces stay last."""
+    import yaml
+
+    from parse import yaml_loader
+
+    lines = text.splitlines(keepends=True)
+    start = 0
+    while start < len(lines) and (not lines[start].strip() or lines[start].startswith(("#", "---"))):
+        start += 1
+    model = yaml.load(text, yaml_loader()) or {}
+
+    names = {surf.get("pid"): term for term, surf in surfaces.items()}
+    order = {pid: rank for rank, pid in enumerate(names)}
+    pids = sorted(dict.fromkeys(surf.get("pid") for surf in model.values()), key=lambda pid: order.get(pid, len(order)))
+    current = {surf.get("pid"): term for term, surf in model.items()}
+
+    entries = [f"{names.get(pid, current[pid])}:\n    pid: {pid}\n" for pid in pids]
+    return "".join(lines[:start]) + "\n".join(entries)
+
+
+def drift(root: Path = ROOT, site: Path = SITE) -> list:
+    """Return the site data out of sync with its sources: (path, source,
+    reason), reason is missing, link, copy or model"""
+
+    root, site = Path(root), Path(site)
+    found = []
+    for name, source in LINKS.items():
+        path, source = site / name, root / source
+        if path.is_symlink():
+            if path.resolve() != source.resolve():
+                found.append((path, source, "link"))
+        elif not path.exists():
+            found.append((path, source, "missing"))
+        elif _tree(path) != _tree(source):
+            # NOTE: a copy, e.g., a checkout without symlinks
+            found.append((path, source, "copy"))
+
+    surfaces_path = root / "mitre" / "surfaces.yaml"
+    surfaces = parse_cached(surfaces_path)
+    for model in sorted((site / "_data").glob("model_*.yaml")):
+        if model.relative_to(site).as_posix() in LINKS:
+            continue
+        text = model.read_text(encoding="utf8")
+        if derive_model(text, surfaces) != text:
+            found.append((model, surfaces_path, "model"))
+    return found
+
+
+def _tree(path: Path) -> dict:
+    """Return the content digest of a file, of every file of a directory"""
+    if path.is_dir():
+        return {entry.relative_to(path).as_posix(): _digest(entry) for entry in path.rglob("*") if entry.is_file()}
+    return {"": _digest(path)}
+
+
+def sync(root: Path = ROOT, site: Path = SITE) -> list:
+    """Bring the site data in sync with its sources, return the written
+    paths"""
+
+    written = []
+    surfaces = parse_cached(Path(root) / "mitre" / "surfaces.yaml")
+    for path, source, reason in drift(root, site):
+        if reason == "model":
+            _write(path, derive_model(path.read_text(encoding="utf8"), surfaces))
+        elif reason in ["missing", "link"]:
+            if path.is_symlink():
+                path.unlink()
+            try:
+                path.symlink_to(os.path.relpath(source, path.parent), target_is_directory=source.is_dir())
+            except OSError:
+                _copy(source, path)
+        else:
+            _copy(source, path)
+        written.append(path)
+    return written
+
+
+def _copy(source: Path, path: Path):
+    """Copy the files of source that differ from path, remove the others"""
+    if source.is_file():
+        shutil.copyfile(source, path)
+        return
+    old, new = (_tree(path) if path.is_dir() else {}), _tree(source)
+    for name, digest in new.items():
+        if old.get(name) != digest:
+            (path / name).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(source / name, path / name)
+    for name in set(old) - set(new):
+        (path / name).unlink()
+
+
+def outputs(root: Path = ROOT, site: Path = SITE) -> dict:
+    """Return the generated files of every catalog with a dictionary: name ->
+    kind -> (path, inputs). data is the grouped data file."""
+
+    root, site = Path(root), Path(site)
+    shared = [root / "mitre" / "emb3d-stix-2.0.1.json", root / "mitre" / "surfaces.yaml"]
+    files = {}
+    for catalog in sorted((root / "catalog-mitre").glob("*.yaml")):
+        name = catalog.stem
+        words = root / "dicts" / (name + ".yaml")
+        if not words.exists():
+            continue
+        inputs = [catalog, words] + shared
+        files[name] = {
+            "data": (site / "_data" / "grouped" / (name + ".json"), inputs),
+            "map": (site / "_includes" / "generated" / f"map_{name}.md", inputs),
+        }
+        model = site / "_data" / f"model_{name}.yaml"
+        if model.exists():
+            for kind in ["model", "catalog"]:
+                files[name][kind] = (site / "_includes" / "generated" / f"{kind}_{name}.md", inputs + [model])
+    return files
+
+
+def _write(path: Path, text: str):
+    # NOTE: write and rename, a running jekyll never reads a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf8")
+    os.replace(tmp, path)
+
+
+def _manifest(site: Path) -> dict:
+    try:
+        manifest = json.loads((Path(site) / MANIFEST).read_text(encoding="utf8"))
+    except (OSError, ValueError):
+        manifest = {}
+    return {"sources": manifest.get("sources", {}), "outputs": manifest.get("outputs", {})}
+
+
+def status(root: Path = ROOT, site: Path = SITE, force: bool = False) -> tuple:
+    """Return the source digests and the stale outputs: name -> kind ->
+    (path, manifest key, inputs digest)"""
+
+    root, site = Path(root), Path(site)
+    recorded = _manifest(site)["outputs"]
+    sources = {}
+
+    def inputs_digest(paths: list) -> str:
+        digest = hashlib.sha256(str(GENERATOR_VERSION).encode("utf8"))
+        for path in paths:
+            name = os.path.relpath(path, root)
+            if name not in sources:
+                sources[name] = _digest(path)
+            digest.update(f"{name}:{sources[name]}\n".encode("utf8"))
+        return digest.hexdigest()
+
+    stale = {}
+    for name, files in outputs(root, site).items():
+        for kind, (path, inputs) in files.items():
+            digest = inputs_digest(inputs)
+            key = path.relative_to(site).as_posix()
+            if force or recorded.get(key) != digest or not path.exists():
+                stale.setdefault(name, {})[kind] = (path, key, digest)
+    return sources, stale
+
+
+def generate(root: Path = ROOT, site: Path = SITE, force: bool = False) -> list:
+    """Sync the site data, then generate the grouped data files and the page
+    bodies whose inputs changed, all of them if force. Return the written
+    paths."""
+
+    from emb3d import load
+
+    root, site = Path(root), Path(site)
+    written = sync(root, site)
+    manifest = _manifest(site)
+    sources, stale = status(root, site, force)
+
+    for name, files in stale.items():
+        # NOTE: the catalog is parsed and joined only if one of its files is stale
+        words = parse_cached(root / "dicts" / (name + ".yaml"))
+        surfaces = parse_cached(root / "mitre" / "surfaces.yaml")
+        names = {surf.get("pid"): term for term, surf in surfaces.items()}
+        grouped = group(
+            parse_cached(root / "catalog-mitre" / (name + ".yaml")),
+            words,
+            load(root / "mitre" / "emb3d-stix-2.0.1.json"),
+            names,
+        )
+        model_path = site / "_data" / f"model_{name}.yaml"
+        model = parse_cached(model_path) if model_path.exists() else None
+
+        for kind, (path, key, digest) in files.items():
+            if kind == "data":
+                text = json.dumps(grouped, indent=1, ensure_ascii=False) + "\n"
+            else:
+                text = render(kind, name, grouped, words, model)
+            _write(path, text)
+            manifest["outputs"][key] = digest
+            written.append(path)
+
+    if written or manifest["sources"] != sources:
+        manifest["sources"] = sources
+        _write(site / MANIFEST, json.dumps(manifest, indent=1, sort_keys=True) + "\n")
+    return written
+
+
+def check(root: Path = ROOT, site: Path = SITE) -> list:
+    """Return the messages of what generate would do, none if the site is up
+    to date"""
+
+    def relative(path):
+        return os.path.relpath(path, root)
+
+    messages = [
+        f"{relative(path)}: {reason} out of sync with {relative(source)}" for path, source, reason in drift(root, site)
+    ]
+    recorded = _manifest(site)["sources"]
+    sources, stale = status(root, site)
+    messages += [f"{name}: changed" for name, digest in sources.items() if recorded.get(name) != digest]
+    messages += [f"{relative(path)}: stale" for files in stale.values() for path, _, _ in files.values()]
+    return messages
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Pre-render the EMB3D pages of the visualization")
+    parser.add_argument("-f", "--force", help="Regenerate all the files", action="store_true")
+    parser.add_argument(
+        "-c", "--check", help="Only report the out of sync files, exit 1 if any", action="store_true"
+    )
+
+    args = parser.parse_args()
+
+    if args.check:
+        messages = check()
+        for message in messages:
+            print("INFO: " + message)
+        raise SystemExit(1 if messages else 0)
+
+    written = generate(force=args.force)
+    for path in written:
+        print("INFO: " + os.path.relpath(path, ROOT) + " written.")
+    if not written:
+        print("INFO: Up to date.")
@@ -0,0 +1,154 @@
+"""
+sitegen_test.py
+
+"""
+import re
+import shutil
+from pathlib import Path
+
+import yaml
+
+from emb3d import load
+from parse import parse
+from sitegen import check, derive_model, drift, generate, group, page_pids, render, sync
+
+
+def _liquid(ads: dict, words: dict, pids: list, primary: bool) -> list:
+    """The AD links of the removed display_surfaces template loops, as
+    (pid, surf term, vect term, AD key, exact vect match)
+
+    Liquid `contains` is a substring test on the vect term, and an AD is
+    linked once per of its surf words matching the surf term or an alias.
+    """
+    links = []
+    for pid in pids:
+        for surf_term, surf in words["surf"].items():
+            if surf.get("pid") != pid:
+                continue
+            for vect_term, vect in words["vect"].items():
+                for key, ad in ads.items():
+                    surfs = ad.get("surf") or []
+                    for ad_surf in surfs:
+                        if primary and ad_surf != surfs[0]:
+                            continue
+                        if not (surf_term == ad_surf or ad_surf in surf["alias"]):
+                            continue
+                        ad_vect = (ad.get("vect") or [None])[0]
+                        if ad_vect is None:
+                            continue
+                        exact = vect_term == ad_vect or ad_vect in vect["alias"]
+                        if exact or ad_vect in vect_term:
+                            links.append((pid, surf_term, vect_term, key, exact))
+    return links
+
+
+def test_render():
+    """Test the pre-rendered pages against the removed template loops, with
+    the documented differences: exact vect matches only, an AD listed once
+    per surf and vect term."""
+    emb3d = load()
+    for name in ["bt", "physical"]:
+        ads = parse(Path(f"catalog-mitre/{name}.yaml"))
+        words = parse(Path(f"dicts/{name}.yaml"))
+        model = parse(Path(f"visualization/_data/model_{name}.yaml"))
+        grouped = group(ads, words, emb3d)
+
+        for kind, primary in [("map", False), ("model", True), ("catalog", True)]:
+            page = render(kind, name, grouped, words, model)
+            links = re.findall(rf'href="ad_{name}/(.+?)\.html"', page)
+
+            liquid = _liquid(ads, words, page_pids(kind, words, model), primary)
+            expected = [link[3] for link in dict.fromkeys(link[:4] for link in liquid if link[4])]
+            assert links == expected
+
+        catalog = render("catalog", name, grouped, words, model)
+        assert all(line.startswith("<tr>") for line in catalog.splitlines() if line)
+
+
+def test_render_differences():
+    """Test the documented differences with the removed template loops."""
+    words = {
+        "surf": {"BC": {"alias": ["Classic"], "description": "", "pid": 11}},
+        "vect": {"Sniffing passive": {"alias": [], "description": ""}, "Spoofing": {"alias": ["Spoof"], "description": ""}},
+        "model": {},
+        "tag": {},
+    }
+    ads = {
+        "sniff": {"a": "Sniff", "surf": ["BC"], "vect": ["Sniffing"], "model": [], "tag": []},
+        "spoof": {"a": "Spoof", "surf": ["BC", "Classic"], "vect": ["Spoof"], "model": [], "tag": []},
+    }
+    page = render("map", "t", group(ads, words, load()), words)
+
+    # NOTE: the templates linked "sniff" (substring of a vect term) and
+    # "spoof" once per matching surf word
+    assert [link[3] for link in _liquid(ads, words, page_pids("map", words, None), False)] == ["sniff", "spoof", "spoof"]
+    assert re.findall(r'href="ad_t/(.+?)\.html"', page) == ["spoof"]
+
+
+def test_group():
+    """Test the TID groups."""
+    emb3d = load()
+    ads = parse(Path("catalog-mitre/bt.yaml"))
+    words = parse(Path("dicts/bt.yaml"))
+    grouped = group(ads, words, emb3d)
+
+    assert set(grouped["pids"]) >= {f"PID-{pid}" for pid in emb3d.properties}
+    tid = {word: vect.get("tid") for term, vect in words["vect"].items() for word in [term] + vect["alias"]}
+    for threat in grouped["tids"].values():
+        for ad in threat["ads"]:
+            assert threat["tid"] in [tid.get(word) for word in ads[ad["key"]]["vect"]]
+        assert [m["mid"] for m in threat["mitigations"]] == list(emb3d.threat_mitigations(threat["tid"]))
+
+
+def test_incremental(tmp_path):
+    """Test that only the files with changed inputs are regenerated."""
+    (tmp_path / "_data").mkdir()
+    for name in ["bt", "physical", "software"]:
+        shutil.copy(f"visualization/_data/model_{name}.yaml", tmp_path / "_data")
+
+    written = generate(site=tmp_path)
+    assert len(written) == 4 + 4 * 2 + 3 * 2
+    assert (tmp_path / "_data" / "ad").is_symlink()
+    assert generate(site=tmp_path) == []
+    assert check(site=tmp_path) == []
+
+    with open(tmp_path / "_data" / "model_bt.yaml", "a") as file:
+        file.write("\nVirtualization:\n    pid: 24\n")
+    assert len(check(site=tmp_path)) == 4
+    assert sorted(p.name for p in generate(site=tmp_path)) == ["catalog_bt.md", "model_bt.md", "model_bt.yaml"]
+
+    (tmp_path / "_data" / "grouped" / "fido.json").unlink()
+    assert [p.name for p in generate(site=tmp_path)] == ["fido.json"]
+    assert len(generate(site=tmp_path, force=True)) == len(written) - 4
+
+
+def test_sync(tmp_path):
+    """Test the drift of copied and derived site data."""
+    surfaces = parse(Path("mitre/surfaces.yaml"))
+    for name in ["bt", "physical", "software"]:
+        text = Path(f"visualization/_data/model_{name}.yaml").read_text()
+        assert derive_model(text, surfaces) == text
+
+    model = "---\n# header\n\nOld name:\n    pid: 12\n\nDevice includes a microprocessor:\n    pid: 11\n"
+    derived = derive_model(model, surfaces)
+    assert derived.startswith("---\n# header\n\nDevice includes a microprocessor:\n    pid: 11\n\n")
+    assert list(yaml.safe_load(derived).values()) == [{"pid": 11}, {"pid": 12}]
+
+    (tmp_path / "_data").mkdir()
+    shutil.copytree("catalog-mitre", tmp_path / "_data" / "ad")
+    (tmp_path / "_data" / "ad" / "bt.yaml").write_text("# stale\n")
+    (tmp_path / "_data" / "ad" / "old.yaml").write_text("# removed\n")
+    (tmp_path / "_data" / "model_bt.yaml").write_text(model)
+
+    reasons = {path.name: reason for path, _, reason in drift(site=tmp_path)}
+    assert reasons == {
+        "ad": "copy",
+        "dicts": "missing",
+        "emb3d.json": "missing",
+        "model_emb3d.yaml": "missing",
+        "model_bt.yaml": "model",
+    }
+    assert len(sync(site=tmp_path)) == 5
+    assert drift(site=tmp_path) == []
+    copied = sorted(path.name for path in (tmp_path / "_data" / "ad").iterdir())
+    assert copied == sorted(path.name for path in Path("catalog-mitre").iterdir())
@@ -0,0 +1,52 @@
+"""
+startup_test.py
+
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# NOTE: generous, the tool imports about 60 ms of modules on a laptop
+STARTUP_BUDGET_US = 250_000
+
+HEAVY = ["numpy", "pandas", "yaml", "yamllint", "schema", "xmltodict", "graphviz", "wordcloud"]
+
+
+def _importtime(args: list, tmp_path: Path) -> tuple:
+    """Return the imported modules of a python run and the cumulative import
+    time (us) of its top level imports"""
+    env = dict(os.environ, ADF_CACHE_DIR=str(tmp_path / "cache"))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args,
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=Path(__file__).parent,
+    )
+    modules, total = set(), 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.add(name.strip().split(".")[0])
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return modules, total
+
+
+def test_check_tool_json(tmp_path):
+    """Test the check_tool startup on a JSON file."""
+    modules, total = _importtime(["check_tool.py", "-i", "template/ad.json"], tmp_path)
+
+    assert "parse" in modules
+    assert [m for m in HEAVY if m in modules] == []
+    assert total < STARTUP_BUDGET_US
+
+
+def test_analyze_import(tmp_path):
+    """Test importing analyze does not import its heavy dependencies."""
+    modules, _ = _importtime(["-c", "import analyze"], tmp_path)
+
+    assert "analyze" in modules
+    assert [m for m in HEAVY if m in modules] == []
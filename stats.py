@@ -0,0 +1,148 @@
+"""
+stats.py
+
+Statistics of a DataFrame of ADs, ready for plotting.
+
+The list fields (surf, vect, model, tag, ...) are counted from their term
+index (see store.ListColumn): the term frequencies are a bincount of the term
+codes and the co-occurrences of two fields a bincount of their (AD, term)
+pairs joined on the AD, so every count is one vectorized pass over the ADs. The
+term indexes are kept per DataFrame, the wordclouds and histograms of a field
+share them.
+
+The numeric fields (year, risk) are counted over the ADs having a number,
+those without one are left out.
+
+"""
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from store import frame_index, numeric_risks
+
+
+def _index(ads: pd.DataFrame, key: str):
+    if key not in ads:
+        raise KeyError(key)
+    index = frame_index(ads, key)
+    if index is None:
+        raise ValueError(f"{key} is not a list field")
+    return index
+
+
+def frequencies(ads: pd.DataFrame, key: str, unique: bool = False) -> pd.Series:
+    """Return the number of occurrences of every term of key, most frequent
+    first. If unique, a term repeated in an AD counts once (number of ADs)."""
+
+    index = _index(ads, key)
+    if unique:
+        counts = index.counts()
+    else:
+        counts = np.bincount(index.codes, minlength=len(index.terms))
+    counts = pd.Series(counts, index=pd.Index(index.terms, name=key), name="count")
+    return counts.sort_values(ascending=False, kind="stable")
+
+
+def word_frequencies(ads: pd.DataFrame, key: str) -> Counter:
+    """Return the number of occurrences of every word of key as str, as the
+    wordclouds count them"""
+
+    index = frame_index(ads, key) if key in ads else None
+    if index is None:
+        # NOTE: not a list field, e.g., a str counted per character
+        return Counter(str(word) for value in ads[key] for word in value)
+
+    counts = np.bincount(index.codes, minlength=len(index.terms))
+    # NOTE: terms with the same str, e.g., 1 and "1", are one word
+    words = Counter()
+    for term, count in zip(index.terms, counts.tolist()):
+        if count:
+            words[str(term)] += count
+    return words
+
+
+def _ad_terms(index) -> tuple:
+    """Return the (AD row, term code) pairs of a term index, a term repeated
+    in an AD once, sorted by row"""
+    n = max(len(index.terms), 1)
+    pairs = np.unique(index.rows * n + index.codes)
+    return pairs // n, pairs % n
+
+
+def cooccurrence(ads: pd.DataFrame, row_key: str, col_key: str) -> pd.DataFrame:
+    """Return the number of ADs having both terms, row_key terms x col_key
+    terms. With the same key, the diagonal is the number of ADs per term."""
+
+    rows = _index(ads, row_key)
+    cols = _index(ads, col_key)
+    a_rows, a_codes = _ad_terms(rows)
+    b_rows, b_codes = _ad_terms(cols) if cols is not rows else (a_rows, a_codes)
+
+    # NOTE: join the pairs on the AD row, every row_key term of an AD with
+    # every col_key term of the same AD
+    per_ad = np.bincount(b_rows, minlength=len(ads))
+    starts = np.cumsum(per_ad) - per_ad
+    repeats = per_ad[a_rows]
+    a = np.repeat(np.arange(len(a_rows)), repeats)
+    offsets = np.arange(len(a)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    b = np.repeat(starts[a_rows], repeats) + offsets
+
+    shape = (len(rows.terms), len(cols.terms))
+    counts = np.bincount(a_codes[a] * shape[1] + b_codes[b], minlength=shape[0] * shape[1])
+    return pd.DataFrame(
+        counts.reshape(shape),
+        index=pd.Index(rows.terms, name=row_key),
+        columns=pd.Index(cols.terms, name=col_key),
+    )
+
+
+def _numbers(ads: pd.DataFrame, key: str) -> np.ndarray:
+    if key not in ads:
+        raise KeyError(key)
+    if key == "risk":
+        values = numeric_risks(ads)
+        return values[np.isfinite(values)]
+    values = pd.to_numeric(ads[key], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+def year_histogram(ads: pd.DataFrame, key: str = "year") -> pd.Series:
+    """Return the number of ADs per year, every year from the first to the
+    last, the unknown year 0 is not counted"""
+
+    years = _numbers(ads, key).astype(np.int64)
+    years = years[years > 0]
+    if len(years) == 0:
+        return pd.Series([], index=pd.Index([], name=key, dtype=np.int64), name="count", dtype=np.int64)
+    first = years.min()
+    counts = np.bincount(years - first)
+    return pd.Series(counts, index=pd.Index(np.arange(first, first + len(counts)), name=key), name="count")
+
+
+def _intervals(counts: np.ndarray, edges: np.ndarray, key: str) -> pd.Series:
+    # NOTE: as np.histogram, the last interval also holds its right edge
+    return pd.Series(counts, index=pd.IntervalIndex.from_breaks(edges, closed="left", name=key), name="count")
+
+
+def risk_distribution(ads: pd.DataFrame, bins=10, bounds: tuple = (0.0, 10.0)) -> pd.Series:
+    """Return the number of ADs per risk interval, bins intervals over bounds
+    (CVSS scores by default) or the given edges"""
+
+    counts, edges = np.histogram(_numbers(ads, "risk"), bins=bins, range=bounds)
+    return _intervals(counts, edges, "risk")
+
+
+def histogram(ads: pd.DataFrame, key: str, bins=None) -> pd.Series:
+    """Return the histogram of key: ADs per term of a list field, else ADs
+    per value, or per interval if bins"""
+
+    index = frame_index(ads, key) if key in ads else None
+    if index is not None:
+        return frequencies(ads, key, unique=True)
+    values = _numbers(ads, key)
+    if bins is not None:
+        return _intervals(*np.histogram(values, bins=bins), key)
+    values, counts = np.unique(values, return_counts=True)
+    return pd.Series(counts, index=pd.Index(values, name=key), name="count")
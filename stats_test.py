@@ -0,0 +1,67 @@
+"""
+stats_test.py
+
+"""
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from analyze import get_dataframe, get_hist
+from stats import cooccurrence, frequencies, risk_distribution, word_frequencies, year_histogram
+from store import frame_index
+
+
+@pytest.fixture
+def ads():
+    return get_dataframe(Path("catalog-mitre/bt.yaml"))
+
+
+def test_frequencies(ads: pd.DataFrame):
+    """Test the term counts against counting the lists."""
+    for key in ["surf", "vect", "model", "tag"]:
+        words = Counter(str(word) for value in ads[key].dropna() for word in value)
+        assert word_frequencies(ads, key) == words
+        assert frequencies(ads, key).to_dict() == Counter(w for v in ads[key].dropna() for w in v)
+        assert get_hist(ads, key).to_dict() == Counter(w for v in ads[key].dropna() for w in set(v))
+    assert frequencies(ads, "surf").is_monotonic_decreasing
+
+
+def test_cooccurrence(ads: pd.DataFrame):
+    """Test the co-occurrences against the ADs having both terms."""
+    matrix = cooccurrence(ads, "surf", "vect")
+    for surf in ["BC", "BLE", "LMP"]:
+        for vect in matrix.columns[:5]:
+            both = [set(s) >= {surf} and vect in v for s, v in zip(ads["surf"], ads["vect"]) if isinstance(v, list)]
+            assert matrix.loc[surf, vect] == sum(both)
+
+    for row_key, col_key in [("surf", "vect"), ("vect", "tag"), ("surf", "surf")]:
+        a = frame_index(ads, row_key).indicator().astype(int)
+        b = frame_index(ads, col_key).indicator().astype(int)
+        assert (cooccurrence(ads, row_key, col_key).to_numpy() == a.T @ b).all()
+
+    tags = cooccurrence(ads, "tag", "tag")
+    assert (tags.to_numpy() == tags.to_numpy().T).all()
+    assert (pd.Series(tags.to_numpy().diagonal(), index=tags.index) == get_hist(ads, "tag").reindex(tags.index)).all()
+    with pytest.raises(ValueError):
+        cooccurrence(ads, "a", "tag")
+
+
+def test_numbers(ads: pd.DataFrame):
+    """Test the year and risk histograms."""
+    years = year_histogram(ads)
+    assert years.sum() == ads["year"].notna().sum()
+    assert years.index[0] == ads["year"].min() and years.index[-1] == ads["year"].max()
+    assert years[years > 0].to_dict() == {int(y): c for y, c in get_hist(ads, "year").items()}
+
+    # NOTE: year 0 is the unknown year
+    unknown = ads.copy()
+    unknown.loc[unknown.index[:3], "year"] = 0
+    assert year_histogram(unknown).index[0] == unknown["year"][unknown["year"] > 0].min()
+    assert year_histogram(unknown).sum() == (unknown["year"] > 0).sum()
+
+    risks = risk_distribution(ads)
+    assert len(risks) == 10
+    assert risks.sum() == ads["risk"].notna().sum()
+    assert get_hist(ads, "risk", bins=4).sum() == risks.sum()
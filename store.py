@@ -0,0 +1,336 @@
+"""
+store.py
+
+Columnar, typed representation of an AD dict.
+
+List-valued fields (surf, vect, model, tag, cve, ...) are stored as integer
+codes into a sorted array of terms, flattened over all the ADs, with an
+offsets array: the terms of AD i are terms[codes[offsets[i]:offsets[i+1]]].
+codes and offsets are the CSR form of the sparse AD x term boolean matrix.
+The d field is stored the same way on two levels: AD -> policies and
+policy -> mechanisms.
+
+Set membership queries are vectorized NumPy operations on the codes.
+AdStore.to_dataframe() returns the DataFrame of analyze.get_dataframe().
+
+"""
+
+import weakref
+
+import numpy as np
+import pandas as pd
+
+
+class _Missing:
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+# NOTE: a field absent from an AD, distinct from a YAML null
+MISSING = _Missing()
+
+
+class ListColumn:
+    """A list-valued field as categorical codes and offsets"""
+
+    def __init__(self, values: list):
+        # NOTE: MISSING marks an AD without the field
+        self.present = np.array([v is not MISSING for v in values], dtype=bool)
+        values = [v if v is not MISSING else [] for v in values]
+
+        self.terms = np.array(sorted({t for v in values for t in v}, key=str), dtype=object)
+        self.lookup = {t: i for i, t in enumerate(self.terms)}
+
+        lengths = np.array([len(v) for v in values], dtype=np.int64)
+        self.offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.codes = np.array([self.lookup[t] for v in values for t in v], dtype=np.int32)
+        # NOTE: row of every code, the COO form of the matrix
+        self.rows = np.repeat(np.arange(len(values), dtype=np.int64), lengths)
+        # NOTE: term -> rows inverted index, built on the first query
+        self._order = None
+        self._starts = None
+
+    def __len__(self) -> int:
+        return len(self.present)
+
+    def __getitem__(self, row: int) -> list:
+        if not self.present[row]:
+            return MISSING
+        return list(self.terms[self.codes[self.offsets[row] : self.offsets[row + 1]]])
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def code(self, term) -> int:
+        """Return the code of a term, -1 if no AD has it"""
+        return self.lookup.get(term, -1)
+
+    def postings(self, term) -> np.ndarray:
+        """Return the rows of the ADs having term, sorted"""
+        code = self.code(term)
+        if code < 0:
+            return np.zeros(0, dtype=np.int64)
+        if self._order is None:
+            self._order = np.argsort(self.codes, kind="stable")
+            self._starts = np.searchsorted(
+                self.codes[self._order], np.arange(len(self.terms) + 1)
+            )
+        return self.rows[self._order[self._starts[code] : self._starts[code + 1]]]
+
+    def contains(self, term) -> np.ndarray:
+        """Return the mask of the ADs having term"""
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.postings(term)] = True
+        return mask
+
+    def contains_all(self, terms: list) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        for term in terms:
+            mask &= self.contains(term)
+        return mask
+
+    def contains_any(self, terms: list) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        for term in terms:
+            mask |= self.contains(term)
+        return mask
+
+    def masks(self, terms: list) -> np.ndarray:
+        """Return the masks of the ADs having each term, in one pass over the
+        codes"""
+        unique = list(dict.fromkeys(terms))
+        slot = np.full(len(self.terms), -1, dtype=np.int64)
+        for i, term in enumerate(unique):
+            code = self.code(term)
+            if code >= 0:
+                slot[code] = i
+
+        matrix = np.zeros((len(unique), len(self)), dtype=bool)
+        slots = slot[self.codes]
+        keep = slots >= 0
+        matrix[slots[keep], self.rows[keep]] = True
+
+        position = {term: i for i, term in enumerate(unique)}
+        return matrix[[position[term] for term in terms]]
+
+    def counts(self) -> np.ndarray:
+        """Return the number of ADs having each term, aligned with terms"""
+        # NOTE: a term repeated in one AD is counted once
+        pairs = np.unique(self.rows * len(self.terms) + self.codes)
+        return np.bincount(pairs % max(len(self.terms), 1), minlength=len(self.terms))
+
+    def indicator(self) -> np.ndarray:
+        """Return the dense AD x term boolean matrix"""
+        matrix = np.zeros((len(self), len(self.terms)), dtype=bool)
+        matrix[self.rows, self.codes] = True
+        return matrix
+
+
+class DefenseColumn:
+    """The d field: AD -> policies -> mechanisms"""
+
+    def __init__(self, values: list):
+        self.present = np.array([v is not MISSING for v in values], dtype=bool)
+        values = [v if v is not MISSING else {} for v in values]
+
+        self.policies = ListColumn([list(v) for v in values])
+        self.mechanisms = ListColumn([mechs for v in values for mechs in v.values()])
+
+    def __len__(self) -> int:
+        return len(self.present)
+
+    def __getitem__(self, row: int) -> dict:
+        if not self.present[row]:
+            return MISSING
+        start, end = self.policies.offsets[row], self.policies.offsets[row + 1]
+        return {
+            self.policies.terms[self.policies.codes[p]]: self.mechanisms[p]
+            for p in range(start, end)
+        }
+
+    def mechanism_rows(self) -> np.ndarray:
+        """Return the AD row of every mechanism code"""
+        return self.policies.rows[self.mechanisms.rows]
+
+
+class AdStore:
+    """Columnar AD dict: scalar columns as typed arrays, list and dict
+    columns as codes and offsets"""
+
+    def __init__(self, ad_dict: dict):
+        self.index = np.array(list(ad_dict), dtype=object)
+        self.positions = {key: i for i, key in enumerate(self.index)}
+
+        # NOTE: field order of first appearance, as DataFrame.from_dict
+        self.fields = list(dict.fromkeys(f for ad in ad_dict.values() for f in ad))
+        self.columns = {}
+        self.present = {}
+        self.lists = {}
+        self.defenses = None
+        self.integral = set()
+
+        for field in self.fields:
+            values = [ad.get(field, MISSING) for ad in ad_dict.values()]
+            present = [v for v in values if v is not MISSING]
+            if field == "d" and all(_is_defense(v) for v in present):
+                self.defenses = DefenseColumn(values)
+            elif all(_is_terms(v) for v in present):
+                self.lists[field] = ListColumn(values)
+            elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+                # NOTE: NaN marks a missing number, integers are restored
+                if all(isinstance(v, int) for v in present):
+                    self.integral.add(field)
+                self.columns[field] = np.array(
+                    [np.nan if v is MISSING else v for v in values], dtype=np.float64
+                )
+            else:
+                # NOTE: strings and YAML nulls
+                self.present[field] = np.array([v is not MISSING for v in values], dtype=bool)
+                self.columns[field] = np.array(
+                    [None if v is MISSING else v for v in values], dtype=object
+                )
+
+    @classmethod
+    def from_dataframe(cls, ads: pd.DataFrame) -> "AdStore":
+        """Return the store of a DataFrame of analyze.get_dataframe()"""
+        ad_dict = {}
+        for index, row in zip(ads.index, ads.to_dict(orient="records")):
+            ad_dict[index] = {k: v for k, v in row.items() if not _missing(v)}
+        return cls(ad_dict)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, field: str) -> bool:
+        return field in self.fields
+
+    def value(self, row: int, field: str):
+        """Return the value of field for the AD at row, MISSING if missing"""
+        if field in self.lists:
+            return self.lists[field][row]
+        if field == "d" and self.defenses is not None:
+            return self.defenses[row]
+        value = self.columns[field][row]
+        if self.columns[field].dtype == np.float64:
+            if np.isnan(value):
+                return MISSING
+            return int(value) if field in self.integral else float(value)
+        if not self.present[field][row]:
+            return MISSING
+        return value
+
+    def ad(self, row: int) -> dict:
+        """Return the AD at row as a dict"""
+        ad = {}
+        for field in self.fields:
+            value = self.value(row, field)
+            if value is not MISSING:
+                ad[field] = value
+        return ad
+
+    def to_dict(self) -> dict:
+        """Return the AD dict"""
+        return {key: self.ad(row) for row, key in enumerate(self.index)}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return the DataFrame of analyze.get_dataframe()"""
+        return ad_dataframe(self.to_dict())
+
+    def select(self, mask: np.ndarray) -> np.ndarray:
+        """Return the AD keys of a row mask"""
+        return self.index[mask]
+
+
+def _is_terms(value) -> bool:
+    return isinstance(value, list) and all(isinstance(t, (str, int)) for t in value)
+
+
+def _is_defense(value) -> bool:
+    return isinstance(value, dict) and all(_is_terms(v) for v in value.values())
+
+
+def _missing(value) -> bool:
+    return not isinstance(value, (list, dict, str)) and pd.isna(value)
+
+
+# NOTE: (id(ads), name) -> (DataFrame weakref, columns token, value)
+_FRAME_CACHE = {}
+
+
+def _columns_token(ads: pd.DataFrame, columns: list) -> tuple:
+    # NOTE: assigning a column or dropping rows changes the token, mutating
+    # list values in place does not
+    return (ads.index,) + tuple(
+        ads[c].to_numpy().__array_interface__["data"][0] for c in columns
+    )
+
+
+def frame_cached(ads: pd.DataFrame, name: str, columns: list, build):
+    """Return build(ads), kept while the DataFrame lives and its rows and
+    columns are the same"""
+
+    slot = (id(ads), name)
+    token = _columns_token(ads, columns)
+    cached = _FRAME_CACHE.get(slot)
+    if cached is not None:
+        ref, cached_token, value = cached
+        if (
+            ref() is ads
+            and cached_token[0] is token[0]
+            and cached_token[1:] == token[1:]
+        ):
+            return value
+
+    value = build(ads)
+
+    def _drop(ref, slot=slot):
+        if slot in _FRAME_CACHE and _FRAME_CACHE[slot][0] is ref:
+            del _FRAME_CACHE[slot]
+
+    _FRAME_CACHE[slot] = (weakref.ref(ads, _drop), token, value)
+    return value
+
+
+def _list_column(ads: pd.DataFrame, key: str) -> ListColumn:
+    values = [MISSING if _missing(v) else v for v in ads[key]]
+    if not all(v is MISSING or _is_terms(v) for v in values):
+        return None
+    return ListColumn(values)
+
+
+def frame_index(ads: pd.DataFrame, key: str) -> ListColumn:
+    """Return the term index of a list column of a DataFrame, None if the
+    column holds other values. The index is kept while the DataFrame lives."""
+
+    return frame_cached(ads, "index:" + key, [key], lambda ads: _list_column(ads, key))
+
+
+def numeric_risks(ads: pd.DataFrame) -> np.ndarray:
+    """Return the numeric risks, -inf if missing or not a number"""
+    if "risk" not in ads:
+        return np.full(len(ads), -np.inf)
+    risks = pd.to_numeric(ads["risk"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(np.isnan(risks), -np.inf, risks)
+
+
+def ad_dataframe(ad_dict: dict) -> pd.DataFrame:
+    """Return a pandas dataframe of an AD dict"""
+
+    # NOTE: unique rows of ads
+    ads = pd.DataFrame.from_dict(ad_dict, orient="index").set_flags(
+        allows_duplicate_labels=False
+    )
+
+    # NOTE: check for duplicates
+    assert ads.index.is_unique
+    assert ads.columns.is_unique
+
+    # FIXME: this should not be required as we are parsing a typed dict
+    ads = ads.astype(
+        {
+            "a": "string",
+        }
+    )
+
+    return ads
@@ -0,0 +1,41 @@
+"""
+store_test.py
+
+"""
+from pathlib import Path
+
+import numpy as np
+
+from analyze import get_dataframe, get_set
+from parse import parse
+from store import AdStore
+
+
+def test_round_trip():
+    """Test the store converts back to the AD dict and DataFrame."""
+    for path in [Path("catalog-mitre/bt.yaml"), Path("catalog-mitre/physical.yaml")]:
+        ad_dict = parse(path)
+        store = AdStore(ad_dict)
+
+        assert store.to_dict() == ad_dict
+        assert store.to_dataframe().equals(get_dataframe(path))
+        assert AdStore.from_dataframe(get_dataframe(path)).to_dict() == ad_dict
+
+    # NOTE: YAML nulls are kept apart from missing fields
+    ad_dict = parse(Path("catalog/fido_system.yaml"))
+    assert AdStore(ad_dict).to_dict() == ad_dict
+
+
+def test_contains():
+    """Test the vectorized membership against the DataFrame filters."""
+    ads = get_dataframe(Path("catalog-mitre/bt.yaml"))
+    store = AdStore.from_dataframe(ads)
+
+    for key, term in [["surf", "BC"], ["tag", "Protocol"], ["model", "MitM"]]:
+        mask = store.lists[key].contains(term)
+        assert list(store.select(mask)) == list(get_set(ads, key, term).index)
+
+    surf = store.lists["surf"]
+    assert not surf.contains("not a term").any()
+    assert np.array_equal(surf.indicator().sum(axis=0) > 0, surf.counts() > 0)
+    assert surf.contains_all(["BC", "LMP"]).sum() <= surf.contains("BC").sum()
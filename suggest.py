@@ -0,0 +1,73 @@
+"""
+suggest.py
+
+"Did you mean" suggestions for unknown dictionary terms.
+
+The suggestions are the same as difflib.get_close_matches(), but the words
+are ranked by an upper bound of the SequenceMatcher ratio first: the ratio
+of two words is at most 2 * (common characters) / (total length). The
+character counts of all the words are precomputed in a matrix, the bound of
+every word is a single vectorized operation, and the exact ratio is only
+computed for the best bounded words until no other word can enter the top n.
+
+"""
+
+import heapq
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+import numpy as np
+
+
+class SuggestionIndex:
+    """Character count index over a list of words"""
+
+    def __init__(self, words):
+        self.words = sorted(set(words))
+        self.alphabet = {c: i for i, c in enumerate(sorted({c for w in self.words for c in w}))}
+
+        self.counts = np.zeros((len(self.words), len(self.alphabet)), dtype=np.int32)
+        for row, word in enumerate(self.words):
+            for c in word:
+                self.counts[row, self.alphabet[c]] += 1
+        self.lengths = np.array([len(w) for w in self.words], dtype=np.int32)
+
+        self.suggest = lru_cache(maxsize=4096)(self._suggest)
+
+    def _bounds(self, word: str) -> np.ndarray:
+        """Return the upper bound of the ratio of word with every word"""
+        query = np.zeros(len(self.alphabet), dtype=np.int32)
+        for c in word:
+            if c in self.alphabet:
+                query[self.alphabet[c]] += 1
+        common = np.minimum(self.counts, query).sum(axis=1)
+        total = self.lengths + len(word)
+        return np.divide(2.0 * common, total, out=np.ones(len(self.words)), where=total > 0)
+
+    def _suggest(self, word: str, n: int = 3, cutoff: float = 0.2) -> list:
+        """Return the n best words with a ratio >= cutoff, best first"""
+        if not self.words or n <= 0:
+            return []
+
+        bounds = self._bounds(word)
+        order = np.argsort(-bounds, kind="stable")
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        best = []
+        for row in order:
+            bound = bounds[row]
+            if bound < cutoff:
+                break
+            # NOTE: ties are sorted by word, keep going while a word can tie
+            if len(best) == n and bound < best[0][0]:
+                break
+            matcher.set_seq1(self.words[row])
+            score = matcher.ratio()
+            if score >= cutoff:
+                if len(best) < n:
+                    heapq.heappush(best, (score, self.words[row]))
+                else:
+                    heapq.heappushpop(best, (score, self.words[row]))
+
+        return [w for _, w in sorted(best, reverse=True)]
@@ -0,0 +1,27 @@
+"""
+suggest_test.py
+
+"""
+from difflib import get_close_matches
+from pathlib import Path
+
+from dictionary import Dictionary
+from parse import parse
+from suggest import SuggestionIndex
+
+
+def test_suggestions():
+    """Test the suggestions match difflib.get_close_matches."""
+    words = Dictionary.load(Path("dicts/bt.yaml"))
+
+    for path in Path("catalog").glob("*.yaml"):
+        for ad in parse(path).values():
+            for key in words.keys():
+                for term in ad[key]:
+                    expected = get_close_matches(term, words[key], n=3, cutoff=0.2)
+                    assert words.suggest(key, term) == expected
+
+    index = SuggestionIndex(["abc", "abd", "xyz"])
+    assert index.suggest("abc", 2, 0.6) == ["abc", "abd"]
+    assert index.suggest("", 3, 0.2) == []
+    assert SuggestionIndex([]).suggest("abc") == []
@@ -0,0 +1,138 @@
+"""
+surftree.py
+
+Prefix trie of the surf hierarchy of a DataFrame of ADs.
+
+Every node is a surf prefix, e.g., BLE -> SMP -> Pairing, with the rows of
+the ADs under it, the rows of the ADs ending at it and the number of ADs
+under it per tag. The trie is built once per DataFrame in one pass over the
+ADs. The tree of a tag is derived from it by pruning the nodes without that
+tag, so generating the trees of all the tags does not scan the ADs again.
+
+A graph is emitted only at the end: the edges are deduplicated and kept in
+the order of their first AD, as analyze.get_surf_tree drew them one AD at a
+time.
+
+"""
+
+from collections import Counter
+
+import graphviz
+import numpy as np
+import pandas as pd
+
+from store import MISSING, ListColumn, _missing, frame_cached
+
+
+class SurfNode:
+    """A surf prefix"""
+
+    __slots__ = ["name", "depth", "children", "rows", "ends", "tags"]
+
+    def __init__(self, name: str, depth: int):
+        self.name = name
+        self.depth = depth
+        self.children = {}
+        # NOTE: sorted rows of the ADs under and ending at the node
+        self.rows = []
+        self.ends = []
+        # NOTE: tag -> number of ADs under the node
+        self.tags = Counter()
+
+    def __repr__(self) -> str:
+        return f"SurfNode({self.name!r}, {len(self.rows)} ads)"
+
+
+class SurfTrie:
+    """Surf prefix trie of a DataFrame"""
+
+    def __init__(self, ads: pd.DataFrame):
+        self.index = np.array(ads.index, dtype=object)
+        self.root = SurfNode(None, 0)
+
+        if "tag" in ads:
+            tags = [MISSING if _missing(t) else t for t in ads["tag"]]
+        else:
+            tags = [MISSING] * len(ads)
+        # NOTE: tag -> rows index, to select the rows of a tag under a node
+        self.tag_index = ListColumn(tags)
+        self.nodes = 0
+        for row, (surf, tag) in enumerate(zip(ads["surf"], tags)):
+            if _missing(surf) or len(surf) == 0:
+                continue
+            tag = set() if tag is MISSING else set(tag)
+
+            node = self.root
+            node.rows.append(row)
+            node.tags.update(tag)
+            for depth, name in enumerate(surf, 1):
+                if name not in node.children:
+                    node.children[name] = SurfNode(name, depth)
+                    self.nodes += 1
+                node = node.children[name]
+                node.rows.append(row)
+                node.tags.update(tag)
+            node.ends.append(row)
+
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            node.rows = np.array(node.rows, dtype=np.int64)
+            node.ends = np.array(node.ends, dtype=np.int64)
+            stack.extend(node.children.values())
+
+    @classmethod
+    def of(cls, ads: pd.DataFrame) -> "SurfTrie":
+        """Return the trie of a DataFrame, kept while the DataFrame lives"""
+        columns = ["surf", "tag"] if "tag" in ads else ["surf"]
+        return frame_cached(ads, "surftree", columns, cls)
+
+    def tags(self) -> list:
+        """Return the tags of the ADs, most frequent first"""
+        return [tag for tag, _ in self.root.tags.most_common()]
+
+    def edges(self, tag: str = None) -> list:
+        """Return the (parent, child, leaf) edges of the tree of the ADs with
+        tag, all of them if tag is None, in the order of their first AD. leaf
+        edges link the last surf to an AD key."""
+
+        mask = self.tag_index.contains(tag) if tag is not None else None
+        first = {}
+
+        def add(edge: tuple, key: tuple):
+            if edge not in first or key < first[edge]:
+                first[edge] = key
+
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for child in node.children.values():
+                # NOTE: prune the subtrees without tag
+                if mask is not None and child.tags[tag] == 0:
+                    continue
+                rows = child.rows if mask is None else child.rows[mask[child.rows]]
+                if node is not self.root:
+                    add((node.name, child.name, False), (rows[0], child.depth - 1))
+                ends = child.ends if mask is None else child.ends[mask[child.ends]]
+                for row in ends:
+                    add((child.name, self.index[row], True), (row, child.depth))
+                stack.append(child)
+
+        return sorted(first, key=first.get)
+
+    def graph(self, tag: str = None, tname: str = "tree") -> graphviz.Digraph:
+        """Return the graphviz tree of the ADs with tag, all of them if tag is
+        None"""
+
+        # NOTE: strict to True prevents double edges
+        tree = graphviz.Digraph(tname, filename=tname + ".gv", strict=True)
+        for parent, child, leaf in self.edges(tag):
+            if leaf:
+                # Mark leaf nodes as boxes
+                tree.attr("node", shape="box")
+                tree.edge(parent, child)
+                tree.attr("node", shape="ellipse")
+            else:
+                tree.edge(parent, child)
+
+        return tree
@@ -0,0 +1,63 @@
+"""
+surftree_test.py
+
+"""
+from pathlib import Path
+
+import graphviz
+
+from analyze import get_dataframe, get_surf_tree, get_surf_trees
+from store import ad_dataframe
+from surftree import SurfTrie
+
+
+def test_trie():
+    """Test the trie counts, pruning and edge order."""
+    ads = ad_dataframe(
+        {
+            "knob": {"a": "KNOB", "surf": ["BC", "LMP"], "tag": ["Protocol"]},
+            "sweyn": {"a": "Sweyn", "surf": ["BLE", "LL"], "tag": ["Impl"]},
+            "bias": {"a": "BIAS", "surf": ["BC", "LMP", "Auth"], "tag": ["Protocol", "LMP"]},
+        }
+    )
+    trie = SurfTrie.of(ads)
+    assert SurfTrie.of(ads) is trie
+    assert trie.tags() == ["Protocol", "Impl", "LMP"]
+    assert trie.root.children["BC"].tags == {"Protocol": 2, "LMP": 1}
+    assert list(trie.root.children["BC"].children["LMP"].ends) == [0]
+
+    assert trie.edges() == [
+        ("BC", "LMP", False),
+        ("LMP", "knob", True),
+        ("BLE", "LL", False),
+        ("LL", "sweyn", True),
+        ("LMP", "Auth", False),
+        ("Auth", "bias", True),
+    ]
+    assert trie.edges("LMP") == [
+        ("BC", "LMP", False),
+        ("LMP", "Auth", False),
+        ("Auth", "bias", True),
+    ]
+    assert trie.edges("Fuzz") == []
+
+
+def test_surf_tree():
+    """Test the trees against drawing the ADs one by one."""
+    ads = get_dataframe(Path("catalog-mitre/bt.yaml"))
+
+    for tag, tree in get_surf_trees(ads).items():
+        expected = graphviz.Digraph("tree", strict=True)
+        for index, row in ads.iterrows():
+            if tag in row.tag:
+                for prev_surf, surf in zip(row.surf, row.surf[1:]):
+                    expected.edge(prev_surf, surf)
+                expected.attr("node", shape="box")
+                expected.edge(row.surf[-1], index)
+                expected.attr("node", shape="ellipse")
+
+        # NOTE: strict drops the double edges when rendering
+        seen = set()
+        body = [l for l in expected.body if "->" not in l or not (l in seen or seen.add(l))]
+        assert tree.body == body
+        assert get_surf_tree(ads, tag).body == body
@@ -0,0 +1,254 @@
+"""
+validator.py
+
+Validate AD dicts without the schema library.
+
+The AD schema is compiled once per dictionary into a table of field checks,
+then every AD is validated in a single pass with direct type checks. All the
+errors of all the ADs are collected instead of stopping at the first one.
+
+"""
+
+import re
+import time
+from pathlib import Path
+from typing import Callable
+
+AD_KEY = re.compile(r"^[a-z0-9_]+$")
+
+TERMS = ["surf", "vect", "model", "tag"]
+
+REFS = ["cve", "cwe", "capec", "vref"]
+
+
+def _is_str_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+def _check_a(value) -> str:
+    if not isinstance(value, str):
+        return "should be a str"
+    if len(value) == 0:
+        return "should not be empty"
+    return None
+
+
+def _check_d(value) -> str:
+    if not isinstance(value, dict):
+        return "should be a dict of policies"
+    for policy, mechs in value.items():
+        if not isinstance(policy, str):
+            return f"policy {policy!r} should be a str"
+        if not _is_str_list(mechs):
+            return f"mechanisms of {policy!r} should be a list of str"
+    return None
+
+
+def _check_year(value) -> str:
+    if not isinstance(value, int):
+        return "should be an int"
+    if not ((1980 <= value <= 2030) or value == 0):
+        return f"{value} should be in [1980, 2030] or 0"
+    return None
+
+
+def _check_req(value) -> str:
+    if not _is_str_list(value):
+        return "should be a list of str"
+    if len(value) == 0:
+        return "should not be empty"
+    return None
+
+
+def _check_risk(value) -> str:
+    if not isinstance(value, float):
+        return f"{value!r} should be a float"
+    if value < 0:
+        return f"{value} should be >= 0"
+    return None
+
+
+def _check_refs(value) -> str:
+    if not _is_str_list(value):
+        return "should be a list of str"
+    return None
+
+
+def _check_refs_not_empty(value) -> str:
+    if not _is_str_list(value):
+        return "should be a list of str"
+    if len(value) == 0:
+        return "should not be empty"
+    return None
+
+
+def _words_checker(words) -> Callable[[list, str], bool]:
+    """Return a term checker against frozen sets of the dictionary words"""
+    allowed = {key: frozenset(words[key]) for key in TERMS}
+
+    def check_terms(terms: list, key: str) -> bool:
+        return len(terms) > 0 and allowed[key].issuperset(terms)
+
+    return check_terms
+
+
+class AdValidator:
+    """Compiled AD schema
+
+    words is a dictionary of the allowed surf, vect, model and tag terms, or
+    None to accept any term. check_terms(terms, key) replaces the default term
+    check, e.g., to print hints. With empty_refs=False the cve, cwe, capec and
+    vref lists must not be empty.
+    """
+
+    def __init__(self, words=None, check_terms=None, empty_refs: bool = True):
+        if check_terms is None and words is not None:
+            check_terms = _words_checker(words)
+        self.check_terms = check_terms
+
+        check_refs = _check_refs if empty_refs else _check_refs_not_empty
+
+        # NOTE: field -> (required, check)
+        self.fields = {
+            "a": (True, _check_a),
+            "d": (True, _check_d),
+            "year": (False, _check_year),
+            "surf": (True, None),
+            "vect": (True, None),
+            "model": (True, None),
+            "tag": (True, None),
+            "req": (False, _check_req),
+            "risk": (False, _check_risk),
+        }
+        for ref in REFS:
+            self.fields[ref] = (False, check_refs)
+        self.required = frozenset(f for f, (req, _) in self.fields.items() if req)
+
+    def _check_term_field(self, value, key: str) -> str:
+        if not _is_str_list(value):
+            return "should be a list of str"
+        if self.check_terms is not None and not self.check_terms(value, key):
+            return f"{value} not in the dictionary"
+        return None
+
+    def validate_ad(self, name, ad) -> list[str]:
+        """Return the errors of one AD"""
+
+        if not (isinstance(name, str) and AD_KEY.search(name)):
+            return [f"{name!r}: wrong AD key, expected {AD_KEY.pattern}"]
+        if not isinstance(ad, dict):
+            return [f"{name}: should be a dict"]
+
+        errors = []
+        for field in sorted(self.required - ad.keys()):
+            errors.append(f"{name}: missing key {field!r}")
+
+        for field, value in ad.items():
+            if field not in self.fields:
+                errors.append(f"{name}: wrong key {field!r}")
+                continue
+            _, check = self.fields[field]
+            if check is None:
+                msg = self._check_term_field(value, field)
+            else:
+                msg = check(value)
+            if msg is not None:
+                errors.append(f"{name}: {field!r} {msg}")
+
+        return errors
+
+    def validate(self, ad_dict) -> list[str]:
+        """Return the errors of all the ADs in ad_dict"""
+
+        if not isinstance(ad_dict, dict):
+            return ["AD file should contain a dict of ADs"]
+
+        errors = []
+        for name, ad in ad_dict.items():
+            errors.extend(self.validate_ad(name, ad))
+
+        return errors
+
+
+# NOTE: (check_terms, empty_refs) -> (words, validator), only the last
+# dictionary is kept, a reloaded dictionary replaces it
+_COMPILED = {}
+
+
+def compiled(words=None, check_terms=None, empty_refs: bool = True) -> AdValidator:
+    """Return the AdValidator of words, compiled once while words is reused
+
+    check_terms(terms, key, words) replaces the default term check.
+    """
+
+    key = (check_terms, empty_refs)
+    if key not in _COMPILED or _COMPILED[key][0] is not words:
+        bound = None
+        if check_terms is not None and words is not None:
+            bound = lambda terms, field: check_terms(terms, field, words)
+        _COMPILED[key] = (words, AdValidator(words, bound, empty_refs))
+    return _COMPILED[key][1]
+
+
+def _schema_reference(words=None, empty_refs: bool = True):
+    """Return the schema library equivalent of AdValidator, for benchmarks"""
+    from schema import Optional, Schema, Regex, And
+
+    def terms(key):
+        if words is None:
+            return Schema([str])
+        return And(Schema([str]), lambda t: len(t) > 0 and set(t) <= set(words[key]))
+
+    refs = And(Schema([str]), lambda s: len(s) >= (0 if empty_refs else 1))
+
+    return Schema(
+        {
+            Regex(r"^[a-z0-9_]+$"): {
+                "a": And(str, lambda a: len(a) > 0),
+                "d": And(Schema({str: [str]})),
+                Optional("year"): And(int, lambda y: (1980 <= y <= 2030) or y == 0),
+                "surf": terms("surf"),
+                "vect": terms("vect"),
+                "model": terms("model"),
+                "tag": terms("tag"),
+                Optional("req"): And(Schema([str]), lambda s: len(s) > 0),
+                Optional("risk"): And(Schema(float), lambda s: s >= 0),
+                Optional("cve"): refs,
+                Optional("cwe"): refs,
+                Optional("capec"): refs,
+                Optional("vref"): refs,
+            }
+        }
+    )
+
+
+def benchmark(paths: list, rounds: int = 20):
+    """Print the validation time of the schema library and AdValidator"""
+    from schema import SchemaError
+    from parse import parse
+
+    for path in paths:
+        ad_dict = parse(Path(path))
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            try:
+                _schema_reference().validate(ad_dict)
+            except SchemaError:
+                pass
+        schema_time = (time.perf_counter() - start) / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            AdValidator().validate(ad_dict)
+        validator_time = (time.perf_counter() - start) / rounds
+
+        print(
+            f"{path}: {len(ad_dict)} ads, schema {schema_time * 1e3:.2f} ms, "
+            f"validator {validator_time * 1e3:.2f} ms "
+            f"({schema_time / validator_time:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    benchmark(sorted(Path("catalog").glob("*.yaml")) + sorted(Path("catalog-mitre").glob("*.yaml")))
@@ -0,0 +1,65 @@
+"""
+validator_test.py
+
+"""
+from pathlib import Path
+from schema import SchemaError
+
+from check import BT_WORDS
+from parse import parse
+from validator import (
+    AdValidator,
+    _COMPILED,
+    _schema_reference,
+    compiled,
+)
+
+
+def _schema_passes(ad_dict: dict, words=None, empty_refs=True) -> bool:
+    try:
+        _schema_reference(words, empty_refs).validate(ad_dict)
+        return True
+    except SchemaError:
+        return False
+
+
+def test_schema_equivalence():
+    """Test the validator accepts the same AD files as the schema library."""
+    paths = list(Path("catalog").glob("*.yaml")) + list(Path("catalog-mitre").glob("*.yaml"))
+    paths += [Path("template/ad" + suffix) for suffix in [".yaml", ".toml", ".json", ".xml"]]
+
+    for path in paths:
+        ad_dict = parse(path)
+        for words in [None, BT_WORDS]:
+            for empty_refs in [True, False]:
+                errors = AdValidator(words, empty_refs=empty_refs).validate(ad_dict)
+                assert (len(errors) == 0) == _schema_passes(ad_dict, words, empty_refs), path
+
+
+def test_all_errors():
+    """Test the validator reports the errors of every AD."""
+    ad_dict = parse(Path("catalog-mitre/bt.yaml"))
+    ad_dict["knob"].pop("a")
+    ad_dict["knob"]["year"] = 1900
+    ad_dict["blur"]["surf"] = "BC"
+    ad_dict["Bad key"] = {}
+
+    errors = AdValidator().validate(ad_dict)
+    assert errors == [
+        "knob: missing key 'a'",
+        "knob: 'year' 1900 should be in [1980, 2030] or 0",
+        "blur: 'surf' should be a list of str",
+        "'Bad key': wrong AD key, expected ^[a-z0-9_]+$",
+    ]
+
+
+def test_compiled():
+    """Test the validator is compiled once per dictionary, reloads replace it."""
+    words = dict(BT_WORDS)
+    assert compiled(words) is compiled(words)
+    assert compiled(words, empty_refs=False) is not compiled(words)
+
+    size = len(_COMPILED)
+    reloaded = dict(BT_WORDS)
+    assert compiled(reloaded) is not compiled(words)
+    assert len(_COMPILED) == size